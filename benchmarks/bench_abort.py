@@ -0,0 +1,120 @@
+#! /usr/bin/env python
+# -*- coding: iso-8859-1 -*-
+
+'''
+Latency of a TELESCOPE.STOP while the TPL connection is busy with telemetry polling.
+
+A number of threads keep reading the sensor table (background GETs, as updateSensors() does) from a simulator
+that spends --service-time on every command, and a STOP is sent every --interval seconds. Each configuration
+reports the STOP latency (p50/p99/max, ms) and how many polls got through:
+
+    plain     - no background quota, STOP sent as a normal command
+    quota     - background_quota, STOP sent as a normal command
+    urgent    - background_quota, STOP sent urgent (ahead of queued writes)
+    priority  - background_quota, STOP sent urgent over the priority connection
+
+::
+
+    python benchmarks/bench_abort.py
+'''
+
+import os
+import sys
+import json
+import time
+import threading
+from optparse import OptionParser
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from chimera_astelco.instruments.tpl import TPL
+from chimera_astelco.util.tplsim import TPLServer
+
+SENSORS = ['AUXILIARY.SENSOR[%i].VALUE' % n for n in range(1, 8)]
+
+MODES = (('plain', 0, False, False),
+         ('quota', None, False, False),
+         ('urgent', None, True, False),
+         ('priority', None, True, True))
+
+
+def percentile(values, p):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(p / 100. * (len(values) - 1))))]
+
+
+def bench(server, quota, urgent, priority, options):
+    tpl = TPL()
+    tpl['tpl_host'] = server.host
+    tpl['tpl_port'] = server.port
+    tpl['priority_connection'] = priority
+    if quota is not None:
+        tpl['background_quota'] = quota
+    tpl.__start__()
+    loop = threading.Thread(target=tpl.__main__, name='TPL control')
+    loop.setDaemon(True)
+    loop.start()
+
+    stop = threading.Event()
+    polls = [0]
+
+    def poll(objects):
+        while not stop.isSet():
+            tpl.getobjects(objects, background=True)
+            polls[0] += 1
+
+    # a different order per thread, so up to len(SENSORS) threads do not share their GETs
+    pollers = [threading.Thread(target=poll, args=(SENSORS[i % len(SENSORS):] + SENSORS[:i % len(SENSORS)],))
+               for i in range(options.threads)]
+    for poller in pollers:
+        poller.setDaemon(True)
+        poller.start()
+
+    times = []
+    start = time.time()
+    try:
+        time.sleep(options.interval)
+        for i in range(options.count):
+            t0 = time.time()
+            tpl.set('TELESCOPE.STOP', 1, wait=True, urgent=urgent)
+            times.append((time.time() - t0) * 1e3)
+            time.sleep(options.interval)
+    finally:
+        elapsed = time.time() - start
+        stop.set()
+        for poller in pollers:
+            poller.join()
+        tpl.__abort_loop__()
+        tpl.__stop__()
+
+    return {'p50_ms': percentile(times, 50),
+            'p99_ms': percentile(times, 99),
+            'max_ms': max(times),
+            'polls_per_s': polls[0] / elapsed}
+
+
+def main():
+    parser = OptionParser(usage='%prog [options]')
+    parser.add_option('-n', '--count', type='int', default=50, help='STOP commands per configuration.')
+    parser.add_option('--threads', type='int', default=7, help='Polling threads.')
+    parser.add_option('--interval', type='float', default=0.05, help='Seconds between STOP commands.')
+    parser.add_option('--latency', type='float', default=0.002, help='Simulator reply latency (s).')
+    parser.add_option('--service-time', type='float', default=0.002,
+                      help='Simulator time per command, commands on a connection are served in order (s).')
+    options, args = parser.parse_args()
+
+    server = TPLServer(latency=options.latency, service_time=options.service_time).start()
+    results = {'threads': options.threads,
+               'latency_s': options.latency,
+               'service_time_s': options.service_time}
+    try:
+        for name, quota, urgent, priority in MODES:
+            results[name] = bench(server, quota, urgent, priority, options)
+    finally:
+        server.stop()
+
+    print json.dumps(results, indent=2, sort_keys=True)
+
+
+if __name__ == '__main__':
+    main()
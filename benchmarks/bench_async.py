@@ -0,0 +1,115 @@
+#! /usr/bin/env python
+# -*- coding: iso-8859-1 -*-
+
+'''
+Watching many objects on several TSI servers: one thread per object and server on the threaded TPL against
+AsyncTPL in a single thread. Each simulated server has --latency reply latency, every object is read
+--reads times. Reports wall time (ms), reads per second and the threads in the process, simulators included.
+
+Needs trollius for AsyncTPL.
+
+::
+
+    python benchmarks/bench_async.py --servers 4 --objects 50
+'''
+
+import os
+import sys
+import json
+import time
+import threading
+from optparse import OptionParser
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import trollius as asyncio
+from trollius import From
+
+from chimera_astelco.instruments.tpl import TPL
+from chimera_astelco.instruments.tplasync import AsyncTPL
+from chimera_astelco.util.tplsim import TPLServer, default_objects, FLOAT
+
+
+def objects(count):
+    return ['BENCH.OBJECT[%i].VALUE' % n for n in range(count)]
+
+
+def bench_threads(servers, names, reads):
+    tpls = []
+    for server in servers:
+        tpl = TPL()
+        tpl['tpl_host'] = server.host
+        tpl['tpl_port'] = server.port
+        tpl.__start__()
+        tpls.append(tpl)
+
+    def watch(tpl, name):
+        for i in range(reads):
+            tpl.getobject(name)
+
+    threads = [threading.Thread(target=watch, args=(tpl, name)) for tpl in tpls for name in names]
+    start = time.time()
+    for thread in threads:
+        thread.start()
+    nthreads = threading.activeCount()
+    for thread in threads:
+        thread.join()
+    elapsed = time.time() - start
+
+    for tpl in tpls:
+        tpl.__stop__()
+
+    return {'ms': elapsed * 1e3,
+            'reads_per_s': len(threads) * reads / elapsed,
+            'threads': nthreads}
+
+
+def bench_async(servers, names, reads):
+    loop = asyncio.get_event_loop()
+    tpls = [AsyncTPL(server.host, server.port, loop=loop) for server in servers]
+
+    @asyncio.coroutine
+    def watch(tpl, name):
+        for i in range(reads):
+            yield From(tpl.getobject(name))
+
+    loop.run_until_complete(asyncio.gather(*[tpl.connect() for tpl in tpls]))
+    start = time.time()
+    loop.run_until_complete(asyncio.gather(*[watch(tpl, name) for tpl in tpls for name in names]))
+    elapsed = time.time() - start
+    nthreads = threading.activeCount()
+    loop.run_until_complete(asyncio.gather(*[tpl.close() for tpl in tpls]))
+
+    return {'ms': elapsed * 1e3,
+            'reads_per_s': len(tpls) * len(names) * reads / elapsed,
+            'threads': nthreads}
+
+
+def main():
+    parser = OptionParser(usage='%prog [options]')
+    parser.add_option('--servers', type='int', default=4, help='Simulated TSI servers.')
+    parser.add_option('--objects', type='int', default=50, help='Objects watched on each server.')
+    parser.add_option('--reads', type='int', default=10, help='Reads of each object.')
+    parser.add_option('--latency', type='float', default=0.01, help='Simulator reply latency (s).')
+    options, args = parser.parse_args()
+
+    names = objects(options.objects)
+    table = default_objects()
+    table.update(dict([(name, [FLOAT, 1.]) for name in names]))
+
+    servers = [TPLServer(objects=table, latency=options.latency).start() for i in range(options.servers)]
+    results = {'servers': options.servers,
+               'objects': options.objects,
+               'latency_s': options.latency}
+    try:
+        results['threads'] = bench_threads(servers, names, options.reads)
+        results['async'] = bench_async(servers, names, options.reads)
+    finally:
+        for server in servers:
+            server.stop()
+
+    print json.dumps(results, indent=2, sort_keys=True)
+
+
+if __name__ == '__main__':
+    main()
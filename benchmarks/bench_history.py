@@ -0,0 +1,109 @@
+#! /usr/bin/env python
+# -*- coding: iso-8859-1 -*-
+
+'''
+Memory held by the TPL command history: bytes per retained, completed GET command at history sizes of 1k, 10k
+and 100k, for
+
+    dict        - the previous Command (instance __dict__, completion Event kept alive)
+    slots       - Command with __slots__, Event dropped on completion
+    slots-lines - same, with keep_received = False (raw reply lines not retained)
+
+Each measurement runs in a fresh child process and reports the growth of its resident set size.
+'''
+
+import os
+import sys
+import time
+import threading
+import subprocess
+from optparse import OptionParser, SUPPRESS_HELP
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from chimera_astelco.instruments.tpl import Command, CommandHistory
+
+OBJECT = 'POSITION.HORIZONTAL.AZ'
+
+
+class DictCommand():
+
+    def __init__(self):
+        self.id = 0
+        self.cmd = None
+        self.object = None
+        self.received = []
+        self.events = []
+        self.dtype = str
+        self.status = None
+        self.allstatus = []
+        self.ok = False
+        self.complete = False
+        self.data = []
+        self.values = {}
+        self.types = {}
+        self.send_time = time.time()
+        self._done = threading.Event()
+
+    def setComplete(self):
+        self.complete = True
+        self._done.set()
+
+
+def fill(cmd, cmdid, keep_received):
+    cmd.id = cmdid
+    cmd.cmd = 'GET'
+    cmd.object = OBJECT
+    if keep_received:
+        cmd.received.extend(['%i COMMAND OK' % cmdid,
+                             '%i DATA INLINE %s!TYPE=2' % (cmdid, OBJECT),
+                             '%i DATA INLINE %s=%f' % (cmdid, OBJECT, cmdid * 1e-3),
+                             '%i COMMAND COMPLETE' % cmdid])
+    cmd.dtype = float
+    cmd.types[OBJECT] = float
+    cmd.data.append(cmdid * 1e-3)
+    cmd.values[OBJECT] = cmd.data[0]
+    cmd.allstatus.extend(['OK', 'COMPLETE'])
+    cmd.status = 'COMPLETE'
+    cmd.ok = True
+    cmd.setComplete()
+    return cmd
+
+
+def rss():
+    return int(open('/proc/self/statm').read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+
+
+def child(kind, history):
+    factory = DictCommand if kind == 'dict' else Command
+    keep_received = kind != 'slots-lines'
+
+    commands = CommandHistory(history)
+    start = rss()
+    for cmdid in range(1, history + 1):
+        commands.add(fill(factory(), cmdid, keep_received))
+    return (rss() - start) / float(history)
+
+
+def main():
+    parser = OptionParser(usage='%prog [options]')
+    parser.add_option('--child', nargs=2, default=None, help=SUPPRESS_HELP)
+    options, args = parser.parse_args()
+
+    if options.child:
+        print child(options.child[0], int(options.child[1]))
+        return
+
+    kinds = ['dict', 'slots', 'slots-lines']
+    print '%10s' % 'history' + ''.join(['%14s' % kind for kind in kinds]) + '   [bytes/command]'
+    for history in [1000, 10000, 100000]:
+        row = '%10i' % history
+        for kind in kinds:
+            out = subprocess.check_output([sys.executable, os.path.abspath(__file__),
+                                           '--child', kind, str(history)])
+            row += '%14.0f' % float(out)
+        print row
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,140 @@
+#! /usr/bin/env python
+# -*- coding: iso-8859-1 -*-
+
+'''
+Cost of the TPL wire trace on the I/O path. Several threads keep reading objects from the simulator while the
+time spent in control() and in the dispatch of each batch of received lines is measured:
+
+    off      - no trace file
+    sync     - every message written by a FileHandler on the calling thread (the old trace)
+    queue    - every message, through the queue and the writer thread (debug_log)
+    sampled  - queue, one in --sample sent and received lines
+
+Reports p50/p99 (ms) of control() and dispatch, and reads per second. The trace files go to a temporary
+directory that is removed afterwards.
+
+::
+
+    python benchmarks/bench_log.py
+'''
+
+import os
+import sys
+import json
+import time
+import shutil
+import logging
+import tempfile
+import threading
+from optparse import OptionParser
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from chimera_astelco.instruments.tpl import TPL
+from chimera_astelco.instruments.tpllog import TraceSampler
+from chimera_astelco.util.tplsim import TPLServer
+
+OBJECTS = ['POSITION.HORIZONTAL.AZ', 'POSITION.HORIZONTAL.ALT', 'TELESCOPE.READY', 'TELESCOPE.MOTION_STATE'] + \
+          ['AUXILIARY.SENSOR[%i].VALUE' % n for n in range(1, 8)]
+
+OLD_FORMAT = '%(asctime)s[%(levelname)s:%(threadName)s]-%(name)s-(%(filename)s:%(lineno)d):: %(message)s'
+
+
+def percentile(values, p):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(p / 100. * (len(values) - 1))))]
+
+
+def timed(method, times):
+    def wrapper(*args, **kwargs):
+        start = time.time()
+        try:
+            return method(*args, **kwargs)
+        finally:
+            times.append((time.time() - start) * 1e3)
+    return wrapper
+
+
+def bench(server, mode, directory, options):
+    tpl = TPL()
+    tpl['tpl_host'] = server.host
+    tpl['tpl_port'] = server.port
+    tpl['freq'] = options.freq
+    tpl['debug_log'] = os.path.join(directory, '%s_%%03i.log' % mode) if mode in ('queue', 'sampled') else ''
+    if mode == 'sampled':
+        tpl['debug_trace'] = 'send=%i, recv=%i, dispatch=1, control=1' % (options.sample, options.sample)
+
+    controls = []
+    dispatches = []
+    tpl.control = timed(tpl.control, controls)
+    tpl._dispatch = timed(tpl._dispatch, dispatches)
+
+    tpl.__start__()
+    handler = None
+    if mode == 'sync':
+        handler = logging.FileHandler(os.path.join(directory, 'sync.log'))
+        handler.setFormatter(logging.Formatter(fmt=OLD_FORMAT))
+        tpl._debuglog.addHandler(handler)
+        # trace lines straight to the logger, as before the trace queue
+        tpl._tracelog = tpl._debuglog
+        tpl._trace = TraceSampler('send=1, recv=1, dispatch=1, control=1')
+
+    loop = threading.Thread(target=tpl.__main__, name='TPL control')
+    loop.setDaemon(True)
+    loop.start()
+
+    stop = threading.Event()
+    reads = [0]
+
+    def read(objects):
+        while not stop.isSet():
+            tpl.getobjects(objects)
+            reads[0] += 1
+
+    # a different order per thread, so they do not share their GETs
+    readers = [threading.Thread(target=read, args=(OBJECTS[i:] + OBJECTS[:i],)) for i in range(options.threads)]
+    start = time.time()
+    for reader in readers:
+        reader.start()
+    time.sleep(options.duration)
+    stop.set()
+    for reader in readers:
+        reader.join()
+    elapsed = time.time() - start
+
+    tpl.__abort_loop__()
+    tpl.__stop__()
+    if handler is not None:
+        tpl._debuglog.removeHandler(handler)
+        handler.close()
+
+    return {'control_p50_ms': percentile(controls, 50),
+            'control_p99_ms': percentile(controls, 99),
+            'dispatch_p50_ms': percentile(dispatches, 50),
+            'dispatch_p99_ms': percentile(dispatches, 99),
+            'reads_per_s': reads[0] / elapsed}
+
+
+def main():
+    parser = OptionParser(usage='%prog [options]')
+    parser.add_option('--threads', type='int', default=4, help='Reading threads.')
+    parser.add_option('--duration', type='float', default=3., help='Seconds per mode.')
+    parser.add_option('--freq', type='float', default=20., help='control() frequency (Hz).')
+    parser.add_option('--sample', type='int', default=10, help='One in N lines traced in the sampled mode.')
+    options, args = parser.parse_args()
+
+    directory = tempfile.mkdtemp(prefix='bench_log')
+    server = TPLServer().start()
+    results = {'threads': options.threads}
+    try:
+        for mode in ('off', 'sync', 'queue', 'sampled'):
+            results[mode] = bench(server, mode, directory, options)
+    finally:
+        server.stop()
+        shutil.rmtree(directory)
+
+    print json.dumps(results, indent=2, sort_keys=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,88 @@
+#! /usr/bin/env python
+# -*- coding: iso-8859-1 -*-
+
+'''
+Replay a TPL2 reply stream through TPLParser.
+
+Checks that every possible split point of a sample of the stream produces exactly the same records as
+parsing it in one piece, then measures throughput on increasingly large streams fed in socket-sized chunks
+to show that the cost is linear on the amount of data. A recorded stream can be given with --file, otherwise
+a synthetic one is generated.
+'''
+
+import os
+import sys
+import time
+import random
+from optparse import OptionParser
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from chimera_astelco.instruments.tplparser import TPLParser
+
+import tplstream
+
+
+def records(parser, pieces):
+    ret = []
+    for piece in pieces:
+        ret.extend([rec.line for rec in parser.feed(piece)])
+    return ret
+
+
+def check_splits(sample):
+    reference = records(TPLParser(), [sample])
+    nsplits = 0
+    for i in range(len(sample) + 1):
+        parser = TPLParser()
+        if records(parser, [sample[:i], sample[i:]]) != reference or parser.pending():
+            raise AssertionError('Parser output differs when splitting at byte %i.' % i)
+        nsplits += 1
+    return nsplits, len(reference)
+
+
+def throughput(data, chunksize, rnd):
+    pieces = list(tplstream.chunks(data, rnd, 1, chunksize))
+    parser = TPLParser()
+    start = time.time()
+    nrec = 0
+    for piece in pieces:
+        for rec in parser.feed(piece):
+            nrec += 1
+    elapsed = time.time() - start
+    return nrec, elapsed
+
+
+def main():
+    parser = OptionParser(usage='%prog [options]')
+    parser.add_option('-f', '--file', default=None, help='Recorded reply stream to replay.')
+    parser.add_option('-s', '--size', type='float', default=8., help='Largest synthetic stream size (MB).')
+    parser.add_option('-c', '--chunk', type='int', default=4096, help='Largest read size (bytes).')
+    parser.add_option('--sample', type='int', default=4096, help='Bytes of the stream checked at every split.')
+    options, args = parser.parse_args()
+
+    rnd = random.Random(1)
+
+    if options.file:
+        data = open(options.file, 'rb').read()
+        streams = [data]
+    else:
+        data, nlines = tplstream.stream(nbytes=int(options.size * 2 ** 20))
+        streams = []
+        size = len(data)
+        while size > 2 ** 19:
+            streams.insert(0, data[:data.rfind('\n', 0, size) + 1])
+            size /= 2
+
+    nsplits, nrec = check_splits(data[:data.rfind('\n', 0, options.sample) + 1])
+    print 'split points: %i checked on %i lines, all identical' % (nsplits, nrec)
+
+    print '%10s %10s %10s %12s %10s' % ('size [MB]', 'lines', 'time [s]', 'lines/s', 'MB/s')
+    for data in streams:
+        nrec, elapsed = throughput(data, options.chunk, rnd)
+        mb = len(data) / 2. ** 20
+        print '%10.2f %10i %10.3f %12.0f %10.2f' % (mb, nrec, elapsed, nrec / elapsed, mb / elapsed)
+
+
+if __name__ == '__main__':
+    main()
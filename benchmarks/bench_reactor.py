@@ -0,0 +1,109 @@
+#! /usr/bin/env python
+# -*- coding: iso-8859-1 -*-
+
+'''
+TPL instances with their own reader and poller threads against the same instances on the shared reactor.
+For each mode --servers simulated TSI servers get one TPL each, every TPL follows one live object the server
+does not push (so it is polled) and one it does. Reports the TPL threads (control loops included), getobject()
+latency (p50/p99, ms) with one caller per server, and for the reactor its wake-ups per second while idle.
+
+::
+
+    python benchmarks/bench_reactor.py --servers 8
+'''
+
+import os
+import sys
+import json
+import time
+import threading
+from optparse import OptionParser
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from chimera_astelco.instruments.tpl import TPL
+from chimera_astelco.instruments.tplreactor import TPLReactor
+from chimera_astelco.util.tplsim import TPLServer
+
+PUSHED = 'POSITION.HORIZONTAL.AZ'
+POLLED = 'AUXILIARY.SENSOR[1].VALUE'
+
+
+def percentile(values, p):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(p / 100. * (len(values) - 1))))]
+
+
+def bench(servers, reactor, options):
+    tpls = []
+    for server in servers:
+        tpl = TPL()
+        tpl['tpl_host'] = server.host
+        tpl['tpl_port'] = server.port
+        tpl['reactor'] = reactor
+        tpl.__start__()
+        loop = threading.Thread(target=tpl.__main__, name='TPL control')
+        loop.setDaemon(True)
+        loop.start()
+        tpls.append(tpl)
+
+    for tpl in tpls:
+        tpl.subscribe(PUSHED)
+        with tpl._cmdlock:
+            tpl._polled.add(POLLED)
+            tpl._live[POLLED] = (None, 0.)
+
+    names = [thread.getName() for thread in threading.enumerate()]
+    results = {'threads': len([name for name in names if name.startswith('TPL') and 'simulator' not in name])}
+
+    if reactor:
+        shared = TPLReactor.shared()
+        time.sleep(1.)
+        wakeups = shared.wakeups
+        time.sleep(options.idle)
+        results['wakeups_per_s'] = (shared.wakeups - wakeups) / options.idle
+
+    times = []
+
+    def read(tpl):
+        for i in range(options.count):
+            start = time.time()
+            tpl.getobject('TELESCOPE.READY')
+            times.append((time.time() - start) * 1e3)
+
+    callers = [threading.Thread(target=read, args=(tpl,)) for tpl in tpls]
+    for caller in callers:
+        caller.start()
+    for caller in callers:
+        caller.join()
+
+    for tpl in tpls:
+        tpl.__abort_loop__()
+        tpl.__stop__()
+
+    results['p50_ms'] = percentile(times, 50)
+    results['p99_ms'] = percentile(times, 99)
+    return results
+
+
+def main():
+    parser = OptionParser(usage='%prog [options]')
+    parser.add_option('--servers', type='int', default=8, help='Simulated TSI servers, one TPL each.')
+    parser.add_option('-n', '--count', type='int', default=500, help='getobject() calls per server.')
+    parser.add_option('--idle', type='float', default=3., help='Seconds to count reactor wake-ups.')
+    options, args = parser.parse_args()
+
+    servers = [TPLServer(subscriptions=True).start() for i in range(options.servers)]
+    results = {'servers': options.servers}
+    try:
+        results['threads'] = bench(servers, False, options)
+        results['reactor'] = bench(servers, True, options)
+    finally:
+        for server in servers:
+            server.stop()
+
+    print json.dumps(results, indent=2, sort_keys=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,96 @@
+#! /usr/bin/env python
+# -*- coding: iso-8859-1 -*-
+
+'''
+Parse throughput (lines/s) of the TPL2 reply tokenizer against the previous per-line parsing, which ran up to
+four uncompiled re.search() per line in expect() and then classified the same line again with substring
+tests in control().
+'''
+
+import os
+import re
+import sys
+import time
+from optparse import OptionParser
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from chimera_astelco.instruments.tplparser import TPLParser, DATA, COMMAND, EVENT
+
+import tplstream
+
+OLD_REPLIES = ['(?P<CMDID>\d+) DATA INLINE (?P<OBJECT>\S+)=(?P<VALUE>.+)',
+               '(?P<CMDID>\d+) DATA OK (?P<OBJECT>\S+)',
+               '(?P<CMDID>\d+) COMMAND (?P<STATUS>\S+)',
+               '(?P<CMDID>\d+) EVENT ERROR (?P<OBJECT>\S+):(?P<ENCM>(.*?)\s*)']
+
+
+def parse_regex(data):
+    n = 0
+    for line in data.split('\n'):
+        if len(line) < 1:
+            continue
+        for exp in OLD_REPLIES:
+            re_exp = re.search(exp, line)
+            if re_exp:
+                break
+        else:
+            continue
+        cmdid = int(re_exp.group('CMDID'))
+        if 'DATA INLINE' in line:
+            if '!TYPE' in line:
+                value = re_exp.group('VALUE')
+            else:
+                value = re_exp.group('VALUE')
+        elif 'COMMAND' in line:
+            value = re_exp.group('STATUS')
+        elif 'EVENT ERROR' in line:
+            value = re_exp.group('ENCM')
+        n += 1
+    return n
+
+
+def parse_tokenizer(data):
+    n = 0
+    for rec in TPLParser().feed(data):
+        cmdid = rec.cmdid
+        if rec.kind == DATA:
+            if rec.object.endswith('!TYPE'):
+                value = rec.value
+            else:
+                value = rec.value
+        elif rec.kind == COMMAND:
+            value = rec.status
+        elif rec.kind == EVENT:
+            value = rec.value
+        n += 1
+    return n
+
+
+def main():
+    parser = OptionParser(usage='%prog [options]')
+    parser.add_option('-n', '--nlines', type='int', default=1000000, help='Lines in the synthetic stream.')
+    parser.add_option('-r', '--repeat', type='int', default=3, help='Best of REPEAT runs.')
+    options, args = parser.parse_args()
+
+    data, nlines = tplstream.stream(nlines=options.nlines)
+    print 'stream: %i lines, %.1f MB' % (nlines, len(data) / 2. ** 20)
+
+    results = {}
+    for name, parse in [('regex', parse_regex), ('tokenizer', parse_tokenizer)]:
+        best = None
+        for i in range(options.repeat):
+            start = time.time()
+            n = parse(data)
+            elapsed = time.time() - start
+            best = elapsed if best is None else min(best, elapsed)
+        if n != nlines:
+            raise AssertionError('%s parsed %i of %i lines.' % (name, n, nlines))
+        results[name] = nlines / best
+        print '%-10s %12.0f lines/s' % (name, results[name])
+
+    print 'speedup: %.1fx' % (results['tokenizer'] / results['regex'])
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,330 @@
+#! /usr/bin/env python
+# -*- coding: iso-8859-1 -*-
+
+'''
+TPL client benchmark suite. Drives a TPL instance against the local TPL2 simulator (or a recorded reply stream
+for the parser) and reports, as JSON:
+
+    getobject   - round-trip latency of getobject() (p50/p90/p99, ms)
+    throughput  - sustained getobject() calls per second, by number of threads (1, 4 and 16)
+    control     - cost of one control() tick (us), by size of the command history
+    expect      - parse throughput of expect() on a reply stream (lines/s, MB/s)
+    reconnect   - time of a reconnecting control() tick, and from a dropped connection to the next good reply (ms)
+    pipeline    - slew target set up (SET RA, DEC and EPOCH) one command at a time and pipelined,
+                  against a simulator with --rtt reply latency (ms)
+
+Results of two runs can be compared with --compare, e.g.:
+
+::
+
+    python benchmarks/bench_tpl.py -o base.json
+    python benchmarks/bench_tpl.py --compare base.json
+'''
+
+import os
+import sys
+import json
+import time
+import heapq
+import random
+import platform
+import threading
+import subprocess
+from optparse import OptionParser
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, ROOT)
+
+from chimera_astelco.instruments.tpl import TPL, Command
+from chimera_astelco.util.tplsim import TPLServer
+
+import tplstream
+
+OBJECT = 'POSITION.HORIZONTAL.AZ'
+
+SECTIONS = ('getobject', 'throughput', 'control', 'expect', 'reconnect', 'pipeline')
+
+# numbers where higher is better, lower is better for the rest
+HIGHER = ('per_s', 'lines_s', 'mb_s')
+
+
+def percentile(values, p):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(p / 100. * (len(values) - 1))))]
+
+
+def start_tpl(server, freq):
+    tpl = TPL()
+    tpl['tpl_host'] = server.host
+    tpl['tpl_port'] = server.port
+    tpl['freq'] = freq
+    tpl.__start__()
+    loop = threading.Thread(target=tpl.__main__, name='TPL control')
+    loop.setDaemon(True)
+    loop.start()
+    return tpl
+
+
+def stop_tpl(tpl):
+    tpl.__abort_loop__()
+    tpl.__stop__()
+
+
+def bench_getobject(tpl, count):
+    for i in range(min(100, count)):
+        tpl.getobject(OBJECT)
+    times = []
+    for i in range(count):
+        start = time.time()
+        tpl.getobject(OBJECT)
+        times.append((time.time() - start) * 1e3)
+    return {'count': count,
+            'p50_ms': percentile(times, 50),
+            'p90_ms': percentile(times, 90),
+            'p99_ms': percentile(times, 99),
+            'max_ms': max(times)}
+
+
+def bench_throughput(tpl, nthreads, duration):
+    counts = [0] * nthreads
+    stop = threading.Event()
+
+    def worker(n):
+        while not stop.isSet():
+            tpl.getobject(OBJECT)
+            counts[n] += 1
+
+    threads = [threading.Thread(target=worker, args=(n,)) for n in range(nthreads)]
+    start = time.time()
+    for thread in threads:
+        thread.start()
+    time.sleep(duration)
+    stop.set()
+    for thread in threads:
+        thread.join()
+    elapsed = time.time() - start
+    return {'threads': nthreads, 'gets': sum(counts), 'per_s': sum(counts) / elapsed}
+
+
+def bench_control(tpl, history, npending, ticks):
+    '''
+        Fill the history with completed commands, keep npending in flight and time control().
+    '''
+    tpl['history'] = history
+
+    # ids are taken before _cmdlock, the same order as sendcomm()
+    done = []
+    for i in range(history):
+        cmd = Command()
+        cmd.id = tpl.getNextID()
+        cmd.cmd = 'GET'
+        cmd.object = OBJECT
+        cmd.ok = True
+        cmd.status = 'COMPLETE'
+        cmd.setComplete()
+        done.append(cmd)
+
+    # never answered, deadlines far in the future
+    pending = []
+    for i in range(npending):
+        cmd = Command()
+        cmd.id = tpl.getNextID()
+        pending.append(cmd)
+
+    with tpl._cmdlock:
+        tpl.commands_sent.maxlen = history
+        for cmd in done:
+            tpl.commands_sent.add(cmd)
+        for cmd in pending:
+            tpl.commands_sent.add(cmd)
+            tpl._pending[cmd.id] = cmd
+            heapq.heappush(tpl._deadlines, (time.time() + 3600., cmd.id))
+
+    for i in range(ticks / 10):
+        tpl.control()
+
+    start = time.time()
+    for i in range(ticks):
+        tpl.control()
+    elapsed = time.time() - start
+
+    with tpl._cmdlock:
+        for cmd in pending:
+            tpl._complete(cmd)
+
+    return {'history': history, 'pending': npending, 'tick_us': elapsed / ticks * 1e6}
+
+
+class ReplaySocket(object):
+    '''
+        Stand-in for the telnet connection that hands out a recorded stream, one read at a time.
+    '''
+
+    def __init__(self, pieces):
+        self.pieces = pieces
+        self.i = 0
+        self.give = True
+
+    def read_very_eager(self):
+        # one chunk per expect() call, then the empty read that ends it
+        if self.give and self.i < len(self.pieces):
+            self.give = False
+            self.i += 1
+            return self.pieces[self.i - 1]
+        self.give = True
+        return ''
+
+    def done(self):
+        return self.i >= len(self.pieces)
+
+
+def bench_expect(tpl, data, chunksize):
+    pieces = list(tplstream.chunks(data, random.Random(1), 1, chunksize))
+    sock, tpl.sock = tpl.sock, ReplaySocket(pieces)
+    tpl._parser.reset()
+    nrec = 0
+    try:
+        start = time.time()
+        while not tpl.sock.done():
+            nrec += len(tpl.expect())
+        elapsed = time.time() - start
+    finally:
+        tpl.sock = sock
+        tpl._parser.reset()
+    mb = len(data) / 2. ** 20
+    return {'mb': mb, 'lines': nrec, 'lines_s': nrec / elapsed, 'mb_s': mb / elapsed}
+
+
+def bench_reconnect(tpl, server, repeat):
+    connect = []
+    recovery = []
+    for i in range(repeat):
+        # the reconnect path of control(): the reader idles while the flag is set
+        tpl._reconnect.set()
+        start = time.time()
+        tpl.control()
+        connect.append((time.time() - start) * 1e3)
+
+        server.disconnect()
+        start = time.time()
+        while True:
+            cmdid = tpl.get(OBJECT, wait=True)
+            if tpl.succeeded(cmdid):
+                break
+        recovery.append((time.time() - start) * 1e3)
+    return {'connect_ms': percentile(connect, 50), 'recovery_ms': percentile(recovery, 50),
+            'recovery_max_ms': max(recovery)}
+
+
+SLEW = [('SET', 'OBJECT.EQUATORIAL.RA', 12.5),
+        ('SET', 'OBJECT.EQUATORIAL.DEC', -30.),
+        ('SET', 'OBJECT.EQUATORIAL.EPOCH', 2000.)]
+
+
+def bench_pipeline(tpl, repeat):
+    serial = []
+    pipelined = []
+    for i in range(repeat):
+        start = time.time()
+        for command in SLEW:
+            tpl.set(command[1], command[2], wait=True)
+        serial.append((time.time() - start) * 1e3)
+
+        start = time.time()
+        tpl.pipeline(SLEW)
+        pipelined.append((time.time() - start) * 1e3)
+
+    return {'serial_ms': percentile(serial, 50), 'pipelined_ms': percentile(pipelined, 50)}
+
+
+def revision():
+    try:
+        return subprocess.Popen(['git', 'describe', '--always', '--dirty'], cwd=ROOT, stdout=subprocess.PIPE,
+                                stderr=subprocess.PIPE).communicate()[0].strip()
+    except OSError:
+        return None
+
+
+def compare(base, results, tolerance, prefix=''):
+    '''
+        Print every measured number in results next to the one in base and their ratio, flagging changes for
+        the worse beyond tolerance.
+    '''
+    if isinstance(results, dict):
+        for key in sorted(results):
+            if key in base and (prefix or key in SECTIONS):
+                compare(base[key], results[key], tolerance, '%s.%s' % (prefix, key) if prefix else key)
+    elif isinstance(results, float) and isinstance(base, (int, float)) and base:
+        ratio = results / base
+        worse = ratio < 1. - tolerance if prefix.endswith(HIGHER) else ratio > 1. + tolerance
+        print '%-40s %12.3f %12.3f %8.2fx %s' % (prefix, base, results, ratio, '<--' if worse else '')
+
+
+def main():
+    parser = OptionParser(usage='%prog [options]')
+    parser.add_option('-o', '--output', default=None, help='Write JSON results here (default stdout).')
+    parser.add_option('--compare', default=None, help='Earlier JSON results to compare against.')
+    parser.add_option('--tolerance', type='float', default=0.1, help='Relative change flagged by --compare.')
+    parser.add_option('-n', '--count', type='int', default=2000, help='getobject() calls for the latency test.')
+    parser.add_option('-d', '--duration', type='float', default=3., help='Seconds per throughput run.')
+    parser.add_option('--threads', default='1,4,16', help='Thread counts for the throughput test.')
+    parser.add_option('--history', default='1000,10000,100000', help='History sizes for the control() test.')
+    parser.add_option('--pending', type='int', default=16, help='Commands in flight during the control() test.')
+    parser.add_option('--ticks', type='int', default=1000, help='control() calls per history size.')
+    parser.add_option('--latency', type='float', default=0., help='Simulator reply latency (s).')
+    parser.add_option('--freq', type='float', default=None, help='TPL control loop frequency (default: TPL).')
+    parser.add_option('-f', '--file', default=None, help='Recorded reply stream for the expect() test.')
+    parser.add_option('-s', '--size', type='float', default=4., help='Synthetic stream size for expect() (MB).')
+    parser.add_option('--reconnects', type='int', default=5, help='Dropped connections to time.')
+    parser.add_option('--rtt', type='float', default=0.01, help='Simulator reply latency for the pipeline test (s).')
+    options, args = parser.parse_args()
+
+    server = TPLServer(latency=options.latency).start()
+    tpl = start_tpl(server, options.freq or TPL.__config__['freq'])
+
+    if options.file:
+        data = open(options.file, 'rb').read()
+    else:
+        data = tplstream.stream(nbytes=int(options.size * 2 ** 20))[0]
+
+    results = {'revision': revision(),
+               'python': platform.python_version(),
+               'platform': platform.platform(),
+               'time': time.strftime('%Y-%m-%dT%H:%M:%S'),
+               'latency_s': options.latency,
+               'freq_hz': tpl['freq']}
+    try:
+        results['getobject'] = bench_getobject(tpl, options.count)
+        results['throughput'] = dict([(n, bench_throughput(tpl, int(n), options.duration))
+                                      for n in options.threads.split(',')])
+        results['expect'] = bench_expect(tpl, data, 4096)
+        results['reconnect'] = bench_reconnect(tpl, server, options.reconnects)
+        results['control'] = dict([(n, bench_control(tpl, int(n), options.pending, options.ticks))
+                                   for n in options.history.split(',')])
+    finally:
+        stop_tpl(tpl)
+        server.stop()
+
+    server = TPLServer(latency=options.rtt).start()
+    tpl = start_tpl(server, options.freq or TPL.__config__['freq'])
+    results['rtt_s'] = options.rtt
+    try:
+        results['pipeline'] = bench_pipeline(tpl, 20)
+    finally:
+        stop_tpl(tpl)
+        server.stop()
+
+    out = json.dumps(results, indent=2, sort_keys=True)
+    if options.output:
+        with open(options.output, 'w') as fp:
+            fp.write(out + '\n')
+    else:
+        print out
+
+    if options.compare:
+        print '%-40s %12s %12s %9s' % ('', 'base', 'this', 'ratio')
+        compare(json.load(open(options.compare)), results, options.tolerance)
+
+
+if __name__ == '__main__':
+    main()
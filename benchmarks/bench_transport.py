@@ -0,0 +1,93 @@
+#! /usr/bin/env python
+# -*- coding: iso-8859-1 -*-
+
+'''
+CPU cost per received byte of the TPL transport, telnetlib.Telnet against the raw TPLSocket.
+
+A child process streams a synthetic TPL2 reply stream as fast as it can; the client drains it with the same
+loop as the TPL reader thread (select, then read_very_eager() until it returns nothing), optionally feeding
+TPLParser. Since the server runs in another process, the process CPU time of the client is the transport
+cost alone.
+'''
+
+import os
+import sys
+import time
+import select
+import socket
+import telnetlib
+import multiprocessing
+from optparse import OptionParser
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from chimera_astelco.instruments.tplparser import TPLParser
+from chimera_astelco.instruments.tpltransport import TPLSocket
+
+import tplstream
+
+
+def serve(listener, data):
+    conn = listener.accept()[0]
+    conn.sendall(data)
+    conn.close()
+
+
+def drain(conn, parser):
+    nbytes = 0
+    while True:
+        select.select([conn], [], [])
+        try:
+            recv = conn.read_very_eager()
+            while recv != '':
+                nbytes += len(recv)
+                if parser is not None:
+                    for rec in parser.feed(recv):
+                        pass
+                recv = conn.read_very_eager()
+        except EOFError:
+            return nbytes
+
+
+def run(transport, data, parse):
+    listener = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    listener.bind(('127.0.0.1', 0))
+    listener.listen(1)
+    server = multiprocessing.Process(target=serve, args=(listener, data))
+    server.start()
+
+    host, port = listener.getsockname()
+    if transport == 'telnetlib':
+        conn = telnetlib.Telnet(host, port, 60)
+    else:
+        conn = TPLSocket(host, port, 60, rcvbuf=262144)
+
+    cpu, wall = time.clock(), time.time()
+    nbytes = drain(conn, TPLParser() if parse else None)
+    cpu, wall = time.clock() - cpu, time.time() - wall
+
+    conn.close()
+    server.join()
+    listener.close()
+
+    assert nbytes == len(data), (nbytes, len(data))
+    return cpu, wall
+
+
+def main():
+    parser = OptionParser(usage='%prog [options]')
+    parser.add_option('-s', '--size', type='float', default=2., help='Stream size (MB).')
+    parser.add_option('-r', '--repeat', type='int', default=3, help='Runs per transport, the best is reported.')
+    parser.add_option('-p', '--parse', action='store_true', default=False, help='Feed the parser too.')
+    options, args = parser.parse_args()
+
+    data = tplstream.stream(nbytes=int(options.size * 2 ** 20))[0]
+
+    print '%-10s %12s %10s %10s' % ('transport', 'CPU [ns/B]', 'CPU [s]', 'MB/s')
+    for transport in ('telnetlib', 'socket'):
+        cpu, wall = min([run(transport, data, options.parse) for i in range(options.repeat)])
+        print '%-10s %12.2f %10.3f %10.1f' % (transport, cpu / len(data) * 1e9, cpu, len(data) / 2. ** 20 / wall)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,96 @@
+#! /usr/bin/env python
+# -*- coding: iso-8859-1 -*-
+
+'''
+Compare the ways a caller can wait for a TPL Command to complete:
+
+    spin  - the old TPL.get/set(wait=True) loop (``while status != 'COMPLETE': continue``)
+    sleep - the old TPL.getobject loop (``time.sleep(waittime)`` until complete)
+    event - Command.wait(), signalled by the receive path
+
+For each strategy a helper thread completes the command after ``delay`` seconds and we report the CPU time
+burned by the process per wait and the wake-up latency (time from completion to the waiter returning).
+'''
+
+import os
+import sys
+import time
+import threading
+from optparse import OptionParser
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from chimera_astelco.instruments.tpl import Command
+
+
+def wait_spin(cmd, waittime):
+    while cmd.status != 'COMPLETE':
+        continue
+
+
+def wait_sleep(cmd, waittime):
+    while not cmd.complete:
+        time.sleep(waittime)
+
+
+def wait_event(cmd, waittime):
+    cmd.wait()
+
+
+STRATEGIES = [('spin', wait_spin),
+              ('sleep', wait_sleep),
+              ('event', wait_event)]
+
+
+def cputime():
+    t = os.times()
+    return t[0] + t[1]
+
+
+def run(strategy, ntimes, delay, waittime):
+
+    latency = []
+    cpu = 0.
+
+    for i in range(ntimes):
+        cmd = Command()
+        done = []
+
+        def complete():
+            time.sleep(delay)
+            done.append(time.time())
+            cmd.status = 'COMPLETE'
+            cmd.setComplete()
+
+        t = threading.Thread(target=complete)
+        c0 = cputime()
+        t.start()
+        strategy(cmd, waittime)
+        woke = time.time()
+        cpu += cputime() - c0
+        t.join()
+        latency.append(woke - done[0])
+
+    latency.sort()
+    return {'cpu_per_wait': cpu / ntimes,
+            'cpu_fraction': cpu / (ntimes * delay),
+            'latency_p50': latency[len(latency) / 2],
+            'latency_max': latency[-1]}
+
+
+def main():
+    parser = OptionParser(usage='%prog [options]')
+    parser.add_option('-n', '--ntimes', type='int', default=20, help='Number of waits per strategy.')
+    parser.add_option('-d', '--delay', type='float', default=0.05, help='Time until the command completes (s).')
+    parser.add_option('-w', '--waittime', type='float', default=0.5, help='Sleep step of the sleep strategy (s).')
+    options, args = parser.parse_args()
+
+    print '%-6s %14s %10s %14s %14s' % ('wait', 'cpu/wait [ms]', 'cpu [%]', 'p50 wake [us]', 'max wake [us]')
+    for name, strategy in STRATEGIES:
+        r = run(strategy, options.ntimes, options.delay, options.waittime)
+        print '%-6s %14.3f %10.1f %14.1f %14.1f' % (name, r['cpu_per_wait'] * 1e3, r['cpu_fraction'] * 100.,
+                                                      r['latency_p50'] * 1e6, r['latency_max'] * 1e6)
+
+
+if __name__ == '__main__':
+    main()
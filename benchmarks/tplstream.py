@@ -0,0 +1,67 @@
+# -*- coding: iso-8859-1 -*-
+
+'''
+Synthetic TPL2 reply streams for the parser benchmarks.
+'''
+
+import random
+
+OBJECTS = [('POSITION.HORIZONTAL.AZ', '2', lambda r: '%.6f' % r.uniform(0., 360.)),
+           ('POSITION.HORIZONTAL.ALT', '2', lambda r: '%.6f' % r.uniform(0., 90.)),
+           ('POSITION.EQUATORIAL.RA_J2000', '2', lambda r: '%.6f' % r.uniform(0., 24.)),
+           ('POSITION.EQUATORIAL.DEC_J2000', '2', lambda r: '%.6f' % r.uniform(-90., 90.)),
+           ('TELESCOPE.MOTION_STATE', '1', lambda r: '%i' % r.randint(0, 15)),
+           ('TELESCOPE.STATUS.GLOBAL', '1', lambda r: '0'),
+           ('POINTING.TRACK', '1', lambda r: '%i' % r.randint(0, 1)),
+           ('AUXILIARY.SENSOR[1].DESCRIPTION', '3', lambda r: '"Outside temperature"'),
+           ('AUXILIARY.SENSOR[1].VALUE', '2', lambda r: '%.2f' % r.uniform(-5., 30.)),
+           ('TELESCOPE.STATUS.LIST', '3', lambda r: '"ERR_DeviceError|2|AXIS=0 POWER:OFF"')]
+
+
+def replies(cmdid, rnd):
+    '''
+        Reply lines for one command: a GET with types (most of the traffic), a SET or an error.
+    '''
+    kind = rnd.random()
+    lines = ['%i COMMAND OK' % cmdid]
+    if kind < 0.85:
+        for obj, dtype, value in rnd.sample(OBJECTS, rnd.randint(1, 3)):
+            lines.append('%i DATA INLINE %s!TYPE=%s' % (cmdid, obj, dtype))
+            lines.append('%i DATA INLINE %s=%s' % (cmdid, obj, value(rnd)))
+    elif kind < 0.97:
+        lines.append('%i DATA OK %s' % (cmdid, rnd.choice(OBJECTS)[0]))
+    else:
+        lines.append('%i EVENT ERROR %s:no such object' % (cmdid, rnd.choice(OBJECTS)[0]))
+    lines.append('%i COMMAND COMPLETE' % cmdid)
+    return lines
+
+
+def stream(nbytes=None, nlines=None, seed=0):
+    '''
+        Build a synthetic reply stream with at least nbytes bytes or nlines lines.
+
+    :return: (data, number of lines)
+    '''
+    rnd = random.Random(seed)
+    out = []
+    size = 0
+    count = 0
+    cmdid = 1
+    while (nbytes is not None and size < nbytes) or (nlines is not None and count < nlines):
+        for line in replies(cmdid, rnd):
+            out.append(line)
+            size += len(line) + 1
+            count += 1
+        cmdid += 1
+    return '\n'.join(out) + '\n', count
+
+
+def chunks(data, rnd, minsize=1, maxsize=4096):
+    '''
+        Split data in randomly sized chunks, as socket reads would.
+    '''
+    i = 0
+    while i < len(data):
+        n = rnd.randint(minsize, maxsize)
+        yield data[i:i + n]
+        i += n
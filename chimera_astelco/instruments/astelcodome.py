@@ -32,10 +32,11 @@ from chimera.instruments.dome import DomeBase
 from chimera.interfaces.dome import Mode, InvalidDomePositionException
 
 from chimera.core.lock import lock
-from chimera.core.exceptions import ObjectNotFoundException
 from chimera.core.constants import SYSTEM_CONFIG_DIRECTORY
 
 from astelcoexceptions import AstelcoException, AstelcoDomeException
+from tplproxy import TPLProxyCache
+from tpltimeline import traced
 
 
 class AstelcoDome(DomeBase):
@@ -61,6 +62,9 @@ class AstelcoDome(DomeBase):
 
         self._abort = threading.Event()
 
+        # resolved TPL proxy, health checked in the background
+        self._tplproxy = TPLProxyCache(self)
+
         self._errorNo = 0
 
         self._errorString = ""
@@ -102,6 +106,7 @@ class AstelcoDome(DomeBase):
         return True
 
     @lock
+    @traced
     def slewToAz(self, az):
         # Astelco Dome will only enable slew if it is not tracking
         # If told to slew I will check if the dome is syncronized with
@@ -142,48 +147,41 @@ class AstelcoDome(DomeBase):
             start_time = time.time()
             self._abort.clear()
             self._slewing = True
-            current_az = self.getAz()
 
             tpl = self.getTPL()
+            caller = 'AstelcoDome.slewToAz'
 
             self.slewBegin(az)
-            cmdid = tpl.set('POSITION.INSTRUMENTAL.DOME[0].TARGETPOS', '%f' % az)
-            reference_alt = Coord.fromD(0.)
-            desired_position = Position.fromAltAz(reference_alt,
-                                                  az)
-            # Wait for command to be completed
+            cmdid = tpl.set('POSITION.INSTRUMENTAL.DOME[0].TARGETPOS', '%f' % az, caller=caller)
+
+            # Wait, in the TPL, for the command to complete and the dome to arrive on the desired position
+            tolerance = tpl.getobject('POINTING.SETUP.DOME.MAX_DEVIATION', caller=caller) * 2.0
+            status, values = tpl.waitFor('POSITION.INSTRUMENTAL.DOME[0].CURRPOS', ('near', float(az), tolerance),
+                                         timeout=start_time + self._maxSlewTime - time.time(), cmdid=cmdid,
+                                         tag=self._waitTag())
+            # None once the command left the history
             cmd = tpl.getCmd(cmdid)
-            while not cmd.complete:
-                if time.time() > (start_time + self._maxSlewTime):
-                    self.log.warning('Dome syncronization timed-out...')
-                    self.slewComplete(self.getAz(), DomeStatus.ABORTED)
-                    return 0
-                cmd = tpl.getCmd(cmdid)
-
-            # time.sleep(self['stabilization_time'])
-            # Wait dome arrive on desired position
-
-            while True:
 
-                current_position = Position.fromAltAz(reference_alt,
-                                                      current_az)
-                if time.time() > (start_time + self._maxSlewTime):
-                    self.slewComplete(self.getAz(), DomeStatus.ABORTED)
-                    raise AstelcoDomeException('Dome syncronization timed-out...')
-                elif self._abort.isSet():
-                    self._slewing = False
-                    tpl.set('POSITION.INSTRUMENTAL.DOME[0].TARGETPOS', current_az)
-                    self.slewComplete(self.getAz(), DomeStatus.ABORTED)
-                    return 0
-                elif abs(current_position.angsep(desired_position)) < tpl.getobject(
-                        'POINTING.SETUP.DOME.MAX_DEVIATION') * 2.0:
-                    self._slewing = False
-                    self.slewComplete(self.getAz(), DomeStatus.OK)
-                    return 0
-                else:
-                    current_az = self.getAz()
-
-            self.slewComplete(self.getAz(), DomeStatus.OK)
+            if status == 'DONE':
+                self._slewing = False
+                self.slewComplete(self.getAz(), DomeStatus.OK)
+                return 0
+            elif status == 'ABORTED' or self._abort.isSet():
+                self._slewing = False
+                # stop where the dome is now
+                stop_az = values['POSITION.INSTRUMENTAL.DOME[0].CURRPOS']
+                if stop_az is None:
+                    stop_az = self.getAz().D
+                tpl.set('POSITION.INSTRUMENTAL.DOME[0].TARGETPOS', '%f' % stop_az, caller=caller)
+                self.slewComplete(self.getAz(), DomeStatus.ABORTED)
+                return 0
+            elif cmd is None or not cmd.complete:
+                self.log.warning('Dome syncronization timed-out...')
+                self.slewComplete(self.getAz(), DomeStatus.ABORTED)
+                return 0
+            else:
+                self.slewComplete(self.getAz(), DomeStatus.ABORTED)
+                raise AstelcoDomeException('Dome syncronization timed-out...')
 
     @lock
     def syncWithTel(self):
@@ -242,17 +240,26 @@ class AstelcoDome(DomeBase):
     def isSlewing(self):
 
         tpl = self.getTPL()
-        motionState = tpl.getobject('TELESCOPE.MOTION_STATE')
+        motionState = tpl.getlive('TELESCOPE.MOTION_STATE')
         return (motionState != 11)
 
     def abortSlew(self):
         self._abort.set()
+        tpl = self.getTPL()
+        if tpl:
+            tpl.abortWait(self._waitTag())
+
+    def _waitTag(self):
+        '''
+            Tag of the waitFor() calls of this dome, other instruments may share its TPL.
+        '''
+        return 'dome %s' % self.getLocation()
 
     @lock
     def getAz(self):
 
         tpl = self.getTPL()
-        ret = tpl.getobject('POSITION.INSTRUMENTAL.DOME[0].CURRPOS')
+        ret = tpl.getlive('POSITION.INSTRUMENTAL.DOME[0].CURRPOS')
         if ret:
             self._position = ret
         elif not self._position:
@@ -288,6 +295,7 @@ class AstelcoDome(DomeBase):
         return True
 
     @lock
+    @traced
     def openSlit(self):
 
         # check slit condition
@@ -300,30 +308,15 @@ class AstelcoDome(DomeBase):
 
         self._abort.clear()
         tpl = self.getTPL()
+        caller = 'AstelcoDome.openSlit'
 
-        cmdid = tpl.set('AUXILIARY.DOME.TARGETPOS', 2, wait=False)
+        cmdid = tpl.set('AUXILIARY.DOME.TARGETPOS', 2, wait=False, caller=caller)
 
-        time_start = time.time()
+        self.log.debug('Waiting while slit opens...')
+        status, values = tpl.waitFor('AUXILIARY.DOME.OPEN_MASK', ('set', 1 << 1), timeout=self._maxSlewTime,
+                                     cmdid=cmdid, tag=self._waitTag())
 
-        cmd = tpl.getCmd(cmdid)
-        cmdComplete = False
-        while not cmd.complete:
-
-            if self._abort.isSet():
-                return DomeStatus.ABORTED
-            elif time.time() > time_start + self._maxSlewTime:
-                return DomeStatus.TIMEOUT
-
-            cmd = tpl.getCmd(cmdid)
-        self.log.debug('Command complete... Waiting while slit opens...')
-        time_start = time.time()
-
-        while not self.isSlitOpen():
-            if time.time() > time_start + self._maxSlewTime:
-                return DomeStatus.TIMEOUT
-
-
-        return DomeStatus.OK
+        return self._domeStatus(status)
 
         # realpos = tpl.getobject('AUXILIARY.DOME.REALPOS')
         #
@@ -363,6 +356,7 @@ class AstelcoDome(DomeBase):
             # return DomeStatus.OK
 
     @lock
+    @traced
     def closeSlit(self):
         if not self.isSlitOpen():
             self.log.info('Slit already closed')
@@ -373,43 +367,17 @@ class AstelcoDome(DomeBase):
         self.log.info("Closing slit")
 
         tpl = self.getTPL()
+        caller = 'AstelcoDome.closeSlit'
 
-        realpos = tpl.getobject('AUXILIARY.DOME.REALPOS')
-
-        cmdid = tpl.set('AUXILIARY.DOME.TARGETPOS', 0, wait=False)
+        cmdid = tpl.set('AUXILIARY.DOME.TARGETPOS', 0, wait=False, caller=caller)
 
-        time_start = time.time()
+        status, values = tpl.waitFor('AUXILIARY.DOME.REALPOS', ('==', 0), timeout=self._maxSlewTime, cmdid=cmdid,
+                                     tag=self._waitTag())
 
-        cmd = tpl.getCmd(cmdid)
-
-        while not cmd.complete:
-
-            # for line in tpl.commands_sent[cmdid].received:
-            #     self.log.debug(line)
-
-            if realpos == 0:
-                return DomeStatus.OK
-            elif self._abort.isSet():
-                return DomeStatus.ABORTED
-            elif time.time() > time_start + self._maxSlewTime:
-                return DomeStatus.TIMEOUT
-
-            cmd = tpl.getCmd(cmdid)
-
-        realpos = tpl.getobject('AUXILIARY.DOME.REALPOS')
-
-        while realpos != 0:
-
-            if self._abort.isSet():
-                return DomeStatus.ABORTED
-            elif time.time() > time_start + self._maxSlewTime:
-                return DomeStatus.TIMEOUT
-
-            realpos = tpl.getobject('AUXILIARY.DOME.REALPOS')
-
-        return DomeStatus.OK
+        return self._domeStatus(status)
 
     @lock
+    @traced
     def closeFlap(self):
 
         # Todo: Implement Close Flap. Still needs to find a way to close the flap.
@@ -418,31 +386,25 @@ class AstelcoDome(DomeBase):
             return 0
 
         tpl = self.getTPL()
-        cmdid = tpl.set('AUXILIARY.DOME.TARGETPOS', 2, wait=False)
-
-        time_start = time.time()
-
-        cmd = tpl.getCmd(cmdid)
-
+        caller = 'AstelcoDome.closeFlap'
         self._abort.clear()
 
-        while not cmd.complete:
+        cmdid = tpl.set('AUXILIARY.DOME.TARGETPOS', 2, wait=False, caller=caller)
 
-            if self._abort.isSet():
-                return DomeStatus.ABORTED
-            elif time.time() > time_start + self._maxSlewTime:
-                return DomeStatus.TIMEOUT
+        status, values = tpl.waitFor('AUXILIARY.DOME.OPEN_MASK', ('clear', 1 << 2), timeout=self._maxSlewTime,
+                                     cmdid=cmdid, tag=self._waitTag())
 
-            cmd = tpl.getCmd(cmdid)
-
-        while self.isFlapOpen():
-
-            if self._abort.isSet():
-                return DomeStatus.ABORTED
-            elif time.time() > time_start + self._maxSlewTime:
-                return DomeStatus.TIMEOUT
+        return self._domeStatus(status)
 
-        return DomeStatus.OK
+    def _domeStatus(self, status):
+        '''
+        :return: DomeStatus of a TPL.waitFor() status.
+        '''
+        if status == 'DONE':
+            return DomeStatus.OK
+        elif status == 'ABORTED':
+            return DomeStatus.ABORTED
+        return DomeStatus.TIMEOUT
 
     def slitMoving(self):
         # Todo: Find command to check if slit is movng
@@ -460,14 +422,15 @@ class AstelcoDome(DomeBase):
 
     # utilitaries
     def getTPL(self):
-        try:
-            p = self.getManager().getProxy(self['tpl'], lazy=True)
-            if not p.ping():
-                return False
-            else:
-                return p
-        except ObjectNotFoundException:
-            return False
+        return self._tplproxy.get()
+
+    def getProxyStats(self):
+        '''
+            Use of the cached TPL proxy.
+
+        :return: dict with getTPL() calls, proxies resolved, pings and Pyro calls saved.
+        '''
+        return self._tplproxy.stats()
 
     def getMetadata(self, request):
         # Check first if there is metadata from an metadata override method.
@@ -29,12 +29,14 @@ from chimera.interfaces.focuser import (InvalidFocusPositionException,
 from chimera.instruments.focuser import FocuserBase
 
 from chimera.core.lock import lock
-from chimera.core.exceptions import ObjectNotFoundException
 from chimera.core.constants import SYSTEM_CONFIG_DIRECTORY
 
 from chimera.util.enum import Enum
 
 from astelcoexceptions import AstelcoException, AstelcoHexapodException
+from tplproxy import TPLProxyCache
+from tpltimeline import traced
+from tplprofile import profiled, controlprofile
 
 Direction = Enum("IN", "OUT")
 Axis = FocuserAxis #Enum("X", "Y", "Z", "U", "V")  # For hexapod
@@ -67,6 +69,9 @@ vector. Temperature compensation can also be performed.
 
                   'hexapod': True,
 
+                  'profile': False,  # time control() ticks, see TPL
+                  'profile_sample': 0.,  # seconds between control() stack samples, 0 for none
+
                   'step_x': 0.001,
                   'step_y': 0.001,
                   'step_z': 0.001,
@@ -105,6 +110,9 @@ vector. Temperature compensation can also be performed.
 
         self._abort = threading.Event()
 
+        # resolved TPL proxy, health checked in the background
+        self._tplproxy = TPLProxyCache(self)
+
         self._errorNo = 0
         self._errorString = ""
 
@@ -160,6 +168,7 @@ vector. Temperature compensation can also be performed.
 
         return True
 
+    @profiled
     @lock
     def control(self):
         '''
@@ -272,9 +281,14 @@ vector. Temperature compensation can also be performed.
     @lock
     def updatePosition(self):
         tpl = self.getTPL()
+        objects = []
         for ax in Axis:
-            self._position[ax] = tpl.getobject('POSITION.INSTRUMENTAL.FOCUS[%i].REALPOS' % ax.index)
-            self._offset[ax] = tpl.getobject('POSITION.INSTRUMENTAL.FOCUS[%i].OFFSET' % ax.index)
+            objects += ['POSITION.INSTRUMENTAL.FOCUS[%i].REALPOS' % ax.index,
+                        'POSITION.INSTRUMENTAL.FOCUS[%i].OFFSET' % ax.index]
+        values = tpl.getliveobjects(objects, background=True)
+        for ax in Axis:
+            self._position[ax] = values['POSITION.INSTRUMENTAL.FOCUS[%i].REALPOS' % ax.index]
+            self._offset[ax] = values['POSITION.INSTRUMENTAL.FOCUS[%i].OFFSET' % ax.index]
 
     @lock
     def updateTemperature(self):
@@ -282,17 +296,19 @@ vector. Temperature compensation can also be performed.
 
 
     @lock
+    @traced
     def _setPosition(self, n, axis=Axis.Z):
         self.log.info("Changing focuser offset to %s" % n)
 
         cmdid = None
         tpl = self.getTPL()
+        caller = 'AstelcoFocuser._setPosition'
 
         start = time.time()
         if self['hexapod']:
-            cmdid = tpl.set('POSITION.INSTRUMENTAL.FOCUS[%i].OFFSET' % axis.index, n)
+            cmdid = tpl.set('POSITION.INSTRUMENTAL.FOCUS[%i].OFFSET' % axis.index, n, caller=caller)
         else:
-            cmdid = tpl.set('POSITION.INSTRUMENTAL.FOCUS.OFFSET', n)
+            cmdid = tpl.set('POSITION.INSTRUMENTAL.FOCUS.OFFSET', n, caller=caller)
 
         if not cmdid:
             msg = "Could not change focus offset to %f %s" % (n * self._step[axis],
@@ -300,39 +316,31 @@ vector. Temperature compensation can also be performed.
             self.log.error(msg)
             raise InvalidFocusPositionException(msg)
 
-        MSTATE = tpl.getobject('POSITION.INSTRUMENTAL.FOCUS[%i].MOTION_STATE' % axis.index)
         mbitcode = [0, 1, 2, 3, 4]
         MMESSG = ['Axis is moving',
                   'Trajectory is running',
                   'Movement is blocked',
                   'Axis reached desired position',
                   'Axis moving too fast']
-        moving = True
         self._abort.clear()
-        cmd = tpl.getCmd(cmdid)
-        while moving:
-            if cmd.complete:
-                moving = False
-                break
-            MSTATE = tpl.getobject('POSITION.INSTRUMENTAL.FOCUS[%i].MOTION_STATE' % axis.index)
-            moving = MSTATE != 0
-            state = moving
-            msg = ''
-            for ib, bit in enumerate(mbitcode):
-                if ( MSTATE & (1 << bit) ) != 0:
-                    #STATE = False
-                    msg += MMESSG[ib] + '|'
-            if len(msg) > 0:
-                self.log.info(msg)
-            if time.time() > start+self["move_timeout"]:
-                raise AstelcoHexapodException("Operation timed out.")
-            if self._abort.isSet():
-                self.log.info('Operation aborted')
-                # Todo: abort operation
-                break
-            cmd = tpl.getCmd(cmdid)
+        # the TPL waits until the command completes or the axis stops
+        status, values = tpl.waitFor('POSITION.INSTRUMENTAL.FOCUS[%i].MOTION_STATE' % axis.index, ('==', 0),
+                                     timeout=start + self["move_timeout"] - time.time(), cmdid=cmdid, mode='any')
+        MSTATE = values['POSITION.INSTRUMENTAL.FOCUS[%i].MOTION_STATE' % axis.index]
+        msg = ''
+        for ib, bit in enumerate(mbitcode):
+            if MSTATE is not None and ( MSTATE & (1 << bit) ) != 0:
+                #STATE = False
+                msg += MMESSG[ib] + '|'
+        if len(msg) > 0:
+            self.log.info(msg)
+        if status == 'TIMEOUT':
+            raise AstelcoHexapodException("Operation timed out.")
+        if status == 'ABORTED':
+            self.log.info('Operation aborted')
+            # Todo: abort operation
         # check limit state
-        LSTATE = tpl.getobject('POSITION.INSTRUMENTAL.FOCUS[%i].LIMIT_STATE' % axis.index)
+        LSTATE = tpl.getobject('POSITION.INSTRUMENTAL.FOCUS[%i].LIMIT_STATE' % axis.index, caller=caller)
         #code = '%16s'%(bin(LSTATE)[2:][::-1])
         bitcode = [0, 1, 7, 8, 9, 15]
         LMESSG = ['MINIMUM HARDWARE LIMIT',
@@ -369,11 +377,20 @@ vector. Temperature compensation can also be performed.
         return min_pos <= n <= max_pos
 
     def getTPL(self):
-        try:
-            p = self.getManager().getProxy(self['tpl'], lazy=True)
-            if not p.ping():
-                return False
-            else:
-                return p
-        except ObjectNotFoundException:
-            return False
+        return self._tplproxy.get()
+
+    def getProxyStats(self):
+        '''
+            Use of the cached TPL proxy.
+
+        :return: dict with getTPL() calls, proxies resolved, pings and Pyro calls saved.
+        '''
+        return self._tplproxy.stats()
+
+    def getControlProfile(self):
+        '''
+            Tick times of the focuser control loop, see the profile option of TPL.
+
+        :return: dict from ControlProfile.snapshot().
+        '''
+        return controlprofile(self).snapshot()
@@ -47,6 +47,9 @@ from chimera.core.exceptions import (ObjectNotFoundException, ObjectTooLowExcept
 from chimera.core.constants import SYSTEM_CONFIG_DIRECTORY
 
 from astelcoexceptions import AstelcoException, AstelcoTelescopeException
+from tplproxy import TPLProxyCache
+from tpltimeline import traced
+from tplprofile import profiled, controlprofile
 
 Direction = Enum("E", "W", "N", "S")
 AstelcoTelescopeStatus = Enum("NoLICENSE",
@@ -67,6 +70,8 @@ class AstelcoTelescope(TelescopeBase, TelescopeCover, TelescopePier):  # convert
                   'pointing_model_type': None, # Type of pointing model. None is leave as is. either 0,1 or 2
                   'pointing_setup_orientation': None,
                   'pointing_setup_optimization': None,
+                  'profile': False,  # time control() ticks, see TPL
+                  'profile_sample': 0.,  # seconds between control() stack samples, 0 for none
                   'tpl':'/TPL/0'}  # TODO: FIX tpl so I can get COUNT on an axis.
 
 
@@ -75,6 +80,9 @@ class AstelcoTelescope(TelescopeBase, TelescopeCover, TelescopePier):  # convert
 
         self._slewRate = None
         self._abort = threading.Event()
+
+        # resolved TPL proxy, health checked in the background
+        self._tplproxy = TPLProxyCache(self)
         self._slewing = False
         self._tracking = False
 
@@ -215,6 +223,7 @@ class AstelcoTelescope(TelescopeBase, TelescopeCover, TelescopePier):  # convert
             raise AstelcoException("Error while opening %s. Error message:\n%s" % (self["device"],
                                                                                    e))
 
+    @profiled
     @lock
     def control(self):
         '''
@@ -315,8 +324,7 @@ class AstelcoTelescope(TelescopeBase, TelescopeCover, TelescopePier):  # convert
         self.log.debug("OK")
 
         self.log.debug('Setting target RA/DEC')
-        self.setTargetRaDec(position.ra, position.dec)
-        self.setTargetEpoch(position.epoch)
+        self._setTarget(position.ra, position.dec, position.epoch)
         self.log.debug('Done')
 
         status = TelescopeStatus.OK
@@ -372,8 +380,8 @@ class AstelcoTelescope(TelescopeBase, TelescopeCover, TelescopePier):  # convert
     def isSlewing(self):  # converted to Astelco
 
         tpl = self.getTPL()
-        mstate = tpl.getobject('TELESCOPE.MOTION_STATE')
-        ptrack = tpl.getobject('POINTING.TRACK')
+        mstate = tpl.getlive('TELESCOPE.MOTION_STATE')
+        ptrack = tpl.getlive('POINTING.TRACK')
 
         slewing = (int(mstate) != 0) and (int(ptrack) != 1)
 
@@ -406,36 +414,30 @@ class AstelcoTelescope(TelescopeBase, TelescopeCover, TelescopePier):  # convert
     def getRa(self):  # converted to Astelco
 
         tpl = self.getTPL()
-        ret = tpl.getobject('POSITION.EQUATORIAL.RA_J2000')
+        ret = tpl.getlive('POSITION.EQUATORIAL.RA_J2000')
         if ret:
             self._ra = Coord.fromH(ret)
         return self._ra
 
     def getDec(self):  # converted to Astelco
         tpl = self.getTPL()
-        ret = tpl.getobject('POSITION.EQUATORIAL.DEC_J2000')
+        ret = tpl.getlive('POSITION.EQUATORIAL.DEC_J2000')
         if ret:
             self._dec = Coord.fromD(ret)
         return self._dec
 
     def getAz(self):  # converted to Astelco
         tpl = self.getTPL()
-        ret = tpl.getobject('POSITION.HORIZONTAL.AZ')
+        ret = tpl.getlive('POSITION.HORIZONTAL.AZ')
         if ret:
             self._az = Coord.fromD(ret)
         c = self._az  #Coord.fromD(ret)
 
-        if self['azimuth180Correct']:
-            if c.toD() >= 180:
-                c = c - Coord.fromD(180)
-            else:
-                c = c + Coord.fromD(180)
-
-        return c
+        return self._azimuth180(c)
 
     def getAlt(self):  # converted to Astelco
         tpl = self.getTPL()
-        ret = tpl.getobject('POSITION.HORIZONTAL.ALT')
+        ret = tpl.getlive('POSITION.HORIZONTAL.ALT')
         if ret:
             self._alt = Coord.fromD(ret)
 
@@ -488,6 +490,7 @@ class AstelcoTelescope(TelescopeBase, TelescopeCover, TelescopePier):  # convert
     # -- Start TelescopePark implementation --
 
     @lock
+    @traced
     def park(self):  # converted to Astelco
         if self.isParked():
             return True
@@ -502,23 +505,22 @@ class AstelcoTelescope(TelescopeBase, TelescopeCover, TelescopePier):  # convert
         #self.slewToRaDec(Position.fromRaDec(str(self.getLocalSiderealTime()),
         #                                            site["latitude"]))
         tpl = self.getTPL()
-        cmdid = tpl.set('TELESCOPE.READY', 0, wait=False)
+        caller = 'AstelcoTelescope.park'
+        cmdid = tpl.set('TELESCOPE.READY', 0, wait=False, caller=caller)
 
-        ready_state = tpl.getobject('TELESCOPE.READY_STATE')
         start_time = time.time()
         self._abort.clear()
 
-        while ready_state > 0.0:
-            self.log.debug("Powering down Astelco: %s" % (ready_state))
-            old_ready_state = ready_state
-            ready_state = tpl.getobject('TELESCOPE.READY_STATE')
-            if ready_state != old_ready_state:
-                self.log.debug("Powering down Astelco: %s" % (ready_state))
-                old_ready_state = ready_state
-            if self._abort.set():
+        # the TPL waits for the power down, the telescope status is checked every 5s
+        while True:
+            status, values = tpl.waitFor('TELESCOPE.READY_STATE', ('<=', 0.), timeout=5.)
+            if status == 'DONE':
+                break
+            self.log.debug("Powering down Astelco: %s" % (values['TELESCOPE.READY_STATE']))
+            if self._abort.isSet():
                 # Send abork command to astelco
                 self.log.warning("Abort parking! This will leave the telescope in an intermediate state!")
-                tpl.set('ABORT', cmdid)
+                tpl.abort(cmdid, caller=caller)
                 return False
             if time.time() > start_time + self['parktimeout']:
                 self.log.error("Parking operation timedout!")
@@ -529,8 +531,6 @@ class AstelcoTelescope(TelescopeBase, TelescopeCover, TelescopePier):  # convert
                 self.acknowledgeEvents()
                 # What should I do if acknowledging events does not fix it?
 
-            time.sleep(5.0)
-
         # 2. stop tracking
         #self.stopTracking ()
         # 3. power off
@@ -542,15 +542,17 @@ class AstelcoTelescope(TelescopeBase, TelescopeCover, TelescopePier):  # convert
         return tpl.succeeded(cmdid)
 
     @lock
+    @traced
     def unpark(self):  # converted to Astelco
 
         if not self.isParked():
             return True
 
         tpl = self.getTPL()
+        caller = 'AstelcoTelescope.unpark'
 
         # Checking Telescope state
-        state = tpl.getobject('TELESCOPE.READY_STATE')
+        state = tpl.getobject('TELESCOPE.READY_STATE', caller=caller)
         if state == -3:
             AstelcoException('Telescope in local mode. Check cabinet.')
         elif state == -2:
@@ -561,30 +563,27 @@ class AstelcoTelescope(TelescopeBase, TelescopeCover, TelescopePier):  # convert
             self.log.critical('Telescope already powering up.')
             return False
 
-        cmdid = tpl.set('TELESCOPE.READY', 1, wait=False)
+        cmdid = tpl.set('TELESCOPE.READY', 1, wait=False, caller=caller)
 
         # 2. start tracking
         #self.startTracking()
-        ready_state = 0.0
         start_time = time.time()
         self._abort.clear()
 
-        while ready_state < 1.0:
-            self.log.debug("Powering up Astelco: %s" % (ready_state))
-            old_ready_state = ready_state
-            ready_state = tpl.getobject('TELESCOPE.READY_STATE')
-
-            if ready_state != old_ready_state:
-                self.log.debug("Powering up Astelco: %s" % (ready_state))
-                old_ready_state = ready_state
-            if self._abort.set():
+        # the TPL waits for the power up, the telescope status is checked every second
+        while True:
+            status, values = tpl.waitFor('TELESCOPE.READY_STATE', ('>=', 1.), timeout=1.)
+            if status == 'DONE':
+                break
+            self.log.debug("Powering up Astelco: %s" % (values['TELESCOPE.READY_STATE']))
+            if self._abort.isSet():
                 # Send abort command to astelco
                 self.log.warning("Aborting! This will leave the telescope in an intermediate state!")
-                tpl.set('ABORT', cmdid)
+                tpl.abort(cmdid, caller=caller)
                 return False
             if time.time() > start_time + self['parktimeout']:
                 self.log.error("Parking operation timedout!")
-                tpl.set('ABORT', cmdid)
+                tpl.abort(cmdid, caller=caller)
                 raise AstelcoException('Unparking telescope timedout.')
 
             status = self.getTelescopeStatus()
@@ -595,7 +594,7 @@ class AstelcoTelescope(TelescopeBase, TelescopeCover, TelescopePier):  # convert
             elif status == AstelcoTelescopeStatus.ERROR or status == AstelcoTelescopeStatus.PANIC:
                 # When something really bad happens during unpark, telescope needs to be parked
                 # and then, start over.
-                # tpl.set('ABORT', cmdid)
+                # tpl.abort(cmdid)
                 self.log.critical("Something wrong with the telescope. Waiting for command completion.")
                 cmd = tpl.getCmd(cmdid)
                 if cmd.complete:
@@ -611,8 +610,6 @@ class AstelcoTelescope(TelescopeBase, TelescopeCover, TelescopePier):  # convert
                     self.log.critical('Waiting cmd %i to complete. Sleeping for 6s.' % cmdid)
                     time.sleep(6)
 
-            time.sleep(.1)
-
         # 3. set location, date and time
         self._initTelescope()
 
@@ -650,54 +647,40 @@ class AstelcoTelescope(TelescopeBase, TelescopeCover, TelescopePier):  # convert
     # -- Start TelescopeCover implementation --
 
     @lock
+    @traced
     def openCover(self):
         if self.isCoverOpen():
             return True
         tpl = self.getTPL()
-        cmdid = tpl.set('AUXILIARY.COVER.TARGETPOS', 1, wait=True)
+        caller = 'AstelcoTelescope.openCover'
+        cmdid = tpl.set('AUXILIARY.COVER.TARGETPOS', 1, wait=True, caller=caller)
 
         self.log.debug('Opening telescope cover...')
 
-        ready_state = 0.0
-        start_time = time.time()
-        while ready_state < 1.0:
-            self.log.debug("Opening telescope cover: %s" % (ready_state))
-            #old_ready_state = ready_state
-            ready_state = tpl.getobject('AUXILIARY.COVER.REALPOS')
-            #if ready_state != old_ready_state:
-            #    self.log.debug("Powering up Astelco: %s"%(ready_state))
-            #    old_ready_state = ready_state
-            time.sleep(5.0)
-            if time.time() > start_time+self['parktimeout']:
-                # self.log.error('Opening telescope cover timed-out!')
-                tpl.set('ABORT', cmdid)
-                raise AstelcoTelescopeException("Opening telescope cover timed-out!")
+        status, values = tpl.waitFor('AUXILIARY.COVER.REALPOS', ('>=', 1.), timeout=self['parktimeout'])
+        if status != 'DONE':
+            # self.log.error('Opening telescope cover timed-out!')
+            tpl.abort(cmdid, caller=caller)
+            raise AstelcoTelescopeException("Opening telescope cover timed-out!")
 
         return tpl.succeeded(cmdid)
 
     @lock
+    @traced
     def closeCover(self):
         if not self.isCoverOpen():
             return True
 
         self.log.debug('Closing telescope cover...')
         tpl = self.getTPL()
-        cmdid = tpl.set('AUXILIARY.COVER.TARGETPOS', 0, wait=True)
+        caller = 'AstelcoTelescope.closeCover'
+        cmdid = tpl.set('AUXILIARY.COVER.TARGETPOS', 0, wait=True, caller=caller)
 
-        ready_state = 1.0
-        start_time = time.time()
-        while ready_state > 0.0:
-            self.log.debug("Closing telescope cover: %s" % (ready_state))
-            #old_ready_state = ready_state
-            ready_state = tpl.getobject('AUXILIARY.COVER.REALPOS')
-            #if ready_state != old_ready_state:
-            #    self.log.debug("Powering up Astelco: %s"%(ready_state))
-            #    old_ready_state = ready_state
-            time.sleep(5.0)
-            if time.time() > start_time+self['parktimeout']:
-                # self.log.error('Opening telescope cover timed-out!')
-                tpl.set('ABORT', cmdid)
-                raise AstelcoTelescopeException("Closing telescope cover timed-out!")
+        status, values = tpl.waitFor('AUXILIARY.COVER.REALPOS', ('<=', 0.), timeout=self['parktimeout'])
+        if status != 'DONE':
+            # self.log.error('Opening telescope cover timed-out!')
+            tpl.abort(cmdid, caller=caller)
+            raise AstelcoTelescopeException("Closing telescope cover timed-out!")
 
         return True  #self._tpl.succeeded(cmdid)
 
@@ -720,7 +703,7 @@ class AstelcoTelescope(TelescopeBase, TelescopeCover, TelescopePier):  # convert
 
     def isTracking(self):  # converted to Astelco
         tpl = self.getTPL()
-        return tpl.getobject('POINTING.TRACK')
+        return tpl.getlive('POINTING.TRACK')
 
 
 
@@ -728,14 +711,23 @@ class AstelcoTelescope(TelescopeBase, TelescopeCover, TelescopePier):  # convert
     # -- Start Utilitaries implementation --
 
     def getTPL(self):
-        try:
-            p = self.getManager().getProxy(self['tpl'], lazy=True)
-            if not p.ping():
-                return False
-            else:
-                return p
-        except ObjectNotFoundException:
-            return False
+        return self._tplproxy.get()
+
+    def getProxyStats(self):
+        '''
+            Use of the cached TPL proxy.
+
+        :return: dict with getTPL() calls, proxies resolved, pings and Pyro calls saved.
+        '''
+        return self._tplproxy.stats()
+
+    def getControlProfile(self):
+        '''
+            Tick times of the telescope control loop, see the profile option of TPL.
+
+        :return: dict from ControlProfile.snapshot().
+        '''
+        return controlprofile(self).snapshot()
 
     def getPMFile(self):
         '''
@@ -821,8 +813,8 @@ class AstelcoTelescope(TelescopeBase, TelescopeCover, TelescopePier):  # convert
         else:
             tpl = self.getTPL()
             self['pointing_model'] = filename
-            tpl.set('POINTING.MODEL.FILE',"\"%s\"" % filename,wait=True)
-            tpl.set('POINTING.MODEL.LOAD',1 if overwrite else 2,wait=True)
+            tpl.pipeline([('SET', 'POINTING.MODEL.FILE', "\"%s\"" % filename),
+                          ('SET', 'POINTING.MODEL.LOAD', 1 if overwrite else 2)])
             return True
 
     def clearPMList(self):
@@ -906,7 +898,7 @@ class AstelcoTelescope(TelescopeBase, TelescopeCover, TelescopePier):  # convert
         self._abort.clear()
 
         tpl = self.getTPL()
-        # slew
+        # slew, the slew time is only read once the target SETs completed
         slewTime = tpl.getobject('POINTING.SLEWTIME')
         self.log.info("Time to slew to RA/Dec is reported to be %f s" % ( slewTime ))
 
@@ -935,20 +927,22 @@ class AstelcoTelescope(TelescopeBase, TelescopeCover, TelescopePier):  # convert
         # return TelescopeStatus.OK
         return self._waitSlew(time.time(), target, local=True)
 
+    @traced
     def _waitSlew(self, start_time, target, local=False, slew_time=-1):  # converted to Astelco
         self.slewBegin(target)
         # todo: raise an exception if telescope is parked
         tpl = self.getTPL()
+        caller = 'AstelcoTelescope._waitSlew'
         # Set offset to zero
         if abs(self._getOffset(Direction.N)) > 0:
-            cmdid = tpl.set('POSITION.INSTRUMENTAL.DEC.OFFSET', 0.0, wait=True)
+            cmdid = tpl.set('POSITION.INSTRUMENTAL.DEC.OFFSET', 0.0, wait=True, caller=caller)
             # time.sleep(self["stabilization_time"])
         if abs(self._getOffset(Direction.W)) > 0:
-            cmdid = tpl.set('POSITION.INSTRUMENTAL.HA.OFFSET', 0.0, wait=True)
+            cmdid = tpl.set('POSITION.INSTRUMENTAL.HA.OFFSET', 0.0, wait=True, caller=caller)
             # time.sleep(self["stabilization_time"])
 
         self.log.debug('SEND: POINTING.TRACK 2')
-        cmdid = tpl.set('POINTING.TRACK', 2, wait=False)
+        cmdid = tpl.set('POINTING.TRACK', 2, wait=False, caller=caller)
         self.log.debug('PASSED')
 
         cmd = tpl.getCmd(cmdid)
@@ -1041,10 +1035,10 @@ class AstelcoTelescope(TelescopeBase, TelescopeCover, TelescopePier):  # convert
 
                 slew_time += slew_time
 
-            dec_state = tpl.getobject('POSITION.INSTRUMENTAL.DEC.MOTION_STATE')
-            ha_state = tpl.getobject('POSITION.INSTRUMENTAL.DEC.MOTION_STATE')
+            dec_state = tpl.getobject('POSITION.INSTRUMENTAL.DEC.MOTION_STATE', caller=caller)
+            ha_state = tpl.getobject('POSITION.INSTRUMENTAL.DEC.MOTION_STATE', caller=caller)
 
-            mstate = tpl.getobject('TELESCOPE.MOTION_STATE')
+            mstate = tpl.getobject('TELESCOPE.MOTION_STATE', caller=caller)
 
             self.log.debug('MSTATE: %i (%s) dec= %s ra=%s' % (mstate, bin(mstate),bin(dec_state),bin(ha_state)))
             if (mstate & 1) == 0:
@@ -1065,11 +1059,13 @@ class AstelcoTelescope(TelescopeBase, TelescopeCover, TelescopePier):  # convert
             # time.sleep(self["slew_idle_time"])
             cmd = tpl.getCmd(cmdid)
 
+    @traced
     def _startTracking(self, start_time, target, local=False, slew_time=-1):  # converted to Astelco):
 
         tpl = self.getTPL()
+        caller = 'AstelcoTelescope._startTracking'
         self.log.debug('SEND: POINTING.TRACK 1')
-        cmdid = tpl.set('POINTING.TRACK', 1, wait=True)
+        cmdid = tpl.set('POINTING.TRACK', 1, wait=True, caller=caller)
         self.log.debug('PASSED')
 
         cmd = tpl.getCmd(cmdid)
@@ -1145,6 +1141,7 @@ class AstelcoTelescope(TelescopeBase, TelescopeCover, TelescopePier):  # convert
         else:
             return 0
 
+    @traced
     def _move(self, direction, offset, slewRate=SlewRate.GUIDE):  # yet to convert to Astelco
 
         if offset / 3600. > 2.0:
@@ -1157,20 +1154,24 @@ class AstelcoTelescope(TelescopeBase, TelescopeCover, TelescopePier):  # convert
         self.log.debug('Current offset: %s | Requested: %s' % (current_offset, offset))
 
         tpl = self.getTPL()
+        caller = 'AstelcoTelescope._move'
 
         if direction == Direction.W:
             off = current_offset - offset / 3600. * np.cos(self.getDec().R)
-            cmdid = tpl.set('POSITION.INSTRUMENTAL.HA.OFFSET', off, wait=True)
+            cmdid = tpl.set('POSITION.INSTRUMENTAL.HA.OFFSET', off, wait=True, caller=caller)
         elif direction == Direction.E:
             off = current_offset + offset / 3600. * np.cos(self.getDec().R)
-            cmdid = tpl.set('POSITION.INSTRUMENTAL.HA.OFFSET', off, wait=True)
+            cmdid = tpl.set('POSITION.INSTRUMENTAL.HA.OFFSET', off, wait=True, caller=caller)
         elif direction == Direction.N:
-            cmdid = tpl.set('POSITION.INSTRUMENTAL.DEC.OFFSET', current_offset + offset / 3600., wait=True)
+            cmdid = tpl.set('POSITION.INSTRUMENTAL.DEC.OFFSET', current_offset + offset / 3600., wait=True,
+                            caller=caller)
         elif direction == Direction.S:
-            cmdid = tpl.set('POSITION.INSTRUMENTAL.DEC.OFFSET', current_offset - offset / 3600., wait=True)
+            cmdid = tpl.set('POSITION.INSTRUMENTAL.DEC.OFFSET', current_offset - offset / 3600., wait=True,
+                            caller=caller)
 
         return True
 
+    @traced
     def _waitSlewLoop(self,cmdid,start_time,slew_time=None):
 
         tpl = self.getTPL()
@@ -1276,27 +1277,67 @@ class AstelcoTelescope(TelescopeBase, TelescopeCover, TelescopePier):  # convert
     def stopMoveSouth(self):  # no need to convert to Astelco
         return self._stopMove(Direction.S)
 
-    @lock
+    # not @lock: stopping must not wait for a slew or move holding the lock
     def stopMoveAll(self):  # converted to Astelco
         tpl = self.getTPL()
-        tpl.set('TELESCOPE.STOP', 1, wait=True)
+        tpl.set('TELESCOPE.STOP', 1, wait=True, urgent=True)
         # self.trackingStopped()
         return True
 
     @lock
-    def setTargetRaDec(self, ra, dec):  # no need to convert to Astelco
-        self.setTargetRa(ra)
-        self.setTargetDec(dec)
+    def setTargetRaDec(self, ra, dec):  # converted to Astelco
+        self._setTarget(ra, dec)
 
         return True
 
+    def _azimuth180(self, az):
+        '''
+            Turn az by 180 degrees if azimuth180Correct is set, the server counts azimuth from the other side.
+            The correction is its own inverse, so it converts both ways.
+        '''
+        if self['azimuth180Correct']:
+            if az.toD() >= 180:
+                az = az - Coord.fromD(180)
+            else:
+                az = az + Coord.fromD(180)
+
+        return az
+
     @lock
-    def setTargetAltAz(self, alt, az):  # no need to convert to Astelco
+    def setTargetAltAz(self, alt, az):  # converted to Astelco
+        # one at a time, ALT is not sent if AZ is refused, so the mount never has half a target
         self.setTargetAz(az)
         self.setTargetAlt(alt)
 
         return True
 
+    def _setTarget(self, ra, dec, epoch=None):
+        '''
+            Set target RA, DEC and, if given, epoch in a single round trip.
+        '''
+        if not isinstance(ra, Coord):
+            ra = Coord.fromHMS(ra)
+        if not isinstance(dec, Coord):
+            dec = Coord.fromDMS(dec)
+
+        commands = [('SET', 'OBJECT.EQUATORIAL.RA', ra.H),
+                    ('SET', 'OBJECT.EQUATORIAL.DEC', dec.D)]
+        names = [('RA', ra), ('DEC', dec)]
+
+        if epoch is not None:
+            if type(epoch) != type(Epoch.J2000):
+                self.log.warning("Given value is not a valid epoch. Using J2000.")
+                epoch = Epoch.J2000
+            commands.append(('SET', 'OBJECT.EQUATORIAL.EPOCH', float(epoch.__str__()[1:])))
+            names.append(('EPOCH', epoch))
+
+        tpl = self.getTPL()
+        results = tpl.pipeline(commands)
+
+        for result, (name, value) in zip(results, names):
+            if result['status'] != 'COMPLETE':
+                raise AstelcoException("Invalid %s '%s'" % (name, value))
+
     @lock
     def getTargetRa(self):  # converted to Astelco
         tpl = self.getTPL()
@@ -1397,12 +1438,7 @@ class AstelcoTelescope(TelescopeBase, TelescopeCover, TelescopePier):  # convert
         if not isinstance(az, Coord):
             az = Coord.fromDMS(az)
 
-        if self['azimuth180Correct']:
-
-            if az.toD() >= 180:
-                az = az - Coord.fromD(180)
-            else:
-                az = az + Coord.fromD(180)
+        az = self._azimuth180(az)
 
         tpl = self.getTPL()
         cmdid = tpl.set('OBJECT.HORIZONTAL.AZ', az.D, wait=True)
@@ -1557,7 +1593,7 @@ class AstelcoTelescope(TelescopeBase, TelescopeCover, TelescopePier):  # convert
         Bit 0 - PANIC, a severe condition, completely disabling the entire telescope,
         Bit 1 - ERROR, a serious condition, disabling important parts of the telescope system,
         Bit 2 - WARNING, a critical condition, which is not (yet) dis- abling the telescope,
-        Bit 3 - INFO, a informal situation, which is not a ecting the operation.
+        Bit 3 - INFO, a informal situation, which is not affecting the operation.
 
         :return: AstelcoTelescopeStatus{Enum}
         '''
@@ -1703,16 +1739,23 @@ class AstelcoTelescope(TelescopeBase, TelescopeCover, TelescopePier):  # convert
 
         tpl = self.getTPL()
 
+        objects = []
+        for n in range(int(self["sensors"])):
+            objects += ['AUXILIARY.SENSOR[%i].DESCRIPTION' % (n + 1),
+                        'AUXILIARY.SENSOR[%i].VALUE' % (n + 1),
+                        'AUXILIARY.SENSOR[%i].UNITY' % (n + 1)]
+        values = tpl.getobjects(objects, background=True)
+
         for n in range(int(self["sensors"])):
-            description = tpl.getobject('AUXILIARY.SENSOR[%i].DESCRIPTION' % (n + 1))
+            description = values['AUXILIARY.SENSOR[%i].DESCRIPTION' % (n + 1)]
 
             if not description:
                 continue
             elif "FAILED" in description:
                 continue
 
-            value = tpl.getobject('AUXILIARY.SENSOR[%i].VALUE' % (n + 1))
-            unit = tpl.getobject('AUXILIARY.SENSOR[%i].UNITY' % (n + 1))
+            value = values['AUXILIARY.SENSOR[%i].VALUE' % (n + 1)]
+            unit = values['AUXILIARY.SENSOR[%i].UNITY' % (n + 1)]
             sensors.append((description, value, unit))
             # sensors.append((0, 0, 0))
 
@@ -21,9 +21,9 @@
 
 import time
 import os
-import numpy as np
-import telnetlib
-from collections import defaultdict
+import select
+import threading
+import heapq
 import re
 import shutil
 from chimera.core.chimeraobject import ChimeraObject
@@ -32,7 +32,18 @@ from chimera.core.constants import SYSTEM_CONFIG_DIRECTORY
 from chimera.core.exceptions import ChimeraException
 from chimera.util.enum import Enum
 
+from tplparser import TPLParser, DATA, COMMAND, BANNER, AUTH_REPLY
+from tplcommand import Command, CommandHistory, update, query
+from tpltransport import TPLSocket
+from tplreactor import TPLReactor
+from tpllog import TraceSampler, TraceLog
+from tplrecord import TPLRecorder, MAIN, PRIORITY
+from tplstats import TPLStats
+from tpltimeline import timeline
+from tplprofile import profiled, controlprofile
+
 import logging
+import itertools
 
 __all__ = ["TPLBase"]
 
@@ -47,34 +58,24 @@ CMDStatus = Enum("DONE","ABORTED","WAITING","TIMEOUT")
 
 SEND = Enum("OK","ERROR")
 
-def retStr():
-    return str
-
-_CmdType = defaultdict(retStr)
 
-_CmdType['0'] = str
-_CmdType['1'] = int
-_CmdType['2'] = float
-_CmdType['3'] = str
+def _angsep(a, b):
+    d = abs(float(a) - float(b)) % 360.
+    return min(d, 360. - d)
 
-class Command():
+# waitFor() predicates, (name, arguments...) -> test of an object value
+_Predicates = {'==': lambda value, arg: value == arg[0],
+               '!=': lambda value, arg: value != arg[0],
+               '<': lambda value, arg: value < arg[0],
+               '<=': lambda value, arg: value <= arg[0],
+               '>': lambda value, arg: value > arg[0],
+               '>=': lambda value, arg: value >= arg[0],
+               'set': lambda value, arg: int(value) & arg[0] == arg[0],
+               'clear': lambda value, arg: int(value) & arg[0] == 0,
+               'near': lambda value, arg: _angsep(value, arg[0]) < arg[1]}
 
-    def __init__(self):
-        self.id = 0
-        self.cmd = None
-        self.object = None
-        self.received = []
-        self.events = []
-        self.dtype = str
-        self.status = None
-        self.allstatus = []
-        self.ok = False
-        self.complete = False
-        self.data = []
-        self.send_time = time.time()
-
-    def __str__(self):
-        return str(self.id) + ' ' + self.cmd + ' ' + self.object + '\r\n'
+# instance number of each TPL in the process, used to name its trace file
+_instances = itertools.count(1)
 
 class TPL(ChimeraObject):
 
@@ -87,181 +88,495 @@ class TPL(ChimeraObject):
                   "timeout": 60,
                   "cmd_timeout": 60,
                   "waittime": 0.5,
-                  "history" : 1000}
+                  "tcp_nodelay": True,  # send commands right away instead of waiting to fill a segment
+                  "tcp_keepalive": 30,  # idle seconds before TCP keepalive probes, 0 disables them
+                  "rcvbuf": 262144,  # socket receive buffer (bytes), 0 keeps the system default
+                  "priority_connection": False,  # send urgent commands (STOP, ABORT) over a second connection
+                  "background_quota": 2,  # background GETs (telemetry polls) in flight at once, 0 for no limit
+                  "reactor": False,  # serve the connection from the reactor thread shared by all TPL instances
+                  "history" : 1000,
+                  # Wire trace file in the chimera config directory, %i is the TPL instance number ('' disables
+                  # it). Written by a background thread and rotated (gzipped) at debug_log_size bytes.
+                  "debug_log": "tpl_%03i.log",
+                  "debug_log_size": 10485760,
+                  "debug_log_backups": 5,
+                  # Trace messages written per class (send, recv, dispatch, control): 1 all, N one in N, 0 none
+                  "debug_trace": "send=1, recv=1, dispatch=1, control=1",
+                  # Binary capture of every byte sent and received, for chimera-tplreplay. File in the chimera
+                  # config directory, %i is the TPL instance number ('' disables it). The previous capture is
+                  # kept as <file>.1, also once the capture reaches record_size bytes.
+                  "record": "",
+                  "record_size": 104857600,
+                  # Lifecycle events of every command kept for getTimeline(), 0 disables them. The timeline is
+                  # shared by the process, the instance that changed it last sets its size.
+                  "timeline": 0,
+                  # Time every control() tick against freq (getControlProfile()), and if profile_sample > 0
+                  # sample its stack every profile_sample seconds into profile_<location>.folded in the config directory
+                  "profile": False,
+                  "profile_sample": 0.,
+                  "keep_received": True,  # keep the raw reply lines of each command in Command.received
+                  "subscribe": True,  # ask the server to push subscribed objects (SUB), poll them if False
+                  "poll_period": 0.5,  # period of the background poll of subscribed objects the server does not push
+                  "live_maxage": 1.,  # live values received longer ago than this (s) are read again by getlive()
+                  # subscriptions made by getlive() end once no one read the object for this long (s), 0 keeps them
+                  "live_expire": 60.,
+                  # Read-mostly objects cached by getobject()/getobjects(), as comma separated pattern=TTL (s).
+                  # '*' in a pattern matches anything.
+                  "cache_ttl": "TELESCOPE.CONFIG.MOUNTOPTIONS=3600, POINTING.MODEL.FILE_LIST=60, "
+                               "AUXILIARY.SENSOR[*].DESCRIPTION=3600, AUXILIARY.SENSOR[*].UNITY=3600, "
+                               "POINTING.SETUP.DOME.MAX_DEVIATION=60, POSITION.INSTRUMENTAL.FOCUS*!MIN=3600, "
+                               "POSITION.INSTRUMENTAL.FOCUS*!MAX=3600"}
 
     def __init__(self):
 
         ChimeraObject.__init__(self)
 
-        # Command counter
+        # Command counter, with its own lock so urgent commands never wait for control()
         self.next_command_id = 1
-        self.last_cmd_deleted = 0
+        self._idlock = threading.Lock()
 
         # Store received objects
-        self.commands_sent = {}
+        self.commands_sent = CommandHistory(self['history'])
+
+        # Commands not yet complete (by id, independent of the history) and heap of (deadline, cmdid)
+        # used to time them out
+        self._pending = {}
+        self._deadlines = []
+
+        # Type of each object, as reported by OBJ!TYPE. Filled on first access and cleared on (re)connect.
+        self._typecache = {}
+
+        self._parser = TPLParser()
+
+        # Optional second connection for urgent commands, with its own parser
+        self.sock = None
+        self.psock = None
+        self._pparser = TPLParser()
+
+        # In-flight background commands and the slots that bound them (background_quota, read at start)
+        self._background = set()
+        self._bgslots = None
+
+        # Receive engine. The reader thread owns the socket input, control() only takes care of
+        # reconnecting, command timeouts and history.
+        self._cmdlock = threading.Lock()
+        # notified on every live value change and command completion, for waitFor()
+        self._changed = threading.Condition(self._cmdlock)
+        self._reader_thread = None
+        self._reader_abort = threading.Event()
+        self._reconnect = threading.Event()
+
+        # Live value table, object -> (value, time received), for subscribed objects. Objects the server
+        # pushes are in _pushed (SUB command ids in _subscriptions), the rest are read by the poller thread
+        # with a single GET.
+        self._live = {}
+        self._subscriptions = {}
+        self._pushed = set()
+        self._polled = set()
+        self._poller_thread = None
+        # last getlive() read of the objects it subscribed, for live_expire
+        self._livereads = {}
+
+        # Shared reactor serving this instance instead of the reader and poller threads ("reactor"), and the
+        # id of its last poll GET
+        self._reactor = None
+        self._pollcmd = None
+
+        # Read-through cache, object -> (value, expiry time), with (hits, misses) per object. TTL patterns are
+        # compiled from cache_ttl, and recompiled if it changes. Every invalidation bumps _cachegen, so a GET
+        # that was already in flight does not store a value older than the invalidation.
+        self._cache = {}
+        self._cachestats = {}
+        self._cachegen = 0
+        self._cacheconf = None
+        self._cachepatterns = []
+        self._cachettls = {}
+
+        # GETs in flight, by tuple of objects -> [command id, done event]. Callers asking for the same objects
+        # wait for the command already sent instead of sending their own.
+        self._inflight = {}
+
+        # waitFor() state: abort flags by tag, how many waits use each object they subscribed and how many
+        # wait on each object at all (those do not expire)
+        self._waits = {}
+        self._waitrefs = {}
+        self._waiting = {}
+
+        # Wire trace, see debug_log and debug_trace
+        self._index = _instances.next()
+        self._debuglog = logging.getLogger('_tpldebug_%03i_' % self._index)
+        self._debuglog.setLevel(logging.DEBUG)
+        self._debuglog.propagate = False
+        self._debuglog.addHandler(logging.NullHandler())
+        self._trace = TraceSampler('send=0, recv=0, dispatch=0, control=0')
+        self._tracelog = None
+        self._tracing = False
 
-        self._expect = [ '(?P<CMDID>\d+) DATA INLINE (?P<OBJECT>\S+)=(?P<VALUE>.+)',
-                         '(?P<CMDID>\d+) DATA OK (?P<OBJECT>\S+)',
-                         '(?P<CMDID>\d+) COMMAND (?P<STATUS>\S+)',
-                         '(?P<CMDID>\d+) EVENT ERROR (?P<OBJECT>\S+):(?P<ENCM>(.*?)\s*)']
+        # Capture of the connections, see record
+        self._recorder = None
+
+        # Counters and latency histograms for getStats(), updated with _cmdlock held
+        self._stats = TPLStats()
+
+        # timeline size last applied by this instance
+        self._timeline = 0
 
 
     def __start__(self):
 
         self.setHz(self['freq'])
+        self.commands_sent.maxlen = int(self['history'])
+        if self['background_quota'] > 0:
+            self._bgslots = threading.Semaphore(int(self['background_quota']))
 
-        # debug log
-        # self._debugLog = None
-        logfile = os.path.join(SYSTEM_CONFIG_DIRECTORY, "tpl_001_%s.log"%time.strftime("%Y%m%d-%H%M%S"))
-        index = 2
-        while os.path.exists(logfile):
-            logfile = os.path.join(SYSTEM_CONFIG_DIRECTORY, "tpl_%03i_%s.log"%(index,
-                                                                               time.strftime("%Y%m%d-%H%M%S")))
-            index+=1
-            # shutil.move(logfile, os.path.join(SYSTEM_CONFIG_DIRECTORY,
-            #                                   "tpl.log_%s"%time.strftime("%Y%m%d-%H%M%S")))
-
-        self._debuglog = logging.getLogger('_tpldebug_%03i_'%(index-1))
-
-        _log_handler = logging.FileHandler(logfile)
-        _log_handler.setFormatter(logging.Formatter(fmt='%(asctime)s[%(levelname)s:%(threadName)s]-%(name)s-(%(filename)s:%(lineno)d):: %(message)s'))
-        # _log_handler.setLevel(logging.DEBUG)
-        self._debuglog.setLevel(logging.DEBUG)
-        self._debuglog.addHandler(_log_handler)
+        self.startTrace()
         self.log.setLevel(logging.INFO)
 
+        if self['record']:
+            name = self['record']
+            if '%' in name:
+                name = name % self._index
+            self._recorder = TPLRecorder(os.path.join(SYSTEM_CONFIG_DIRECTORY, name), int(self['record_size']))
+
         self._debuglog.debug('tpl START')
         self.open()
+        self.startReader()
 
         return True
 
     def __stop__(self):
         self._debuglog.debug('tpl STOP')
+        self.stopReader()
         self.close()
 
+        # release anyone still waiting on a command
+        with self._cmdlock:
+            for cmd in self._pending.values():
+                cmd.ok = False
+                cmd.status = 'ABORTED'
+                self._complete(cmd)
+        self.abortWait()
+        self.stopTrace()
+        if self._recorder is not None:
+            self._recorder.close()
+            self._recorder = None
+
+    def startTrace(self):
+        '''
+            Open the wire trace file (debug_log) and start its writer thread. Without a file nothing is traced.
+        '''
+        self.stopTrace()
+        if not self['debug_log']:
+            return
+        name = self['debug_log']
+        if '%' in name:
+            name = name % self._index
+        self._tracelog = TraceLog(self._debuglog, os.path.join(SYSTEM_CONFIG_DIRECTORY, name),
+                                  maxbytes=int(self['debug_log_size']),
+                                  backups=int(self['debug_log_backups'])).start()
+        self._trace = TraceSampler(self['debug_trace'])
+        self._tracing = True
+
+    def stopTrace(self):
+        '''
+            Write what is left of the wire trace and close its file.
+        '''
+        if self._tracing:
+            # the stopped trace stays in place, a thread that was already tracing must not find it gone
+            self._tracing = False
+            self._trace = TraceSampler('send=0, recv=0, dispatch=0, control=0')
+            self._tracelog.stop()
+
+    @profiled
     @lock
     def control(self):
 
-        # self._debuglog.debug('[control] entering...')
+        # debug_trace may be changed at runtime
+        if self._tracing and self['debug_trace'] != self._trace.spec:
+            self._trace = TraceSampler(self['debug_trace'])
 
-        # check if there is any incomplete command
-        incomplete = np.any(np.array([not cmd.complete for cmd in self.commands_sent.values()]))
-        if incomplete:
-            self._debuglog.debug('[control] TPL has incomplete commands')
-            for cmd in self.commands_sent.values():
-                if not cmd.complete:
-                    self._debuglog.debug('[control] Command %i not complete'%cmd.id)
-        else:
-            return True
+        if self._recorder is not None:
+            self._recorder.flush()
 
-        try:
-            exp_recv = self.expect()
-        except Exception, e:
+        if self['timeline'] != self._timeline:
+            self._timeline = self['timeline']
+            timeline.enable(int(self._timeline))
+
+        if self._livereads:
+            self._expirelive()
+
+        if self._reconnect.isSet():
             self.log.error("Could not retrieve information from telescope server. Server may be down! Reconnecting and "
                            "re-sending incomplete commands.")
-            self.log.exception(e)
-            self._debuglog.exception(e)
-
-            # try:
-            #     self.disconnect()
-            # except:
-            #     self.log.exception(e)
-            #     self._debuglog.exception(e)
-
-            self.connect()
-            # incomplete = np.array([not cmd.complete for cmd in self.commands_sent.values()])
-            for cmd in self.commands_sent.values():
-                if not cmd.complete:
-                    self._debuglog.warning('Resending: %s' % cmd)
-                    self.send(cmd)
+            try:
+                self.connect()
+            except Exception, e:
+                self.log.exception(e)
+                self._debuglog.exception(e)
+                return True
+
+            with self._cmdlock:
+                self._stats.count('reconnects')
+            self._reconnect.clear()
+            if self._reactor is not None:
+                self._reactor.wake()
+            with self._cmdlock:
+                resend = sorted(self._pending.values(), key=lambda cmd: cmd.id)
+                self._stats.count('resent', len(resend))
+            for cmd in resend:
+                self._debuglog.warning('Resending: %s' % cmd)
+                self.send(cmd)
             return True
 
-        self._debuglog.debug('[control] Received %i commands'%len(exp_recv))
+        with self._cmdlock:
+            # check if there is any incomplete command
+            if self._pending:
+                if self._trace('control'):
+                    self._tracelog.debug('[control] TPL has %i incomplete commands' % len(self._pending))
+            else:
+                # nothing in flight, deadlines left in the heap all belong to completed commands
+                del self._deadlines[:]
+                return True
+
+            # History size may be changed at runtime, commands are evicted as new ones are added
+            self.commands_sent.maxlen = int(self["history"])
+
+            # Check for timed-out commands
+            now = time.time()
+            while self._deadlines and self._deadlines[0][0] < now:
+                deadline, cmdid = heapq.heappop(self._deadlines)
+                cmd = self._pending.get(cmdid)
+                if cmd is None:
+                    continue
+                self._debuglog.warning('Command %i timed out! Marking as complete with status TIMEOUT.' % cmd.id)
+                self._stats.count('timed_out')
+                cmd.ok = False
+                cmd.status = 'TIMEOUT'
+                self._complete(cmd)
+
+        if self._trace('control'):
+            self._tracelog.debug('[control] Done')
 
-        for i in range(len(exp_recv)):
-            recv = exp_recv[i]
+        return True
 
-            self._debuglog.debug(recv[2])
-            cmdid = int(recv[1].group('CMDID'))
-            if not cmdid in self.commands_sent.keys():
-                self._debuglog.warning('Received a bad command id %i. Skipping'%cmdid)
-                continue
+    def startReader(self):
+        '''
+            Start the receive thread, or hand the connection to the shared reactor.
+        '''
+        if self._reader_thread is not None and self._reader_thread.isAlive():
+            return
+
+        self._reader_abort.clear()
+
+        if self['reactor']:
+            self._reactor = TPLReactor.shared()
+            self._reactor.register(self)
+            return
+
+        self._reader_thread = threading.Thread(target=self._reader, name='TPL reader')
+        self._reader_thread.setDaemon(True)
+        self._reader_thread.start()
+
+        self._poller_thread = threading.Thread(target=self._poller, name='TPL poller')
+        self._poller_thread.setDaemon(True)
+        self._poller_thread.start()
+
+    def stopReader(self):
+        '''
+            Stop the receive and poll threads and wait for them to finish.
+        '''
+        self._reader_abort.set()
+        if self._reactor is not None:
+            self._reactor.unregister(self)
+            self._reactor = None
+        if self._reader_thread is not None:
+            self._reader_thread.join(2. * self['waittime'])
+            self._reader_thread = None
+        if self._poller_thread is not None:
+            self._poller_thread.join(2. * self['poll_period'])
+            self._poller_thread = None
+
+    def _reader(self):
+        '''
+            Receive loop. Blocks in select() on the TSI socket and dispatches every reply line to its
+            command as soon as it arrives. Connection failures are flagged for control() to reconnect.
+        '''
 
-            self.commands_sent[cmdid].received.append(recv[2])
+        while not self._reader_abort.isSet():
+
+            if self._reconnect.isSet():
+                self._reader_abort.wait(self['waittime'])
+                continue
 
+            socks = self.sockets()
             try:
-                if 'DATA INLINE' in recv[2]:
-                    if '!TYPE' in recv[2]:
-                        self.commands_sent[cmdid].dtype = _CmdType[recv[1].group('VALUE')]
-                    else:
-                        self.commands_sent[cmdid].data.append(self.commands_sent[cmdid].dtype(recv[1].group('VALUE').replace('"','')))
-                elif 'COMMAND' in recv[2]:
-                    self.commands_sent[cmdid].status = recv[1].group('STATUS')
-                    self.commands_sent[cmdid].allstatus.append(recv[1].group('STATUS'))
-                    if self.commands_sent[cmdid].status == 'OK':
-                        self.commands_sent[cmdid].ok = True
-                    elif self.commands_sent[cmdid].status == 'COMPLETE':
-                        self.commands_sent[cmdid].complete = True
-
-                elif 'EVENT ERROR' in recv[2]:
-                    self.commands_sent[cmdid].events.append(recv[1].group('ENCM'))
-
-            except Exception,e:
-                self.log.error('[control] Error on command: %s'%(recv[2][:-1]))
-                self.commands_sent[cmdid].ok = False
-                self.commands_sent[cmdid].complete = True
-                self.log.exception(e)
-                pass
+                ready = select.select(socks, [], [], self['waittime'])[0]
+            except Exception, e:
+                self._readerror(socks[-1], e)
+                continue
 
-            # incomplete = np.any(np.array([not cmd.complete for cmd in self.commands_sent.values()]))
+            if ready:
+                self._read(ready)
 
-        # Check size of commands and clear history
-        while len(self.commands_sent) > int(self["history"]):
-            self.last_cmd_deleted += 1
-            self._debuglog.debug('[control] Cleaning command history. Deleting cmd with id: %i'%self.last_cmd_deleted)
-            self.commands_sent.pop(self.last_cmd_deleted)
+    def sockets(self):
+        '''
+        :return: Open connections, the priority one (if any) first so urgent replies are read first.
+        '''
+        return [sock for sock in (self.psock, self.sock) if sock is not None]
 
-        # Check for timed-out commands
-        for cmd in self.commands_sent.values():
-            if time.time() > cmd.send_time + self['cmd_timeout']:
-                self._debuglog.warning('Command %i timed out! Marking as complete with status TIMEOUT.' % cmd.id)
-                cmd.complete = True
-                cmd.ok = False
-                cmd.status = 'TIMEOUT'
-                        
-        # self._debuglog.debug('[control] Received %i commands'%nrec)
-        # for cmd in self.commands_sent.values():
-        #     msg = '%s %s %s'%(cmd.id,cmd.status,cmd.allstatus)
-        #     self._debuglog.debug(msg)
-        self._debuglog.debug('[control] Done')
+    def _read(self, ready):
+        '''
+            Read and dispatch whatever arrived on the ready sockets.
+        '''
+        exp_recv = []
+        for sock in ready:
+            try:
+                if sock is self.psock:
+                    exp_recv.extend(self.expect(sock, self._pparser))
+                else:
+                    exp_recv.extend(self.expect())
+            except Exception, e:
+                self._readerror(sock, e)
+                return
 
-        return True
+        self._dispatch(exp_recv)
 
-    def expect(self):
+    def _readerror(self, sock, e):
+        '''
+            Flag a failed connection for control() to reconnect.
+        '''
+        if self._reader_abort.isSet() or (sock is not self.sock and sock is not self.psock):
+            # socket closed on purpose or already replaced by a new connection
+            return
+        self._debuglog.exception(e)
+        self._reconnect.set()
 
-        buff = ''
-        recv = None
-        while recv != '':
-            recv = self.sock.read_very_eager()
-            buff+=recv
+    def _poller(self):
+        '''
+            Background poll of the subscribed objects the server does not push, all of them in a single GET.
+        '''
 
-        buff = buff.split('\n')
-        ret = []
+        while not self._reader_abort.isSet():
 
-        for line in buff:
+            self._reader_abort.wait(self['poll_period'])
 
-            if len(line) < 1:
+            with self._cmdlock:
+                objects = list(self._polled)
+            if not objects or self._reconnect.isSet() or self._reader_abort.isSet():
                 continue
-            for exp in self._expect:
-                re_exp = re.search(exp,line)
-                if re_exp:
-                    ret.append((0,re_exp,line))
-                    break
+
+            try:
+                self._gettyped(objects, background=True)
+            except Exception, e:
+                self._debuglog.exception(e)
+
+    def _poll(self):
+        '''
+            Send one GET for the polled objects without waiting for it, unless the last one is still in flight.
+            Used by the reactor, the poller thread waits for its GETs instead.
+        '''
+        with self._cmdlock:
+            objects = list(self._polled)
+            busy = self._pollcmd in self._pending
+        if not objects or busy or self._reconnect.isSet():
+            return
+
+        args, types = query(objects, self._typecache)
+        self._pollcmd = self.sendcomm('GET', args, types)
+
+    def _dispatch(self, exp_recv):
+        '''
+            Update commands with the lines returned by expect().
+        '''
+
+        if self._trace('dispatch'):
+            self._tracelog.debug('[dispatch] Received %i commands' % len(exp_recv))
+
+        keep_received = self['keep_received']
+        now = time.time()
+
+        with self._cmdlock:
+            for recv in exp_recv:
+
+                if self._trace('recv'):
+                    self._tracelog.debug(recv.line)
+                # subscriptions stay pending for as long as they last, even once evicted from the history
+                cmd = self.commands_sent.get(recv.cmdid) or self._pending.get(recv.cmdid)
+                if cmd is None:
+                    self._debuglog.warning('Received a bad command id %i. Skipping'%recv.cmdid)
+                    self._stats.count('bad_id')
+                    continue
+
+                try:
+                    value = update(cmd, recv, self._typecache, keep_received)
+                    if cmd.trace is not None:
+                        if recv.kind == DATA:
+                            timeline.add(cmd.trace, 'data', recv.object)
+                        elif recv.kind == COMMAND and recv.status == 'OK':
+                            timeline.add(cmd.trace, 'ok')
+                    if value is not None:
+                        if value[0] in self._live:
+                            self._live[value[0]] = (value[1], now)
+                            self._changed.notify_all()
+                    elif recv.kind == COMMAND:
+                        if cmd.status == 'COMPLETE':
+                            self._complete(cmd)
+                        if cmd.cmd == 'SUB':
+                            self._substatus(cmd)
+                        elif cmd.status == 'OK':
+                            self._stats.record('ok', cmd.object, now - cmd.send_time)
+                        elif cmd.status == 'COMPLETE':
+                            self._stats.count('completed')
+                            self._stats.record('complete', cmd.object, now - cmd.send_time)
+
+                except Exception,e:
+                    self.log.error('[dispatch] Error on command: %s'%(recv.line))
+                    cmd.ok = False
+                    self._complete(cmd)
+                    self.log.exception(e)
+                    pass
+
+    def _substatus(self, cmd):
+        '''
+            Follow the state of a SUB command. While it is open and OK the server pushes the object, once it
+            fails or completes the object is polled instead. Must be called with _cmdlock held.
+        '''
+        if cmd.object not in self._live:
+            return
+        if cmd.ok and not cmd.complete and not cmd.events:
+            self._pushed.add(cmd.object)
+            self._polled.discard(cmd.object)
+        else:
+            self._debuglog.warning('Server does not push %s, polling it.' % cmd.object)
+            self._pushed.discard(cmd.object)
+            self._polled.add(cmd.object)
+            self._subscriptions.pop(cmd.object, None)
+
+    def _complete(self, cmd):
+        '''
+            Mark cmd as complete and drop it from the pending set. Must be called with _cmdlock held.
+        '''
+        cmd.setComplete()
+        if cmd.trace is not None:
+            timeline.add(cmd.trace, 'complete', cmd.status)
+        self._changed.notify_all()
+        self._pending.pop(cmd.id, None)
+        if cmd.id in self._background:
+            self._background.discard(cmd.id)
+            self._bgslots.release()
+
+    def expect(self, sock=None, parser=None):
+
+        sock = self.sock if sock is None else sock
+        parser = self._parser if parser is None else parser
+
+        ret = []
+        recv = sock.read_very_eager()
+        while recv != '':
+            ret.extend(parser.feed(recv))
+            recv = sock.read_very_eager()
 
         return ret
-        #return buff
-        #return self.sock.expect(self._expect,
-        #                        timeout=self['timeout'])
 
     @lock
     def open(self):  # converted to Astelco
@@ -283,34 +598,59 @@ class TPL(ChimeraObject):
 
         self.log.info( "Connecting to %s:%s"%( self['tpl_host'], self['tpl_port']))
 
-        # Open the socket
-        self.sock = telnetlib.Telnet(self['tpl_host'], self['tpl_port'], self['timeout'])
+        # Object types may have changed on the server side
+        self._typecache.clear()
+        self._parser.reset()
+
+        # nothing is pushed on the new connection until the pending SUB commands are resent and acknowledged
+        self._pushed.clear()
+
+        self.flushCache()
+
+        self.sock = self._open(MAIN)
+
+        # urgent commands get a connection of their own, so they never queue behind other traffic on the server
+        if self.psock is not None:
+            self.psock.close()
+        self._pparser.reset()
+        self.psock = self._open(PRIORITY) if self['priority_connection'] else None
+
+    def _open(self, conn=MAIN):
+        '''
+            Open a connection and go through the banner and authentication.
+
+        :param conn: MAIN or PRIORITY, to tell the connections apart in the capture.
+        :return: Connected TPLSocket.
+        '''
+        sock = TPLSocket(self['tpl_host'], self['tpl_port'], self['timeout'], nodelay=self['tcp_nodelay'],
+                         keepalive=self['tcp_keepalive'], rcvbuf=self['rcvbuf'], recorder=self._recorder,
+                         conn=conn, stats=self._stats)
 
         # Read in welcome message up to the end
-        s = self.sock.expect(['TPL2\s+(?P<TPL2>\S+)\s+CONN\s+(?P<CONN>\d+)\s+AUTH\s+(?P<AUTH>\S+(,\S+)*)\s+'
-                        'ENC MESSAGE (?P<ENCM>(.*?)\s*\\n)'],
-                             timeout=self['timeout'])
-        if not s:
-            self.sock.close()
+        s = sock.expect([BANNER], timeout=self['timeout'])
+        if s[1] is None:
+            sock.close()
             raise TPLException(
-                'self.sock.connect((' + self.host + str(self.port) + ')', 'Got None as answer.')
+                'self.sock.connect((%s, %s))' % (self['tpl_host'], self['tpl_port']), 'Got None as answer.')
 
         # parse information
         self.protocol_version, self.conn, self.auth_methods, self.encmsg = s[1].group(
             'TPL2'), s[1].group('CONN'), s[1].group('AUTH'), s[1].group('ENCM')
 
         # Sends credentials
-        self.send('AUTH PLAIN "' + self["user"] + '" "' + self["password"] + '"\r\n')
-        s = self.sock.expect(['AUTH\s+(?P<AUTH>\S+)\s+(?P<read_level>\d)\s+(?P<write_level>\d)\n'],
-                             timeout=self['timeout'])
+        self._debuglog.debug('AUTH PLAIN')
+        sock.write('AUTH PLAIN "' + self["user"] + '" "' + self["password"] + '"\r\n')
+        s = sock.expect([AUTH_REPLY], timeout=self['timeout'])
 
         if (not s[1]) or (s[1].group('AUTH') != 'OK'):
-            self.sock.close()
+            sock.close()
             raise TPLException('Not authorized.')
 
         self.read_level, self.write_level = int(
             s[1].group('read_level')), int(s[1].group('write_level'))
 
+        return sock
+
     def disconnect(self):
         '''
             Disconnect from tpl server
@@ -319,34 +659,81 @@ class TPL(ChimeraObject):
 
         # self.send('DISCONNECT')
         self.sock.close()
+        if self.psock is not None:
+            self.psock.close()
 
-    @lock
     def getNextID(self):
-        ocmid = self.next_command_id
-        self.next_command_id+=1
+        with self._idlock:
+            ocmid = self.next_command_id
+            self.next_command_id+=1
         return ocmid
 
     def getCmd(self,cmdid):
-        if cmdid in self.commands_sent.keys():
+        if cmdid in self.commands_sent:
             return self.commands_sent[cmdid]
         else:
             self.log.warning('cmdid %s does not exists.'%cmdid)
             return None
 
-    def sendcomm(self, comm, object):
-
+    def _newcommand(self, comm, object, types=None, caller=None):
         cmd = Command()
         cmd.id = self.getNextID()
         cmd.cmd = comm
         cmd.object = object
         cmd.data = []
         cmd.allstatus = []
+        if types:
+            cmd.types = types
+        # subscriptions last for as long as they are needed, only commands that complete are traced
+        if timeline.events is not None and comm != 'SUB':
+            cmd.trace = (self._index, cmd.id)
+            timeline.add(cmd.trace, 'create', ('%s %s' % (comm, object[:80]), caller))
+        return cmd
+
+    def _register(self, cmds, timeout=True):
+        '''
+            Add commands about to be sent to the history and the pending set.
+        '''
+        with self._cmdlock:
+            self._stats.count('sent', len(cmds))
+            for cmd in cmds:
+                self.commands_sent.add(cmd)
+                self._pending[cmd.id] = cmd
+                if timeout:
+                    heapq.heappush(self._deadlines, (cmd.send_time + self['cmd_timeout'], cmd.id))
+
+    def sendcomm(self, comm, object, types=None, timeout=True, urgent=False, background=False, caller=None):
+        '''
+            Send a command.
+
+        :param urgent: Safety critical command (STOP, ABORT), sent ahead of anything queued and over the
+                       priority connection if there is one.
+        :param background: Telemetry poll, waits for a free slot if background_quota commands are in flight.
+        :param caller: Instrument method sending the command ("Class.method"), shown on the timeline. It has
+                       to be passed, calls come over Pyro from another thread.
+        '''
 
-        self.commands_sent[cmd.id] = cmd
-        status = self.send(cmd)
+        cmd = self._newcommand(comm, object, types, caller)
+
+        background = background and self._bgslots is not None
+        if background:
+            self._bgslots.acquire()
+            # latency and timeout count from the send, not from the wait for a slot
+            cmd.send_time = time.time()
+            with self._cmdlock:
+                self._background.add(cmd.id)
+
+        self._register([cmd], timeout)
+        status = self.send(cmd, urgent)
+        if cmd.trace is not None:
+            timeline.add(cmd.trace, 'write')
 
         if status != SEND.OK:
-            self.commands_sent[cmd.id].status = status
+            # nothing will answer it, free its background slot and wake the waiters now, not at the timeout
+            with self._cmdlock:
+                cmd.ok = False
+                cmd.status = status
+                self._complete(cmd)
             return cmd.id
 
         # if comm in ('GET', 'SET'):
@@ -354,64 +741,132 @@ class TPL(ChimeraObject):
 
         return cmd.id
 
-    def send(self, message='\r\n'):
+    def send(self, message='\r\n', urgent=False):
 
         msg = '%s'%(message)
-        self._debuglog.debug( msg[:-1] )
+        if self._trace('send'):
+            self._tracelog.debug(msg[:-1])
 
+        # the reactor serves every instance, it must not wait for a full socket buffer (it flushes the rest
+        # once the socket is writable) nor reconnect
+        inloop = self._reactor is not None and self._reactor.inLoop()
         try:
-            self.sock.write('%s'%message)
+            if urgent and self.psock is not None:
+                self.psock.write(msg, block=not inloop)
+            else:
+                self.sock.write(msg, urgent, block=not inloop)
         except Exception, e:
             self.log.exception(e)
+            if inloop:
+                # control() reconnects, the command is not resent: sendcomm() completes it with ERROR
+                self._reconnect.set()
+                return SEND.ERROR
             self.log.warning('Reseting connection...')
-            self.close()
-            self.open()
             try:
+                self.close()
+                self.open()
                 self.sock.write('%s'%message)
             except Exception, e:
+                # e.g. the server is down, control() keeps trying to reconnect
                 self.log.exception(e)
+                self._reconnect.set()
                 return SEND.ERROR
 
         return SEND.OK
 
 
-    def get(self, object, wait=False):
+    def get(self, object, wait=False, caller=None):
 
-        ret = self.sendcomm('GET', object)
+        ret = self.sendcomm('GET', object, caller=caller)
 
         if wait:
-            start = time.time()
-            while self.commands_sent[ret].status != 'COMPLETE':
-                if time.time() > start+self['timeout']:
-                    self.log.warning('Command %i timed out...'%(ret))
-                    break
-                continue
+            self.waitCmd(ret)
 
         return ret
 
-    def set(self, object, value, wait=False, binary=False):
+    def set(self, object, value, wait=False, binary=False, urgent=False, caller=None):
 
         cmid = None
 
+        self._uncache(object)
+
         if not binary:
             obj = object + '=' + str(value)
-            cmid = self.sendcomm('SET', obj)
+            cmid = self.sendcomm('SET', obj, urgent=urgent, caller=caller)
         else:
             obj = object + ':', len(value)
-            cmid = self.sendcomm('SET', obj)
+            cmid = self.sendcomm('SET', obj, caller=caller)
             self.sock.write(value.tostring())
         if wait:
-            start = time.time()
-            while not self.commands_sent[cmid].status == "COMPLETE":
-                if  time.time() > start+self['timeout']:
-                    self.log.warning('Command %i timed out...'%(cmid))
-                    break
-                continue
+            self.waitCmd(cmid)
 
         return cmid
 
 
-    def getobject(self, object):
+    def abort(self, cmdid, wait=False, caller=None):
+        '''
+            Ask the server to abort command cmdid. Sent as an urgent command.
+        '''
+        ocmid = self.sendcomm('ABORT', str(cmdid), urgent=True, caller=caller)
+        if wait:
+            self.waitCmd(ocmid)
+        return ocmid
+
+    def pipeline(self, commands, wait=True):
+        '''
+            Send several commands with a single write and wait for all of them at once, so they cost about one
+            round trip instead of one each. The server runs them in the order given.
+
+        :param commands: List of ('SET', object, value) and ('GET', object) tuples.
+        :param wait: Wait for all commands to complete.
+        :return: List with a dictionary for each command, with keys id, command, object, status (COMPLETE
+                 on success), events (error messages) and value (GET only).
+        '''
+        cmds = []
+        for command in commands:
+            comm, object = command[0], command[1]
+            if comm == 'SET':
+                self._uncache(object)
+                cmds.append(self._newcommand('SET', '%s=%s' % (object, command[2])))
+            elif comm == 'GET':
+                dtype = self._typecache.get(object)
+                if dtype is None:
+                    cmds.append(self._newcommand('GET', '%s!TYPE;%s' % (object, object)))
+                else:
+                    cmds.append(self._newcommand('GET', object, {object: dtype}))
+            else:
+                raise TPLException('Can not pipeline %s commands.' % comm)
+
+        self._register(cmds)
+        status = self.send(''.join([str(cmd) for cmd in cmds]))
+        for cmd in cmds:
+            if cmd.trace is not None:
+                timeline.add(cmd.trace, 'write')
+        if status != SEND.OK:
+            with self._cmdlock:
+                for cmd in cmds:
+                    cmd.ok = False
+                    cmd.status = status
+                    self._complete(cmd)
+
+        if wait:
+            for cmd in cmds:
+                cmd.wait()
+
+        ret = []
+        for command, cmd in zip(commands, cmds):
+            result = {'id': cmd.id,
+                      'command': command[0],
+                      'object': command[1],
+                      'status': cmd.status,
+                      'events': list(cmd.events)}
+            if command[0] == 'GET':
+                result['value'] = cmd.values.get(command[1])
+            ret.append(result)
+
+        return ret
+
+    def getobject(self, object, caller=None):
 
         # ocmid = self.get(object + '!TYPE', wait=True)
         #
@@ -432,16 +887,16 @@ class TPL(ChimeraObject):
         #     log.warning( 'TPL2 getobject: got status %s ...' %st)
         #     return None
 
-        ocmid = self.get(object + '!TYPE;' + object, wait=True)
+        hits, misses, generation = self._cacheget([object])
+        if not misses:
+            return hits[object]
 
-        start = time.time()
-        while not self.commands_sent[ocmid].complete:
-            time.sleep(self["waittime"])
-            if time.time() > start+self["timeout"]:
-                break
+        ocmid = self._gettyped([object], caller=caller)
 
         if len(self.commands_sent[ocmid].data) > 0:
-            return self.commands_sent[ocmid].data[0]
+            value = self.commands_sent[ocmid].data[0]
+            self._cacheput({object: value}, generation)
+            return value
         else:
             cmd = '%s'%self.commands_sent[ocmid]
             self.log.warning('Command %s returned nothing...'%(cmd[:-2]))
@@ -475,5 +930,425 @@ class TPL(ChimeraObject):
             self.received_objects[object] = None
         return self.received_objects[object]
 
-    def succeeded(self,cmdid):
-         return self.commands_sent[cmdid].status == 'COMPLETE'
\ No newline at end of file
+    def waitCmd(self, cmdid):
+        '''
+            Block until command cmdid completes. Time outs are enforced by control(), which completes the
+            command with status TIMEOUT after cmd_timeout seconds, so waiting costs no CPU at all.
+
+        :return: Command status.
+        '''
+        cmd = self.commands_sent[cmdid]
+        cmd.wait()
+        if cmd.status == 'TIMEOUT':
+            self.log.warning('Command %i timed out...'%(cmdid))
+        return cmd.status
+
+    def getobjects(self, objects, background=False, caller=None):
+        '''
+            Get several objects with a single GET command.
+
+        :param objects: List of object names.
+        :param background: Periodic telemetry read, subject to background_quota.
+        :param caller: Instrument method reading them, for the timeline (see sendcomm).
+        :return: Dictionary with the typed value of each object (None if the server returned nothing).
+        '''
+
+        ret, misses, generation = self._cacheget(objects)
+        if not misses:
+            return ret
+
+        ocmid = self._gettyped(misses, background, caller)
+
+        values = self.commands_sent[ocmid].values
+        fetched = {}
+        for obj in misses:
+            if obj not in values:
+                self.log.warning('Command %i returned nothing for %s...' % (ocmid, obj))
+            fetched[obj] = values.get(obj)
+
+        self._cacheput(fetched, generation)
+        ret.update(fetched)
+
+        return ret
+
+    def _cachettl(self, object):
+        '''
+            TTL of object from the first matching cache_ttl pattern, 0 if it is not cached. Must be called with
+            _cmdlock held.
+        '''
+        conf = self['cache_ttl']
+        if conf != self._cacheconf:
+            # TTLs changed, entries stored with the old ones go
+            self._cacheconf = conf
+            self._cachepatterns = []
+            self._cachettls = {}
+            self._cache.clear()
+            self._cachegen += 1
+            for entry in (conf or '').split(','):
+                pattern, sep, ttl = entry.strip().rpartition('=')
+                if pattern:
+                    regex = re.compile('^%s$' % re.escape(pattern).replace('\\*', '.*'))
+                    self._cachepatterns.append((regex, float(ttl)))
+
+        ttl = self._cachettls.get(object)
+        if ttl is None:
+            ttl = 0.
+            for regex, pttl in self._cachepatterns:
+                if regex.match(object):
+                    ttl = pttl
+                    break
+            self._cachettls[object] = ttl
+
+        return ttl
+
+    def _cacheget(self, objects):
+        '''
+            Look objects up in the cache, counting hits and misses of the cacheable ones.
+
+        :return: (dictionary of cached values, list of objects to get from the server, cache generation)
+        '''
+        now = time.time()
+        hits = {}
+        misses = []
+        with self._cmdlock:
+            for obj in objects:
+                if self._cachettl(obj) <= 0.:
+                    misses.append(obj)
+                    continue
+                value, expires = self._cache.get(obj, (None, 0.))
+                stats = self._cachestats.setdefault(obj, [0, 0])
+                if now < expires:
+                    hits[obj] = value
+                    stats[0] += 1
+                else:
+                    misses.append(obj)
+                    stats[1] += 1
+            return hits, misses, self._cachegen
+
+    def _cacheput(self, values, generation):
+        '''
+            Store values read from the server, unless the cache was invalidated since the read started.
+        '''
+        now = time.time()
+        with self._cmdlock:
+            if generation != self._cachegen:
+                return
+            for obj, value in values.items():
+                ttl = self._cachettl(obj)
+                if ttl > 0. and value is not None:
+                    self._cache[obj] = (value, now + ttl)
+
+    def _uncache(self, object):
+        with self._cmdlock:
+            self._cachegen += 1
+            self._cache.pop(object, None)
+            # a GET already in flight may have left before the write, later readers send their own
+            for key in [key for key in self._inflight if object in key]:
+                del self._inflight[key]
+
+    def flushCache(self):
+        '''
+            Drop every cached value.
+        '''
+        with self._cmdlock:
+            self._cachegen += 1
+            self._cache.clear()
+            self._inflight.clear()
+
+    def getCacheStats(self):
+        '''
+            Cache counters, to tune cache_ttl.
+
+        :return: Dictionary with the total "hits" and "misses" and, in "objects", [hits, misses] of each cacheable
+                 object.
+        '''
+        with self._cmdlock:
+            objects = dict([(obj, list(stats)) for obj, stats in self._cachestats.items()])
+        return {'hits': sum([stats[0] for stats in objects.values()]),
+                'misses': sum([stats[1] for stats in objects.values()]),
+                'objects': objects}
+
+    def getStats(self):
+        '''
+            Performance counters: commands "sent", "completed", "timed_out" and "resent", reply lines with
+            an unknown command id ("bad_id"), "reconnects", "bytes_in" and "bytes_out", and latency
+            histograms of send to COMMAND OK and to COMMAND COMPLETE by object family (see TPLStats.snapshot).
+
+        :return: Dictionary of plain values.
+        '''
+        with self._cmdlock:
+            return self._stats.snapshot()
+
+    def getTimeline(self, seconds=None):
+        '''
+            Command lifecycles of the last seconds (all that are kept if None) as Chrome trace / Perfetto JSON,
+            see the timeline option and Timeline.export().
+
+        :return: Dictionary ready for json.dump().
+        '''
+        return timeline.export(seconds)
+
+    def getControlProfile(self):
+        '''
+            Tick times of control() against freq and its most sampled stacks, see the profile option.
+
+        :return: dict from ControlProfile.snapshot().
+        '''
+        return controlprofile(self).snapshot()
+
+    def resetStats(self):
+        '''
+            Start the counters of getStats() over.
+        '''
+        with self._cmdlock:
+            self._stats.reset()
+
+    def _gettyped(self, objects, background=False, caller=None):
+        '''
+            Send a GET for objects and wait for it to complete. OBJ!TYPE is only requested for objects
+            not yet in the type cache, the cached types are attached to the command for dispatch. If the same
+            GET is already in flight the caller shares its result instead of sending another one.
+
+        :return: command id
+        '''
+        key = tuple(objects)
+        with self._cmdlock:
+            flight = self._inflight.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._inflight[key] = [None, threading.Event()]
+
+        if not leader:
+            flight[1].wait()
+            if flight[0] is not None:
+                return flight[0]
+            # the GET we waited for failed to go out, send our own
+
+        try:
+            args, types = query(objects, self._typecache)
+            ocmid = self.sendcomm('GET', args, types, background=background, caller=caller)
+            self.waitCmd(ocmid)
+            flight[0] = ocmid
+        finally:
+            if leader:
+                with self._cmdlock:
+                    # the entry may have been detached by a write and replaced by a newer GET
+                    if self._inflight.get(key) is flight:
+                        del self._inflight[key]
+                flight[1].set()
+
+        return ocmid
+
+    def subscribe(self, object):
+        '''
+            Keep object in the live value table. The server is asked to push its changes (SUB), it is polled
+            in the background instead if "subscribe" is False or the server refuses.
+        '''
+        with self._cmdlock:
+            if object in self._live:
+                return
+            self._live[object] = (None, 0.)
+
+        # first value, and its type for the updates
+        self._gettyped([object])
+
+        if not self['subscribe']:
+            with self._cmdlock:
+                self._polled.add(object)
+            if self._reactor is not None:
+                self._reactor.wake()
+            return
+
+        types = {}
+        if object in self._typecache:
+            types[object] = self._typecache[object]
+        cmdid = self.sendcomm('SUB', object, types, timeout=False)
+        with self._cmdlock:
+            if object in self._live and object not in self._polled:
+                self._subscriptions[object] = cmdid
+
+    def unsubscribe(self, object):
+        '''
+            Drop object from the live value table.
+        '''
+        with self._cmdlock:
+            self._live.pop(object, None)
+            self._pushed.discard(object)
+            self._polled.discard(object)
+            cmdid = self._subscriptions.pop(object, None)
+            cmd = self._pending.get(cmdid)
+            if cmd is not None:
+                self._complete(cmd)
+
+        if cmdid is not None:
+            self.sendcomm('UNSUB', object)
+
+    def getstamped(self, object):
+        '''
+            Value of object from the live value table and the time it was received, pushed or polled. A push
+            stream that stopped shows as an old timestamp.
+
+        :return: (value, timestamp), (None, 0.) if object is not subscribed or was not received yet.
+        '''
+        return self._live.get(object, (None, 0.))
+
+    def _expirelive(self):
+        '''
+            Unsubscribe the objects getlive() subscribed that were not read for live_expire seconds, unless a
+            waitFor() is using them.
+        '''
+        expire = self['live_expire']
+        if expire <= 0:
+            return
+        now = time.time()
+        with self._cmdlock:
+            expired = [obj for obj, read in self._livereads.items()
+                       if now - read > expire and obj not in self._waiting]
+            for obj in expired:
+                del self._livereads[obj]
+        for obj in expired:
+            self._debuglog.debug('No one read %s for %.0f s, unsubscribing.' % (obj, expire))
+            self.unsubscribe(obj)
+
+    def getlive(self, object, maxage=None):
+        '''
+            Latest value of object from memory, subscribing to it on first use. If the value is older than
+            maxage seconds (default live_maxage) it is read again from the server. The subscription ends after
+            live_expire seconds without a read.
+        '''
+        self._livereads[object] = time.time()
+        if object not in self._live:
+            self.subscribe(object)
+
+        value, stamp = self.getstamped(object)
+        if time.time() - stamp > (self['live_maxage'] if maxage is None else maxage):
+            self._gettyped([object])
+            value, stamp = self.getstamped(object)
+
+        return value
+
+    def getliveobjects(self, objects, maxage=None, background=False):
+        '''
+            getlive() for several objects at once. Stale ones are read again with a single GET.
+
+        :return: Dictionary with the value of each object.
+        '''
+        now = time.time()
+        for obj in objects:
+            self._livereads[obj] = now
+            if obj not in self._live:
+                self.subscribe(obj)
+
+        maxage = self['live_maxage'] if maxage is None else maxage
+        now = time.time()
+        stale = [obj for obj in objects if now - self.getstamped(obj)[1] > maxage]
+        if stale:
+            self._gettyped(stale, background)
+
+        return dict([(obj, self.getstamped(obj)[0]) for obj in objects])
+
+    def waitFor(self, objects, predicates, timeout=None, cmdid=None, mode='all', tag=None):
+        '''
+            Wait, here in the TPL process, until objects meet their predicates. The objects are followed in the
+            live value table (subscribed while waiting), so the wait costs no remote call per check.
+
+        :param objects: Object name or list of names.
+        :param predicates: A predicate for every object, or a list with one per object. Predicates are tuples:
+                           ('==', v), ('!=', v), ('<', v), ('<=', v), ('>', v), ('>=', v), ('set', mask) all
+                           bits of mask set, ('clear', mask) all bits clear, ('near', angle, tolerance) less than
+                           tolerance degrees from angle.
+        :param timeout: Seconds, None to wait until done or aborted.
+        :param cmdid: Also wait for this command to complete.
+        :param mode: 'all' waits for every predicate (and the command), 'any' for the first of them.
+        :param tag: Name for abortWait().
+        :return: (status, values), status is 'DONE', 'TIMEOUT' or 'ABORTED' and values has the last value of
+                 each object.
+        '''
+        if isinstance(objects, basestring):
+            objects = [objects]
+        if isinstance(predicates, tuple):
+            predicates = [predicates] * len(objects)
+        if len(predicates) != len(objects):
+            raise TPLException('waitFor needs one predicate per object.')
+        tests = []
+        for predicate in predicates:
+            if predicate[0] not in _Predicates:
+                raise TPLException('Unknown predicate %s.' % (predicate,))
+            tests.append((_Predicates[predicate[0]], predicate[1:]))
+
+        # subscribe objects not already live, for as long as some wait needs them
+        owned = []
+        with self._cmdlock:
+            for obj in objects:
+                if obj in self._waitrefs:
+                    self._waitrefs[obj] += 1
+                    owned.append(obj)
+                elif obj not in self._live:
+                    self._waitrefs[obj] = 1
+                    owned.append(obj)
+            for obj in objects:
+                self._waiting[obj] = self._waiting.get(obj, 0) + 1
+            aborted = [False]
+            self._waits.setdefault(tag, []).append(aborted)
+
+        deadline = None if timeout is None else time.time() + timeout
+        try:
+            for obj in owned:
+                self.subscribe(obj)
+
+            with self._changed:
+                cmd = None if cmdid is None else self.commands_sent.get(cmdid) or self._pending.get(cmdid)
+                while True:
+                    values = dict([(obj, self._live.get(obj, (None, 0.))[0]) for obj in objects])
+                    met = [value is not None and test(value, arg)
+                           for value, (test, arg) in zip([values[obj] for obj in objects], tests)]
+                    complete = cmd is None or cmd.complete
+                    if mode == 'any' and (True in met or (cmdid is not None and complete)) or \
+                            mode != 'any' and False not in met and complete:
+                        status = 'DONE'
+                        if cmd is not None and cmd.trace is not None and cmd.complete:
+                            timeline.add(cmd.trace, 'wake')
+                        break
+                    if aborted[0]:
+                        status = 'ABORTED'
+                        break
+                    remaining = None if deadline is None else deadline - time.time()
+                    if remaining is not None and remaining <= 0:
+                        status = 'TIMEOUT'
+                        break
+                    self._changed.wait(remaining)
+        finally:
+            unsubscribe = []
+            with self._cmdlock:
+                self._waits[tag].remove(aborted)
+                if not self._waits[tag]:
+                    del self._waits[tag]
+                for obj in objects:
+                    self._waiting[obj] -= 1
+                    if not self._waiting[obj]:
+                        del self._waiting[obj]
+                for obj in owned:
+                    self._waitrefs[obj] -= 1
+                    if not self._waitrefs[obj]:
+                        del self._waitrefs[obj]
+                        unsubscribe.append(obj)
+            for obj in unsubscribe:
+                self.unsubscribe(obj)
+
+        return status, values
+
+    def abortWait(self, tag=None):
+        '''
+            Make the waitFor() calls with this tag return ABORTED, all of them if tag is None.
+        '''
+        with self._changed:
+            for waittag, flags in self._waits.items():
+                if tag is None or waittag == tag:
+                    for aborted in flags:
+                        aborted[0] = True
+            self._changed.notify_all()
+
+    def succeeded(self, cmdid, wait=False):
+        if wait:
+            self.waitCmd(cmdid)
+        return self.commands_sent[cmdid].status == 'COMPLETE'
@@ -0,0 +1,316 @@
+#! /usr/bin/env python
+# -*- coding: iso-8859-1 -*-
+
+# chimera - observatory automation system
+# Copyright (C) 2006-2007  P. Henrique Silva <henrique@astro.ufsc.br>
+
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA
+# 02110-1301, USA.
+
+'''
+asyncio client for the TPL2 protocol.
+
+AsyncTPL has the command API of the TPL instrument (get, set, getobject(s), getCmd, succeeded, waitCmd) as
+coroutines on one event loop, so a single thread can follow many objects on several TSI servers at once.
+Replies go through the same TPLParser and Command bookkeeping (tplcommand) as TPL. Each command has a future
+that completes with it, on COMMAND COMPLETE, after cmd_timeout (status TIMEOUT) or on close() (ABORTED).
+
+Written for trollius, the python 2 port of asyncio (coroutines use ``yield From(...)`` and
+``raise Return(...)``). Only this module needs it, and it is not installed with the package
+(``pip install trollius``).
+
+::
+
+    import trollius as asyncio
+    from trollius import From
+
+    @asyncio.coroutine
+    def watch(hosts, objects):
+        tpls = [AsyncTPL(host, 65432) for host in hosts]
+        yield From(asyncio.gather(*[tpl.connect() for tpl in tpls]))
+        values = yield From(asyncio.gather(*[tpl.getobjects(objects) for tpl in tpls]))
+        yield From(asyncio.gather(*[tpl.close() for tpl in tpls]))
+'''
+
+try:
+    import trollius as asyncio
+    from trollius import From, Return
+except ImportError:
+    raise ImportError('AsyncTPL needs trollius (pip install trollius), the TPL instrument does not.')
+
+from tplparser import TPLParser, COMMAND, BANNER, AUTH_REPLY
+from tplcommand import Command, CommandHistory, update, query
+
+__all__ = ["AsyncTPL", "AsyncTPLException"]
+
+
+class AsyncTPLException(Exception):
+    pass
+
+
+class AsyncTPL(object):
+    '''
+    TPL2 client on an asyncio event loop. A lost connection is reopened, and the pending commands resent,
+    every waittime seconds until it succeeds or close() is called.
+    '''
+
+    def __init__(self, host, port, user='admin', password='admin', timeout=60., cmd_timeout=60., waittime=0.5,
+                 history=1000, keep_received=True, loop=None):
+        self.host = host
+        self.port = port
+        self.user = user
+        self.password = password
+        self.timeout = timeout
+        self.cmd_timeout = cmd_timeout
+        self.waittime = waittime
+        self.keep_received = keep_received
+        self.loop = asyncio.get_event_loop() if loop is None else loop
+
+        self.protocol_version = self.conn = self.auth_methods = self.encmsg = None
+        self.read_level = self.write_level = None
+
+        self.next_command_id = 1
+        self.commands_sent = CommandHistory(history)
+        self._pending = {}
+        self._futures = {}
+        self._timers = {}
+        self._typecache = {}
+        self._parser = TPLParser()
+
+        self._reader = None
+        self._writer = None
+        self._task = None
+        self._closing = False
+
+    @asyncio.coroutine
+    def connect(self):
+        '''
+            Open the connection, authenticate and start receiving.
+        '''
+        self._closing = False
+        yield From(self._open())
+        self._task = self.loop.create_task(self._receive())
+
+    @asyncio.coroutine
+    def close(self):
+        '''
+            Close the connection. Commands still pending complete with status ABORTED.
+        '''
+        self._closing = True
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                yield From(self._task)
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self._writer is not None:
+            self._writer.close()
+            self._reader = self._writer = None
+
+        for cmd in sorted(self._pending.values(), key=lambda cmd: cmd.id):
+            cmd.ok = False
+            cmd.status = 'ABORTED'
+            self._complete(cmd)
+
+    @asyncio.coroutine
+    def _open(self):
+        # Object types may have changed on the server side
+        self._typecache.clear()
+        self._parser.reset()
+
+        reader, writer = yield From(asyncio.wait_for(asyncio.open_connection(self.host, self.port, loop=self.loop),
+                                                     self.timeout, loop=self.loop))
+        try:
+            line = yield From(asyncio.wait_for(reader.readline(), self.timeout, loop=self.loop))
+            banner = BANNER.match(line)
+            if banner is None:
+                raise AsyncTPLException('%s:%s answered %r, not a TPL2 banner.' % (self.host, self.port, line))
+            self.protocol_version, self.conn, self.auth_methods, self.encmsg = banner.group(
+                'TPL2'), banner.group('CONN'), banner.group('AUTH'), banner.group('ENCM')
+
+            writer.write('AUTH PLAIN "' + self.user + '" "' + self.password + '"\r\n')
+            line = yield From(asyncio.wait_for(reader.readline(), self.timeout, loop=self.loop))
+            auth = AUTH_REPLY.match(line)
+            if auth is None or auth.group('AUTH') != 'OK':
+                raise AsyncTPLException('Not authorized.')
+            self.read_level, self.write_level = int(auth.group('read_level')), int(auth.group('write_level'))
+        except Exception:
+            writer.close()
+            raise
+
+        self._reader, self._writer = reader, writer
+
+        for cmd in sorted(self._pending.values(), key=lambda cmd: cmd.id):
+            writer.write(str(cmd))
+
+    @asyncio.coroutine
+    def _receive(self):
+        '''
+            Receive loop, dispatches every reply line to its command and reconnects when the server goes away.
+        '''
+        while not self._closing:
+            try:
+                data = yield From(self._reader.read(65536))
+                if not data:
+                    raise EOFError('TPL connection closed')
+            except (EOFError, EnvironmentError):
+                self._writer.close()
+                self._reader = self._writer = None
+                yield From(self._reconnect())
+                continue
+
+            self._dispatch(self._parser.feed(data))
+
+    @asyncio.coroutine
+    def _reconnect(self):
+        while not self._closing:
+            yield From(asyncio.sleep(self.waittime, loop=self.loop))
+            try:
+                yield From(self._open())
+                return
+            except Exception:
+                # server still down
+                continue
+
+    def _dispatch(self, replies):
+        '''
+            Update commands with reply lines from the parser.
+        '''
+        for recv in replies:
+            cmd = self.commands_sent.get(recv.cmdid) or self._pending.get(recv.cmdid)
+            if cmd is None:
+                continue
+            try:
+                update(cmd, recv, self._typecache, self.keep_received)
+            except Exception:
+                cmd.ok = False
+                self._complete(cmd)
+                continue
+            if recv.kind == COMMAND and cmd.status == 'COMPLETE':
+                self._complete(cmd)
+
+    def _complete(self, cmd):
+        cmd.setComplete()
+        self._pending.pop(cmd.id, None)
+        timer = self._timers.pop(cmd.id, None)
+        if timer is not None:
+            timer.cancel()
+        future = self._futures.pop(cmd.id, None)
+        if future is not None and not future.done():
+            future.set_result(cmd.status)
+
+    def _timeout(self, cmdid):
+        cmd = self._pending.get(cmdid)
+        if cmd is None:
+            return
+        cmd.ok = False
+        cmd.status = 'TIMEOUT'
+        self._complete(cmd)
+
+    def getNextID(self):
+        ocmid = self.next_command_id
+        self.next_command_id += 1
+        return ocmid
+
+    def getCmd(self, cmdid):
+        return self.commands_sent.get(cmdid)
+
+    def sendcomm(self, comm, object, types=None):
+        '''
+            Send a command, without waiting for it. While the connection is down it goes out on reconnect.
+
+        :return: command id
+        '''
+        cmd = Command()
+        cmd.id = self.getNextID()
+        cmd.cmd = comm
+        cmd.object = object
+        if types:
+            cmd.types = types
+
+        self.commands_sent.add(cmd)
+        self._pending[cmd.id] = cmd
+        self._futures[cmd.id] = asyncio.Future(loop=self.loop)
+        self._timers[cmd.id] = self.loop.call_later(self.cmd_timeout, self._timeout, cmd.id)
+
+        if self._writer is not None:
+            self._writer.write(str(cmd))
+
+        return cmd.id
+
+    @asyncio.coroutine
+    def waitCmd(self, cmdid):
+        '''
+            Wait for command cmdid to complete. Cancelling the wait leaves the command alone.
+
+        :return: Command status, None if the command is no longer in the history.
+        '''
+        cmd = self.commands_sent.get(cmdid) or self._pending.get(cmdid)
+        if cmd is None:
+            raise Return(None)
+        future = self._futures.get(cmdid)
+        if future is not None:
+            yield From(asyncio.shield(future, loop=self.loop))
+        raise Return(cmd.status)
+
+    @asyncio.coroutine
+    def get(self, object, wait=False):
+        ocmid = self.sendcomm('GET', object)
+        if wait:
+            yield From(self.waitCmd(ocmid))
+        raise Return(ocmid)
+
+    @asyncio.coroutine
+    def set(self, object, value, wait=False):
+        ocmid = self.sendcomm('SET', object + '=' + str(value))
+        if wait:
+            yield From(self.waitCmd(ocmid))
+        raise Return(ocmid)
+
+    @asyncio.coroutine
+    def abort(self, cmdid, wait=False):
+        ocmid = self.sendcomm('ABORT', str(cmdid))
+        if wait:
+            yield From(self.waitCmd(ocmid))
+        raise Return(ocmid)
+
+    @asyncio.coroutine
+    def getobject(self, object):
+        values = yield From(self.getobjects([object]))
+        raise Return(values[object])
+
+    @asyncio.coroutine
+    def getobjects(self, objects):
+        '''
+            Get several objects with a single GET command.
+
+        :return: Dictionary with the typed value of each object (None if the server returned nothing).
+        '''
+        args, types = query(objects, self._typecache)
+        ocmid = self.sendcomm('GET', args, types)
+        # pending until it completes, the history may drop it before we are done with it
+        cmd = self._pending[ocmid]
+        yield From(self.waitCmd(ocmid))
+        raise Return(dict([(obj, cmd.values.get(obj)) for obj in objects]))
+
+    @asyncio.coroutine
+    def succeeded(self, cmdid, wait=False):
+        if wait:
+            status = yield From(self.waitCmd(cmdid))
+        else:
+            cmd = self.getCmd(cmdid)
+            status = None if cmd is None else cmd.status
+        raise Return(status == 'COMPLETE')
@@ -0,0 +1,176 @@
+#! /usr/bin/env python
+# -*- coding: iso-8859-1 -*-
+
+# chimera - observatory automation system
+# Copyright (C) 2006-2007  P. Henrique Silva <henrique@astro.ufsc.br>
+
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA
+# 02110-1301, USA.
+
+import time
+import threading
+from collections import defaultdict, deque
+
+from tplparser import DATA, COMMAND, EVENT
+from tpltimeline import timeline
+
+__all__ = ["Command", "CommandHistory", "update", "query"]
+
+
+def retStr():
+    return str
+
+_CmdType = defaultdict(retStr)
+
+_CmdType['0'] = str
+_CmdType['1'] = int
+_CmdType['2'] = float
+_CmdType['3'] = str
+
+class Command(object):
+
+    __slots__ = ('id', 'cmd', 'object', 'received', 'events', 'dtype', 'status', 'allstatus', 'ok', 'complete',
+                 'data', 'values', 'types', 'send_time', 'trace', '_done')
+
+    def __init__(self):
+        self.id = 0
+        self.cmd = None
+        self.object = None
+        self.received = []
+        self.events = []
+        self.dtype = str
+        self.status = None
+        self.allstatus = []
+        self.ok = False
+        self.complete = False
+        self.data = []
+        self.values = {}
+        self.types = {}
+        self.send_time = time.time()
+        # timeline key, if the command is traced
+        self.trace = None
+        self._done = threading.Event()
+
+    def __str__(self):
+        return str(self.id) + ' ' + self.cmd + ' ' + self.object + '\r\n'
+
+    def __getstate__(self):
+        # Events can not be pickled, the proxy side gets a fresh one
+        return dict([(name, getattr(self, name)) for name in self.__slots__[:-1]])
+
+    def __setstate__(self, state):
+        for name, value in state.items():
+            setattr(self, name, value)
+        self._done = None if self.complete else threading.Event()
+
+    def setComplete(self):
+        '''
+            Mark command as complete and wake up anyone waiting on it. The event is dropped afterwards, so
+            completed commands kept in the history do not hold on to it.
+        '''
+        self.complete = True
+        done = self._done
+        if done is not None:
+            done.set()
+            self._done = None
+
+    def wait(self, timeout=None):
+        '''
+            Block until the command completes (COMPLETE, TIMEOUT or error) or timeout expires. Note that on
+            python 2 a wait with timeout is a sleep/poll loop, only wait() without timeout is a real block.
+
+        :return: True if the command is complete.
+        '''
+        done = self._done
+        if done is not None:
+            done.wait(timeout)
+        if self.trace is not None and self.complete:
+            timeline.add(self.trace, 'wake')
+        return self.complete
+
+
+class CommandHistory(dict):
+    '''
+    Commands by id, bounded to the last maxlen added. Eviction follows insertion order and is O(1), ids need
+    not be contiguous and a command already removed is simply skipped.
+    '''
+
+    def __init__(self, maxlen):
+        dict.__init__(self)
+        self.maxlen = maxlen
+        self._order = deque()
+
+    def add(self, cmd):
+        self[cmd.id] = cmd
+        self._order.append(cmd.id)
+        while len(self._order) > self.maxlen:
+            self.pop(self._order.popleft(), None)
+
+
+def update(cmd, recv, typecache=None, keep_received=True):
+    '''
+        Apply one reply line (a tplparser Reply) to its command. Completion is left to the caller, which sees
+        cmd.status == 'COMPLETE'. A SUB command keeps only the latest value of its object.
+
+    :param typecache: Object types learned from OBJ!TYPE replies are added here.
+    :return: (object, value) if the line carries a new object value, None otherwise.
+    '''
+    subscription = cmd.cmd == 'SUB'
+
+    if keep_received and not subscription:
+        cmd.received.append(recv.line)
+
+    if recv.kind == DATA:
+        if recv.status != 'INLINE':
+            return None
+        obj = recv.object
+        if obj.endswith('!TYPE'):
+            cmd.dtype = _CmdType[recv.value]
+            cmd.types[obj[:-5]] = cmd.dtype
+            if typecache is not None:
+                typecache[obj[:-5]] = cmd.dtype
+            return None
+        value = cmd.types.get(obj, cmd.dtype)(recv.value.replace('"',''))
+        if not subscription:
+            cmd.data.append(value)
+        cmd.values[obj] = value
+        return obj, value
+    elif recv.kind == COMMAND:
+        cmd.status = recv.status
+        cmd.allstatus.append(recv.status)
+        if cmd.status == 'OK':
+            cmd.ok = True
+    elif recv.kind == EVENT and recv.status == 'ERROR':
+        cmd.events.append(recv.value)
+
+    return None
+
+
+def query(objects, typecache):
+    '''
+        GET arguments for objects. OBJ!TYPE is only requested for objects not in typecache.
+
+    :return: (GET argument, {object: type} of the cached types)
+    '''
+    args = []
+    types = {}
+    for obj in objects:
+        dtype = typecache.get(obj)
+        if dtype is None:
+            args.append(obj + '!TYPE')
+        else:
+            types[obj] = dtype
+        args.append(obj)
+    return ';'.join(args), types
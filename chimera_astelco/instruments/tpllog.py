@@ -0,0 +1,214 @@
+#! /usr/bin/env python
+# -*- coding: iso-8859-1 -*-
+
+# chimera - observatory automation system
+# Copyright (C) 2006-2007  P. Henrique Silva <henrique@astro.ufsc.br>
+
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA
+# 02110-1301, USA.
+
+import os
+import sys
+import time
+import gzip
+import shutil
+import threading
+import traceback
+import logging
+import logging.handlers
+from collections import deque
+
+__all__ = ["TraceSampler", "TraceHandler", "GzipRotatingFileHandler", "TraceLog"]
+
+# message classes of the wire trace
+KINDS = ('send', 'recv', 'dispatch', 'control')
+
+# most entries formatted and written at once by the writer thread
+BATCH = 200
+
+
+class TraceSampler(object):
+    '''
+    Which trace messages of each class are written, from a spec like "send=1, recv=10, control=0": every
+    message (1), one in N, or none (0). Classes left out are written. Calling the sampler with a class
+    tells whether the next message of that class goes to the trace, without building it.
+    '''
+
+    def __init__(self, spec=''):
+        self.spec = spec
+        self.every = dict([(kind, 1) for kind in KINDS])
+        self._counts = dict([(kind, 0) for kind in KINDS])
+        for item in spec.split(','):
+            if not item.strip():
+                continue
+            kind, every = item.split('=')
+            self.every[kind.strip()] = int(every)
+
+    def __call__(self, kind):
+        every = self.every.get(kind, 1)
+        if every == 1:
+            return True
+        if every <= 0:
+            return False
+        # unlocked, a count lost between threads only moves the sample
+        count = self._counts.get(kind, 0) + 1
+        self._counts[kind] = count
+        return count % every == 0
+
+
+class TraceHandler(logging.Handler):
+    '''
+    Hands the records of a logger to a TraceLog, for the messages (warnings, exceptions) that are not on
+    the hot path and go through logging.
+    '''
+
+    def __init__(self, trace):
+        logging.Handler.__init__(self)
+        self.trace = trace
+
+    def emit(self, record):
+        try:
+            msg = record.getMessage()
+            if record.exc_info:
+                msg = '%s\n%s' % (msg, logging._defaultFormatter.formatException(record.exc_info))
+            self.trace.put(record.created, record.levelname, record.threadName, msg)
+        except Exception:
+            self.handleError(record)
+
+
+class GzipRotatingFileHandler(logging.handlers.RotatingFileHandler):
+    '''
+    RotatingFileHandler keeping its backups gzipped, name.1.gz being the newest.
+    '''
+
+    def doRollover(self):
+        if self.stream:
+            self.stream.close()
+            self.stream = None
+        if self.backupCount > 0:
+            for i in range(self.backupCount - 1, 0, -1):
+                src = '%s.%i.gz' % (self.baseFilename, i)
+                if os.path.exists(src):
+                    os.rename(src, '%s.%i.gz' % (self.baseFilename, i + 1))
+            with open(self.baseFilename, 'rb') as src:
+                dst = gzip.open('%s.1.gz' % self.baseFilename, 'wb')
+                try:
+                    shutil.copyfileobj(src, dst)
+                finally:
+                    dst.close()
+        os.remove(self.baseFilename)
+        self.stream = self._open()
+
+
+class TraceLog(object):
+    '''
+    The TPL wire trace. debug() only appends (time, level, thread, message) to a bounded queue, without
+    building a logging record; a background thread formats the queue every interval seconds and writes it
+    to a GzipRotatingFileHandler. The file is appended to across restarts and rotated once it reaches
+    maxbytes. Entries that do not fit in the queue are dropped and counted, the I/O threads never wait
+    for the disk. The records of logger are written to the same file.
+    '''
+
+    def __init__(self, logger, filename, maxbytes=10 * 1024 * 1024, backups=5, size=10000, interval=0.1):
+        self.logger = logger
+        self.size = size
+        self.interval = interval
+        self.dropped = 0
+
+        self.target = GzipRotatingFileHandler(filename, maxBytes=maxbytes, backupCount=backups)
+        self.handler = TraceHandler(self)
+
+        self._queue = deque()
+        self._reported = 0
+        self._stamp = (None, '')
+        self._abort = threading.Event()
+        self._writer = threading.Thread(target=self._write, name='TPL trace writer')
+        self._writer.setDaemon(True)
+
+    def start(self):
+        self.logger.addHandler(self.handler)
+        self._writer.start()
+        return self
+
+    def stop(self, timeout=5.):
+        '''
+            Detach from the logger and wait for the writer to write what is queued.
+        '''
+        self.logger.removeHandler(self.handler)
+        self._abort.set()
+        self._writer.join(timeout)
+
+    def put(self, created, level, thread, msg):
+        # unlocked, deque.append is atomic and the bound only needs to be about right
+        if len(self._queue) < self.size:
+            self._queue.append((created, level, thread, msg))
+        else:
+            self.dropped += 1
+
+    def debug(self, msg):
+        self.put(time.time(), 'DEBUG', threading.currentThread().getName(), msg)
+
+    def _format(self, entry):
+        created, level, thread, msg = entry
+        second = int(created)
+        if second != self._stamp[0]:
+            self._stamp = (second, time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(second)))
+        return '%s,%03d[%s:%s]-%s:: %s' % (self._stamp[1], (created - second) * 1000, level, thread,
+                                          self.logger.name, msg)
+
+    def _write(self):
+        # Entries are written in batches of at most BATCH, so the writer holds the interpreter for a short
+        # while and takes the disk once per batch instead of once per entry.
+        target = self.target
+        while True:
+            running = not self._abort.isSet()
+            lines = []
+            dropped = self.dropped
+            if dropped != self._reported:
+                lines.append(self._format((time.time(), 'WARNING', self._writer.getName(),
+                                           'Trace queue full, %i entries dropped' % (dropped - self._reported))))
+                self._reported = dropped
+            try:
+                while len(lines) < BATCH:
+                    lines.append(self._format(self._queue.popleft()))
+            except IndexError:
+                pass
+
+            if lines:
+                try:
+                    if target.stream is None:
+                        target.stream = target._open()
+                    target.stream.write('\n'.join(lines) + '\n')
+                    target.stream.flush()
+                    if target.maxBytes > 0 and target.stream.tell() >= target.maxBytes:
+                        target.doRollover()
+                except Exception:
+                    # handleError() needs a record; report here and reopen the file with the next batch
+                    traceback.print_exc(file=sys.stderr)
+                    try:
+                        if target.stream is not None:
+                            target.stream.close()
+                    except Exception:
+                        pass
+                    target.stream = None
+
+            if len(lines) == BATCH:
+                # more is queued, let the I/O threads run and go on
+                time.sleep(0)
+            elif running:
+                self._abort.wait(self.interval)
+            else:
+                break
+        target.close()
@@ -0,0 +1,141 @@
+#! /usr/bin/env python
+# -*- coding: iso-8859-1 -*-
+
+# chimera - observatory automation system
+# Copyright (C) 2006-2007  P. Henrique Silva <henrique@astro.ufsc.br>
+
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA
+# 02110-1301, USA.
+
+import re
+
+__all__ = ["TPLParser", "Reply", "tokenize", "DATA", "COMMAND", "EVENT", "BANNER", "AUTH_REPLY"]
+
+# Reply kinds
+DATA = 'DATA'
+COMMAND = 'COMMAND'
+EVENT = 'EVENT'
+
+# Connection banner and the answer to AUTH, read once before any command
+BANNER = re.compile(r'TPL2\s+(?P<TPL2>\S+)\s+CONN\s+(?P<CONN>\d+)\s+AUTH\s+(?P<AUTH>\S+(,\S+)*)\s+'
+                    r'ENC MESSAGE (?P<ENCM>(.*?)\s*\n)')
+AUTH_REPLY = re.compile(r'AUTH\s+(?P<AUTH>\S+)\s+(?P<read_level>\d)\s+(?P<write_level>\d)\n')
+
+# OBJ=VALUE part of a DATA INLINE line
+_INLINE = re.compile(r'([^=\s]+)=(.*)')
+
+
+class Reply(object):
+    '''
+    One TPL2 reply line.
+
+    kind is DATA, COMMAND or EVENT and status the keyword that follows it (INLINE or OK for DATA, OK,
+    COMPLETE, ... for COMMAND and ERROR, ... for EVENT). object and value are set for DATA INLINE (OBJ=VALUE),
+    DATA OK (OBJ) and EVENT (OBJ:message) lines.
+    '''
+
+    __slots__ = ('cmdid', 'kind', 'status', 'object', 'value', 'line')
+
+    def __init__(self, cmdid, kind, status, line, object=None, value=None):
+        self.cmdid = cmdid
+        self.kind = kind
+        self.status = status
+        self.line = line
+        self.object = object
+        self.value = value
+
+    def __str__(self):
+        return self.line
+
+
+def tokenize(line):
+    '''
+        Split a reply line on its command id and keywords, only the value of DATA INLINE goes through a regex.
+
+    :return: Reply or None if line is not a reply the client understands.
+    '''
+    fields = line.split(' ', 3)
+    if len(fields) < 3 or not fields[0].isdigit():
+        return None
+
+    kind = fields[1]
+    if kind == COMMAND:
+        return Reply(int(fields[0]), kind, fields[2].rstrip(), line)
+    elif len(fields) < 4:
+        return None
+    elif kind == DATA:
+        if fields[2] == 'INLINE':
+            inline = _INLINE.match(fields[3])
+            if inline is None:
+                return None
+            return Reply(int(fields[0]), kind, 'INLINE', line, inline.group(1), inline.group(2))
+        return Reply(int(fields[0]), kind, fields[2], line, fields[3].split(None, 1)[0])
+    elif kind == EVENT:
+        obj, sep, msg = fields[3].partition(':')
+        return Reply(int(fields[0]), kind, fields[2], line, obj, msg.strip())
+
+    return None
+
+
+class TPLParser(object):
+    '''
+    Incremental parser for the TPL2 reply stream.
+
+    Data read from the socket is appended to a reusable buffer with feed(). Every complete line is parsed,
+    whatever trails the last newline is carried over to the next feed(), so a reply split across two reads
+    is parsed once it is complete.
+    '''
+
+    def __init__(self):
+        self._buffer = bytearray()
+
+    def reset(self):
+        '''
+            Drop any partial line, e.g. after a reconnect.
+        '''
+        del self._buffer[:]
+
+    def pending(self):
+        '''
+        :return: Number of buffered bytes waiting for a newline.
+        '''
+        return len(self._buffer)
+
+    def feed(self, data):
+        '''
+            Append data to the buffer and consume all complete lines.
+
+        :param data: String read from the socket.
+        :return: Generator over the Reply of each complete line.
+        '''
+        buff = self._buffer
+        buff.extend(data)
+
+        end = buff.rfind('\n')
+        if end < 0:
+            return iter(())
+
+        lines = str(buff[:end])
+        del buff[:end + 1]
+
+        return self._parse(lines)
+
+    def _parse(self, lines):
+        for line in lines.split('\n'):
+            if len(line) < 1:
+                continue
+            rec = tokenize(line)
+            if rec is not None:
+                yield rec
@@ -0,0 +1,235 @@
+#! /usr/bin/env python
+# -*- coding: iso-8859-1 -*-
+
+# chimera - observatory automation system
+# Copyright (C) 2006-2007  P. Henrique Silva <henrique@astro.ufsc.br>
+
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA
+# 02110-1301, USA.
+
+import os
+import sys
+import time
+import thread
+import threading
+from functools import wraps
+from collections import defaultdict
+
+from chimera.core.constants import SYSTEM_CONFIG_DIRECTORY
+
+__all__ = ["ControlProfile", "profiled", "controlprofile"]
+
+# seconds between writes of the collapsed stacks files
+DUMP_PERIOD = 10.
+
+# the sampler thread stops after this long (s) without a sampled tick
+IDLE = 10.
+
+# control loops running a sampled tick, by thread id: the users of the sampler. It, _sampler, _interval and
+# _lastactive only change with _samplerlock held, so there is never more than one sampler thread.
+_active = {}
+_profiles = []
+_sampler = None
+_interval = [0.01]
+_lastactive = [0.]
+_samplerlock = threading.Lock()
+
+
+class ControlProfile(object):
+    '''
+    Tick times of a control loop and, when sampled, how often each stack (root first, from the control
+    method down) was seen, written to filename as collapsed stacks ("a;b;c count" lines) for flamegraph.pl or
+    speedscope.
+    '''
+
+    def __init__(self, name, filename):
+        self.name = name
+        self.filename = filename
+        self.ticks = 0
+        self.total = 0.
+        self.max = 0.
+        self.last = 0.
+        self.overruns = 0
+        self.period = 0.
+        self.samples = 0
+        self.stacks = defaultdict(int)
+        self._dumped = 0
+
+    def tick(self, duration, period):
+        self.ticks += 1
+        self.total += duration
+        self.last = duration
+        self.max = max(self.max, duration)
+        self.period = period
+        if duration > period:
+            self.overruns += 1
+
+    def dump(self):
+        '''
+            Write the collapsed stacks, if there are new samples.
+        '''
+        if self.samples == self._dumped:
+            return
+        self._dumped = self.samples
+        out = open(self.filename + '.tmp', 'w')
+        try:
+            for stack, count in sorted(self.stacks.items()):
+                out.write('%s %i\n' % (stack, count))
+        finally:
+            out.close()
+        os.rename(self.filename + '.tmp', self.filename)
+
+    def snapshot(self):
+        '''
+        :return: Dictionary with the "ticks", "overruns" (ticks longer than the period), mean, max and last tick
+                 and the period in ms, the stack "samples", the ten most seen "stacks" ([stack, count]) and the
+                 collapsed stacks "file".
+        '''
+        top = sorted(self.stacks.items(), key=lambda item: -item[1])[:10]
+        return {'ticks': self.ticks,
+                'overruns': self.overruns,
+                'mean_ms': self.total / self.ticks * 1e3 if self.ticks else 0.,
+                'max_ms': self.max * 1e3,
+                'last_ms': self.last * 1e3,
+                'period_ms': self.period * 1e3,
+                'samples': self.samples,
+                'stacks': [list(item) for item in top],
+                'file': self.filename}
+
+
+def _collapse(frame, name):
+    '''
+        Stack of frame up to the profiled control method, root first.
+    '''
+    names = []
+    while frame is not None and frame.f_code is not _wrapper_code:
+        code = frame.f_code
+        names.append('%s:%s' % (os.path.basename(code.co_filename), code.co_name))
+        frame = frame.f_back
+    names.append(name)
+    names.reverse()
+    return ';'.join(names)
+
+
+def _sample():
+    '''
+        Wall clock sampler shared by all profiled loops: every interval, the stack of each thread in a sampled
+        tick is counted, blocked or not.
+    '''
+    global _sampler
+    dumped = time.time()
+    while True:
+        time.sleep(_interval[0])
+        now = time.time()
+        with _samplerlock:
+            active = _active.items()
+        for ident, profile in active:
+            frame = sys._current_frames().get(ident)
+            if frame is not None:
+                profile.stacks[_collapse(frame, profile.name)] += 1
+                profile.samples += 1
+        if now - dumped >= DUMP_PERIOD:
+            dumped = now
+            for profile in list(_profiles):
+                profile.dump()
+        with _samplerlock:
+            if not _active and now - _lastactive[0] > IDLE:
+                for profile in list(_profiles):
+                    profile.dump()
+                _sampler = None
+                return
+
+
+def _enter(ident, profile, interval):
+    '''
+        Start a sampled tick of the loop running in thread ident, and the sampler if it is not running.
+    '''
+    global _sampler
+    with _samplerlock:
+        _active[ident] = profile
+        _interval[0] = interval
+        _lastactive[0] = time.time()
+        if _sampler is None:
+            _sampler = threading.Thread(target=_sample, name='control profiler')
+            _sampler.setDaemon(True)
+            _sampler.start()
+
+
+def _leave(ident):
+    '''
+        End the sampled tick of thread ident. The sampler stops once no tick was sampled for IDLE seconds.
+    '''
+    with _samplerlock:
+        _active.pop(ident, None)
+        _lastactive[0] = time.time()
+
+
+def _instancename(obj):
+    '''
+        Name of obj in the profile file names: its chimera location (/Class/name -> Class_name), or the class
+        and id while the object has no location yet.
+    '''
+    location = None
+    try:
+        location = obj.getLocation()
+    except Exception:
+        pass
+    if location:
+        return str(location).strip('/').replace('/', '_')
+    return '%s_%x' % (type(obj).__name__, id(obj))
+
+
+def controlprofile(obj):
+    '''
+    :return: ControlProfile of obj, created on first use.
+    '''
+    profile = obj.__dict__.get('_controlprofile')
+    if profile is None:
+        name = '%s.control' % type(obj).__name__
+        filename = os.path.join(SYSTEM_CONFIG_DIRECTORY, 'profile_%s.folded' % _instancename(obj))
+        profile = ControlProfile(name, filename)
+        obj._controlprofile = profile
+        _profiles.append(profile)
+    return profile
+
+
+def profiled(method):
+    '''
+        Decorator for control() methods. While the profile config key is set each tick is timed against the
+        loop frequency, and if profile_sample is above 0 a wall clock sampler records the stack of the loop
+        every profile_sample seconds. Otherwise it costs a config lookup per tick.
+    '''
+
+    @wraps(method)
+    def wrapper(self, *args, **kwargs):
+        if not self['profile']:
+            return method(self, *args, **kwargs)
+
+        profile = controlprofile(self)
+        ident = None
+        if self['profile_sample'] > 0:
+            ident = thread.get_ident()
+            _enter(ident, profile, float(self['profile_sample']))
+        start = time.time()
+        try:
+            return method(self, *args, **kwargs)
+        finally:
+            profile.tick(time.time() - start, 1. / self.getHz())
+            if ident is not None:
+                _leave(ident)
+
+    return wrapper
+
+_wrapper_code = profiled(lambda self: None).__code__
@@ -0,0 +1,166 @@
+#! /usr/bin/env python
+# -*- coding: iso-8859-1 -*-
+
+# chimera - observatory automation system
+# Copyright (C) 2006-2007  P. Henrique Silva <henrique@astro.ufsc.br>
+
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA
+# 02110-1301, USA.
+
+import time
+import threading
+import weakref
+
+from chimera.core.exceptions import ObjectNotFoundException
+
+__all__ = ["TPLProxyCache"]
+
+# seconds between health checks of each cache
+CHECK_PERIOD = 5.
+
+_caches = weakref.WeakSet()
+_checker = None
+_checkerlock = threading.Lock()
+
+
+def _register(cache):
+    global _checker
+    with _checkerlock:
+        _caches.add(cache)
+        if _checker is None:
+            _checker = threading.Thread(target=_check, name='TPL proxy check')
+            _checker.setDaemon(True)
+            _checker.start()
+
+
+def _check():
+    '''
+        Health check loop shared by every cache in the process.
+    '''
+    while True:
+        now = time.time()
+        wait = CHECK_PERIOD
+        for cache in list(_caches):
+            if cache.due <= now:
+                try:
+                    cache.check()
+                except Exception, e:
+                    # e.g. a bad tpl location or the manager going away, the loop serves every cache
+                    cache._owner.log.exception(e)
+                    cache._fail()
+                cache.due = now + cache.period
+            wait = min(wait, cache.due - now)
+        time.sleep(max(wait, 0.1))
+
+
+class TPLProxyCache(object):
+    '''
+    The TPL proxy of an instrument (its "tpl" location), resolved once instead of getProxy() + ping() on
+    every getTPL(). Pyro proxies belong to the thread that made them, so each thread gets its own. One
+    background thread pings the TPL every period seconds. After a failed ping every proxy is dropped, and
+    get() resolves and pings again until the TPL answers.
+    '''
+
+    def __init__(self, owner, period=CHECK_PERIOD):
+        self._owner = owner
+        self.period = period
+        self.due = 0.
+
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._generation = 0
+        self._healthy = False
+        self._registered = False
+
+        self.calls = 0
+        self.resolves = 0
+        self.pings = 0
+
+    def get(self):
+        '''
+        :return: TPL proxy, False if the TPL can not be reached.
+        '''
+        self.calls += 1
+        if not self._registered:
+            self._registered = True
+            self.due = time.time() + self.period
+            _register(self)
+
+        proxy = self._cached()
+        if proxy is not None and self._healthy:
+            return proxy
+
+        try:
+            proxy = proxy or self._resolve()
+        except ObjectNotFoundException:
+            return False
+        if self._healthy:
+            # first call on this thread, the TPL answered the last check
+            return proxy
+        if not self._ping(proxy):
+            self._fail()
+            return False
+        self._healthy = True
+        return proxy
+
+    def check(self):
+        '''
+            Ping the TPL, from the check thread.
+        '''
+        try:
+            ok = self._ping(self._cached() or self._resolve())
+        except ObjectNotFoundException:
+            ok = False
+        if ok:
+            self._healthy = True
+        else:
+            self._fail()
+
+    def stats(self):
+        '''
+        :return: getTPL() calls, proxies resolved, pings (background included), and Pyro calls saved
+                 against one ping per call.
+        '''
+        return {'calls': self.calls,
+                'resolves': self.resolves,
+                'pings': self.pings,
+                'saved': self.calls - self.pings}
+
+    def _cached(self):
+        local = self._local
+        if getattr(local, 'generation', None) != self._generation or local.location != self._owner['tpl']:
+            return None
+        return local.proxy
+
+    def _resolve(self):
+        location = self._owner['tpl']
+        with self._lock:
+            generation = self._generation
+        proxy = self._owner.getManager().getProxy(location, lazy=True)
+        self.resolves += 1
+        self._local.proxy, self._local.location, self._local.generation = proxy, location, generation
+        return proxy
+
+    def _ping(self, proxy):
+        self.pings += 1
+        try:
+            return proxy.ping()
+        except Exception:
+            return False
+
+    def _fail(self):
+        with self._lock:
+            self._healthy = False
+            self._generation += 1
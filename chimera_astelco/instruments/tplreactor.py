@@ -0,0 +1,160 @@
+#! /usr/bin/env python
+# -*- coding: iso-8859-1 -*-
+
+# chimera - observatory automation system
+# Copyright (C) 2006-2007  P. Henrique Silva <henrique@astro.ufsc.br>
+
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA
+# 02110-1301, USA.
+
+import os
+import time
+import select
+import threading
+
+__all__ = ["TPLReactor"]
+
+
+class TPLReactor(object):
+    '''
+    One select() loop for the connections of any number of TPL instances in the process (TPL "reactor"
+    option). It takes over the reader and poller threads of each instance: replies are dispatched as they
+    arrive and the polled live objects are read every poll_period with a GET that is not waited for.
+    Reconnects and command time outs stay with each instance control().
+
+    The loop only wakes up for incoming data, a due poll, a socket with unsent data becoming writable, or
+    wake(), which registration and reconnects call to get the set of sockets rebuilt. Writes made from the
+    loop never block, what the kernel does not take is flushed from here. An error serving one instance
+    flags it for reconnection and the loop goes on. It exits once no instance is registered.
+    '''
+
+    _shared = None
+    _sharedlock = threading.Lock()
+
+    @classmethod
+    def shared(cls):
+        '''
+        :return: The reactor of this process.
+        '''
+        with cls._sharedlock:
+            if cls._shared is None:
+                cls._shared = cls()
+            return cls._shared
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        # id(tpl) -> [tpl, time of its next poll]
+        self._tpls = {}
+        self._thread = None
+        self._wakeread, self._wakewrite = os.pipe()
+
+        # loop iterations, for benchmarks
+        self.wakeups = 0
+
+    def register(self, tpl):
+        with self._lock:
+            self._tpls[id(tpl)] = [tpl, time.time() + tpl['poll_period']]
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='TPL reactor')
+                self._thread.setDaemon(True)
+                self._thread.start()
+        self.wake()
+
+    def unregister(self, tpl):
+        with self._lock:
+            self._tpls.pop(id(tpl), None)
+        self.wake()
+
+    def inLoop(self):
+        '''
+        :return: True when called from the reactor thread.
+        '''
+        return threading.currentThread() is self._thread
+
+    def wake(self):
+        '''
+            Interrupt select(), the loop rebuilds its socket set and poll schedule.
+        '''
+        os.write(self._wakewrite, 'w')
+
+    def _run(self):
+        while True:
+            with self._lock:
+                if not self._tpls:
+                    self._thread = None
+                    return
+                entries = self._tpls.values()
+
+            self.wakeups += 1
+
+            # sockets of the connected instances and the time to the next due poll
+            now = time.time()
+            owners = {}
+            socks = []
+            writes = []
+            timeout = None
+            for entry in entries:
+                tpl = entry[0]
+                if tpl._reconnect.isSet():
+                    continue
+                for sock in tpl.sockets():
+                    owners[sock] = tpl
+                    socks.append(sock)
+                    if sock.pending():
+                        writes.append(sock)
+                if not tpl._polled:
+                    continue
+                if entry[1] <= now:
+                    try:
+                        tpl._poll()
+                    except Exception, e:
+                        tpl._debuglog.exception(e)
+                    entry[1] = now + tpl['poll_period']
+                wait = max(entry[1] - now, 0.)
+                timeout = wait if timeout is None else min(timeout, wait)
+
+            try:
+                ready, writable = select.select([self._wakeread] + socks, writes, [], timeout)[:2]
+            except Exception, e:
+                # a socket was closed under us, find whose
+                for sock in socks:
+                    try:
+                        select.select([sock], [], [], 0)
+                    except Exception, e:
+                        owners[sock]._readerror(sock, e)
+                continue
+
+            for sock in writable:
+                try:
+                    sock.flush()
+                except Exception, e:
+                    owners[sock]._readerror(sock, e)
+
+            # each instance reads its ready sockets, in sockets() order
+            byowner = {}
+            for sock in ready:
+                if sock is self._wakeread:
+                    os.read(self._wakeread, 4096)
+                else:
+                    tpl = owners[sock]
+                    byowner.setdefault(id(tpl), (tpl, []))[1].append(sock)
+
+            for tpl, ready in byowner.values():
+                try:
+                    tpl._read(ready)
+                except Exception, e:
+                    # e.g. a handler failing on a malformed reply, the other instances go on
+                    tpl._debuglog.exception(e)
+                    tpl._reconnect.set()
@@ -0,0 +1,223 @@
+#! /usr/bin/env python
+# -*- coding: iso-8859-1 -*-
+
+# chimera - observatory automation system
+# Copyright (C) 2006-2007  P. Henrique Silva <henrique@astro.ufsc.br>
+
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA
+# 02110-1301, USA.
+
+import os
+import re
+import time
+import struct
+import threading
+
+from tplcommand import Command
+
+__all__ = ["TPLRecorder", "read", "replay", "monotonic", "OPEN", "SENT", "RECEIVED", "CLOSE"]
+
+# A capture file is MAGIC, the wall clock time of its start (double) and records of RECORD (microseconds since
+# the start on the monotonic clock, kind, connection, data length) followed by the data.
+MAGIC = 'TPLREC1\n'
+HEADER = struct.Struct('<d')
+RECORD = struct.Struct('<QBBI')
+
+# record kinds, OPEN carries "host:port"
+OPEN, SENT, RECEIVED, CLOSE = range(4)
+
+# connections, as TPL numbers them
+MAIN, PRIORITY = range(2)
+
+_SENT_LINE = re.compile(r'^(\d+) (\S+) ?(.*)$')
+
+# commands registered without a deadline
+_LASTING = ('SUB', 'UNSUB')
+
+# credentials are not kept in captures
+_AUTH = re.compile(r'AUTH PLAIN "[^"]*" "[^"]*"')
+
+
+def _clock():
+    '''
+        Monotonic clock: time.monotonic where there is one, clock_gettime(CLOCK_MONOTONIC) on Linux, the wall
+        clock otherwise.
+    '''
+    if hasattr(time, 'monotonic'):
+        return time.monotonic
+    try:
+        import ctypes
+        import ctypes.util
+
+        class timespec(ctypes.Structure):
+            _fields_ = [('tv_sec', ctypes.c_long), ('tv_nsec', ctypes.c_long)]
+
+        librt = ctypes.CDLL(ctypes.util.find_library('rt') or 'librt.so.1', use_errno=True)
+        clock_gettime = librt.clock_gettime
+        clock_gettime.argtypes = [ctypes.c_int, ctypes.POINTER(timespec)]
+        ts = timespec()
+        if clock_gettime(1, ctypes.byref(ts)) != 0:  # CLOCK_MONOTONIC
+            raise OSError(ctypes.get_errno())
+
+        def monotonic():
+            clock_gettime(1, ctypes.byref(ts))
+            return ts.tv_sec + ts.tv_nsec * 1e-9
+
+        return monotonic
+    except Exception:
+        return time.time
+
+monotonic = _clock()
+
+
+class TPLRecorder(object):
+    '''
+    Binary capture of the raw bytes of TPL connections (the AUTH password excepted), written by the threads
+    doing the I/O through a buffered file (flush() makes it durable). Once the file grows past maxbytes it is
+    moved to name.1, replacing the previous one, and a new capture is started; a new recorder also moves an
+    existing file to name.1, so the capture of the previous run is kept.
+    '''
+
+    def __init__(self, filename, maxbytes=100 * 1024 * 1024, bufsize=65536):
+        self.filename = filename
+        self.maxbytes = maxbytes
+        self.bufsize = bufsize
+
+        self._lock = threading.Lock()
+        self._file = None
+        self._start = 0.
+        self._size = 0
+        self._open()
+
+    def _open(self):
+        if os.path.exists(self.filename):
+            os.rename(self.filename, self.filename + '.1')
+        self._file = open(self.filename, 'wb', self.bufsize)
+        self._start = monotonic()
+        self._file.write(MAGIC + HEADER.pack(time.time()))
+        self._size = len(MAGIC) + HEADER.size
+
+    def record(self, kind, conn, data=''):
+        '''
+            Add data of the given kind (OPEN, SENT, RECEIVED or CLOSE) on connection conn.
+        '''
+        stamp = int((monotonic() - self._start) * 1e6)
+        if kind == SENT and 'AUTH PLAIN' in data:
+            data = _AUTH.sub('AUTH PLAIN "" ""', data)
+        with self._lock:
+            if self._file is None:
+                return
+            self._file.write(RECORD.pack(stamp, kind, conn, len(data)) + data)
+            self._size += RECORD.size + len(data)
+            if self.maxbytes > 0 and self._size >= self.maxbytes:
+                self._file.close()
+                self._open()
+
+    def flush(self):
+        with self._lock:
+            if self._file is not None:
+                self._file.flush()
+
+    def close(self):
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+
+def read(filename):
+    '''
+        Records of a capture file.
+
+    :return: Generator over (seconds since the start of the capture, kind, connection, data).
+    '''
+    capture = open(filename, 'rb')
+    try:
+        if capture.read(len(MAGIC)) != MAGIC:
+            raise ValueError('%s is not a TPL capture' % filename)
+        capture.read(HEADER.size)
+        while True:
+            head = capture.read(RECORD.size)
+            if len(head) < RECORD.size:
+                # end of file, or a record cut short by a crash
+                return
+            stamp, kind, conn, size = RECORD.unpack(head)
+            data = capture.read(size)
+            if len(data) < size:
+                return
+            yield stamp * 1e-6, kind, conn, data
+    finally:
+        capture.close()
+
+
+def replay(filename, tpl, speed=1.):
+    '''
+        Feed a capture into tpl, an instance that is not started (no connection), through the same path as
+        the live connection: every command sent in the capture is registered as pending, received data goes
+        through the connection parser to _dispatch(), and control() runs at the TPL frequency of capture
+        time. Command timeouts run on the wall clock, so they only fire as they did in the field at speed 1.
+
+    :param speed: 1. replays at the captured pace, N at N times that, 0 as fast as possible.
+    :return: Dictionary of counts, the replay time and the commands left incomplete (a command that never
+             completed in the field is among them).
+    '''
+    parsers = {MAIN: tpl._parser, PRIORITY: tpl._pparser}
+    stats = {'records': 0, 'bytes_sent': 0, 'bytes_received': 0, 'commands': 0, 'lines': 0, 'opens': 0}
+    period = 1. / tpl.getHz()
+    tick = 0.
+
+    start = time.time()
+    for stamp, kind, conn, data in read(filename):
+        if speed > 0:
+            wait = start + stamp / speed - time.time()
+            if wait > 0:
+                time.sleep(wait)
+        while stamp >= tick + period:
+            tick += period
+            tpl.control()
+
+        stats['records'] += 1
+        if kind == OPEN:
+            stats['opens'] += 1
+            parsers[conn].reset()
+        elif kind == SENT:
+            stats['bytes_sent'] += len(data)
+            cmds = []
+            for line in data.split('\r\n'):
+                match = _SENT_LINE.match(line)
+                if match is None:
+                    continue
+                cmd = Command()
+                cmd.id, cmd.cmd, cmd.object = int(match.group(1)), match.group(2), match.group(3)
+                if cmd.cmd == 'GET':
+                    cmd.types = dict([(obj, tpl._typecache[obj]) for obj in cmd.object.split(';')
+                                      if obj in tpl._typecache])
+                cmds.append(cmd)
+            # subscriptions last for as long as they are needed, no deadline for them, as in subscribe()
+            tpl._register([cmd for cmd in cmds if cmd.cmd not in _LASTING])
+            tpl._register([cmd for cmd in cmds if cmd.cmd in _LASTING], timeout=False)
+            stats['commands'] += len(cmds)
+        elif kind == RECEIVED:
+            stats['bytes_received'] += len(data)
+            lines = list(parsers[conn].feed(data))
+            stats['lines'] += len(lines)
+            tpl._dispatch(lines)
+    tpl.control()
+
+    stats['seconds'] = time.time() - start
+    stats['lines_per_s'] = stats['lines'] / stats['seconds'] if stats['seconds'] > 0 else 0.
+    with tpl._cmdlock:
+        stats['incomplete'] = [str(cmd).strip() for cmd in sorted(tpl._pending.values(), key=lambda cmd: cmd.id)]
+    return stats
@@ -0,0 +1,101 @@
+#! /usr/bin/env python
+# -*- coding: iso-8859-1 -*-
+
+# chimera - observatory automation system
+# Copyright (C) 2006-2007  P. Henrique Silva <henrique@astro.ufsc.br>
+
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA
+# 02110-1301, USA.
+
+from bisect import bisect_left
+
+__all__ = ["TPLStats", "BOUNDS", "FAMILIES", "percentile"]
+
+# upper bounds (ms) of the latency buckets, a last bucket takes anything slower
+BOUNDS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000, 10000, 30000, 60000)
+
+# top level object families with a histogram of their own, anything else goes to OTHER
+FAMILIES = ('POSITION', 'TELESCOPE', 'AUXILIARY', 'POINTING', 'OTHER')
+
+COUNTERS = ('sent', 'completed', 'timed_out', 'resent', 'bad_id', 'reconnects')
+
+# connections, bytes are counted for each (TPLSocket conn)
+CONNECTIONS = 2
+
+
+def percentile(counts, p):
+    '''
+        Approximate percentile of a histogram.
+
+    :return: Upper bound (ms) of the bucket holding the p-th percentile, None if it is the last bucket or the
+             histogram is empty.
+    '''
+    total = sum(counts)
+    if not total:
+        return None
+    rank = p / 100. * total
+    seen = 0
+    for index, count in enumerate(counts):
+        seen += count
+        if seen >= rank:
+            return BOUNDS[index] if index < len(BOUNDS) else None
+    return None
+
+
+class TPLStats(object):
+    '''
+    Performance counters of a TPL connection. Everything lives in preallocated lists, so recording is an
+    index and an increment. Callers serialize the updates of counters and histograms (TPL holds _cmdlock),
+    bytes are counted by the thread that owns each direction of each connection.
+    '''
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.counters = dict([(name, 0) for name in COUNTERS])
+        self.bytes_in = [0] * CONNECTIONS
+        self.bytes_out = [0] * CONNECTIONS
+        self.latency = {'ok': dict([(family, [0] * (len(BOUNDS) + 1)) for family in FAMILIES]),
+                        'complete': dict([(family, [0] * (len(BOUNDS) + 1)) for family in FAMILIES])}
+
+    def count(self, name, n=1):
+        self.counters[name] += n
+
+    def record(self, phase, object, seconds):
+        '''
+            Add a latency.
+
+        :param phase: 'ok' (send to COMMAND OK) or 'complete' (send to COMMAND COMPLETE).
+        :param object: Object of the command, its first component selects the histogram.
+        '''
+        family = object.split('.', 1)[0]
+        histograms = self.latency[phase]
+        counts = histograms.get(family) or histograms['OTHER']
+        counts[bisect_left(BOUNDS, seconds * 1e3)] += 1
+
+    def snapshot(self):
+        '''
+        :return: Copy of everything as plain dictionaries and lists: the counters, "bytes_in" and "bytes_out"
+                 totals, "bounds_ms" (bucket upper bounds) and in "latency" the bucket counts by phase ('ok',
+                 'complete') and family, with one more bucket than bounds for anything slower.
+        '''
+        stats = dict(self.counters)
+        stats['bytes_in'] = sum(self.bytes_in)
+        stats['bytes_out'] = sum(self.bytes_out)
+        stats['bounds_ms'] = list(BOUNDS)
+        stats['latency'] = dict([(phase, dict([(family, list(counts)) for family, counts in histograms.items()]))
+                                 for phase, histograms in self.latency.items()])
+        return stats
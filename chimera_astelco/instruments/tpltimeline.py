@@ -0,0 +1,160 @@
+#! /usr/bin/env python
+# -*- coding: iso-8859-1 -*-
+
+# chimera - observatory automation system
+# Copyright (C) 2006-2007  P. Henrique Silva <henrique@astro.ufsc.br>
+
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA
+# 02110-1301, USA.
+
+import time
+import threading
+from functools import wraps
+from collections import deque
+
+__all__ = ["Timeline", "timeline", "traced"]
+
+
+def _async(out, common, name, start, stop, args=None):
+    '''
+        Append a nested async slice, left open if stop is None.
+    '''
+    begin = dict(common, name=name, ph='b', ts=start * 1e6)
+    if args:
+        begin['args'] = args
+    out.append(begin)
+    if stop is not None:
+        out.append(dict(common, name=name, ph='e', ts=stop * 1e6))
+
+
+class Timeline(object):
+    '''
+    Lifecycle events of TPL commands and spans of the instrument methods that send them, kept in a ring of
+    the last size events and exported as Chrome trace / Perfetto JSON. One timeline serves the whole
+    process, so the instrument spans and the commands of every TPL end up side by side. Disabled (the
+    default) every add() is a single attribute test.
+
+    Command phases are create (with the instrument method the caller= argument names, if any), write,
+    ok, data (per DATA INLINE), complete (COMPLETE, TIMEOUT, ABORTED...) and wake (the waiting caller woke up).
+    '''
+
+    def __init__(self):
+        self.events = None
+
+    def enable(self, size):
+        '''
+            Start recording, or change the size. 0 disables.
+        '''
+        if size <= 0:
+            self.events = None
+        elif self.events is None or self.events.maxlen != size:
+            self.events = deque(self.events or (), maxlen=size)
+
+    def add(self, key, phase, detail=None):
+        '''
+            Record a phase of command key ((TPL number, command id)) at the current time.
+        '''
+        events = self.events
+        if events is not None:
+            events.append((time.time(), key, phase, threading.currentThread().getName(), detail))
+
+    def export(self, seconds=None):
+        '''
+            Chrome trace of the events recorded in the last seconds (all of them if None). Every command is an
+            async slice on the track of its TPL, from creation to the wake up of its caller, split into
+            queue (create to write), server (write to complete) and wake (complete to wake), with the replies
+            as instant events. Instrument spans are complete slices on the thread that ran them.
+
+        :return: Dictionary ready for json.dump(), to open in chrome://tracing or ui.perfetto.dev.
+        '''
+        events = list(self.events or ())
+        if seconds is not None:
+            since = time.time() - seconds
+            events = [event for event in events if event[0] >= since]
+
+        out = []
+        threads = {}
+        commands = {}
+        for stamp, key, phase, thread, detail in events:
+            if phase == 'span':
+                tid = threads.setdefault(thread, len(threads) + 1)
+                name, start = detail
+                out.append({'name': name, 'cat': 'instrument', 'ph': 'X', 'pid': 0, 'tid': tid,
+                            'ts': start * 1e6, 'dur': (stamp - start) * 1e6})
+            elif phase == 'create':
+                commands[key] = {'create': (stamp, thread, detail), 'replies': []}
+            elif key in commands:
+                phases = commands[key]
+                if phase in ('ok', 'data'):
+                    phases['replies'].append((stamp, phase, detail))
+                else:
+                    phases.setdefault(phase, (stamp, thread, detail))
+
+        tpls = set()
+        for (index, cmdid), phases in sorted(commands.items()):
+            tpls.add(index)
+            created, thread, (name, caller) = phases['create']
+            end = phases.get('wake') or phases.get('complete')
+            common = {'cat': 'tpl', 'id': '%i:%i' % (index, cmdid), 'pid': index, 'tid': 0}
+
+            args = {'id': cmdid, 'thread': thread}
+            if caller:
+                args['caller'] = caller
+            if 'complete' in phases:
+                args['status'] = phases['complete'][2]
+            _async(out, common, name, created, end and end[0], args)
+
+            write = phases.get('write')
+            if write:
+                _async(out, common, 'queue', created, write[0])
+                complete = phases.get('complete')
+                _async(out, common, 'server', write[0], complete and complete[0])
+                if complete and 'wake' in phases:
+                    _async(out, common, 'wake', complete[0], phases['wake'][0], {'thread': phases['wake'][1]})
+            for stamp, phase, detail in phases['replies']:
+                out.append(dict(common, name=phase if detail is None else '%s %s' % (phase, detail), ph='n',
+                                ts=stamp * 1e6))
+
+        meta = [{'name': 'process_name', 'ph': 'M', 'pid': 0, 'args': {'name': 'instruments'}}]
+        meta.extend([{'name': 'process_name', 'ph': 'M', 'pid': index, 'args': {'name': 'TPL %03i' % index}}
+                     for index in sorted(tpls)])
+        meta.extend([{'name': 'thread_name', 'ph': 'M', 'pid': 0, 'tid': tid, 'args': {'name': thread}}
+                     for thread, tid in threads.items()])
+
+        return {'traceEvents': meta + out, 'displayTimeUnit': 'ms'}
+
+timeline = Timeline()
+
+
+def traced(method):
+    '''
+        Decorator for instrument methods that send TPL commands: while the timeline is enabled the method is
+        recorded as a span. Commands only carry its name if it is passed as caller=, the TPL runs them in
+        another thread, reached over Pyro.
+    '''
+    name = method.__name__
+
+    @wraps(method)
+    def wrapper(self, *args, **kwargs):
+        if timeline.events is None:
+            return method(self, *args, **kwargs)
+
+        start = time.time()
+        try:
+            return method(self, *args, **kwargs)
+        finally:
+            timeline.add(None, 'span', ('%s.%s' % (type(self).__name__, name), start))
+
+    return wrapper
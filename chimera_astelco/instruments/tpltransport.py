@@ -0,0 +1,233 @@
+#! /usr/bin/env python
+# -*- coding: iso-8859-1 -*-
+
+# chimera - observatory automation system
+# Copyright (C) 2006-2007  P. Henrique Silva <henrique@astro.ufsc.br>
+
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA
+# 02110-1301, USA.
+
+import re
+import time
+import errno
+import socket
+import select
+import threading
+
+from tplrecord import OPEN, SENT, RECEIVED, CLOSE
+
+__all__ = ["TPLSocket"]
+
+_WOULDBLOCK = (errno.EAGAIN, errno.EWOULDBLOCK, errno.EINTR)
+
+
+class TPLSocket(object):
+    '''
+    Plain TCP connection to a TPL2 server.
+
+    Drop-in for the subset of telnetlib.Telnet TPL uses (expect, read_very_eager, write, fileno and close),
+    without telnet option processing: TPL2 is a plain line protocol. The socket is non-blocking, reads take
+    whatever the kernel has in one recv() and writes from concurrent threads are coalesced, the thread that
+    finds the writer idle sends everything queued meanwhile. Urgent writes go ahead of anything queued. A
+    write with block=False leaves what the kernel does not take for flush() (see pending()).
+
+    :param nodelay: Set TCP_NODELAY (commands are small and latency bound).
+    :param keepalive: Seconds of idle time before TCP keepalive probes, 0 to disable.
+    :param rcvbuf: SO_RCVBUF size in bytes, 0 leaves the system default.
+    :param recorder: TPLRecorder that gets every byte sent and received, as connection number conn.
+    :param stats: TPLStats counting the bytes sent and received, as connection number conn.
+    '''
+
+    def __init__(self, host, port, timeout=None, nodelay=True, keepalive=0, rcvbuf=0, bufsize=65536,
+                 recorder=None, conn=0, stats=None):
+        self.timeout = timeout
+        self.bufsize = bufsize
+        self.recorder = recorder
+        self.conn = conn
+        self.stats = stats
+
+        self._sock = socket.create_connection((host, port), timeout)
+
+        if nodelay:
+            self._sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        if keepalive > 0:
+            self._sock.setsockopt(socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)
+            # Linux only, elsewhere the system defaults apply
+            for option, value in (('TCP_KEEPIDLE', keepalive), ('TCP_KEEPINTVL', max(1, keepalive / 3)),
+                                  ('TCP_KEEPCNT', 3)):
+                if hasattr(socket, option):
+                    self._sock.setsockopt(socket.IPPROTO_TCP, getattr(socket, option), int(value))
+        if rcvbuf > 0:
+            self._sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, int(rcvbuf))
+
+        self._sock.setblocking(0)
+
+        if recorder is not None:
+            recorder.record(OPEN, conn, '%s:%s' % (host, port))
+
+        # bytes received by expect() past its match, handed out first by read_very_eager()
+        self._rbuf = ''
+
+        self._wlock = threading.Lock()
+        self._wbuf = []
+        self._wurgent = []
+        self._writing = False
+        # rest of a non-blocking write the kernel did not take, sent before anything else
+        self._wleft = ''
+
+    def fileno(self):
+        return self._sock.fileno()
+
+    def close(self):
+        if self.recorder is not None:
+            self.recorder.record(CLOSE, self.conn)
+        try:
+            self._sock.shutdown(socket.SHUT_RDWR)
+        except socket.error:
+            pass
+        self._sock.close()
+
+    def _recv(self):
+        '''
+            Read what is available.
+
+        :return: Data, '' if nothing is available. Raises EOFError if the server closed the connection.
+        '''
+        try:
+            data = self._sock.recv(self.bufsize)
+        except socket.error, e:
+            if e.args[0] in _WOULDBLOCK:
+                return ''
+            raise
+        if not data:
+            raise EOFError('TPL connection closed')
+        if self.recorder is not None:
+            self.recorder.record(RECEIVED, self.conn, data)
+        if self.stats is not None:
+            self.stats.bytes_in[self.conn] += len(data)
+        return data
+
+    def read_very_eager(self):
+        '''
+            Read everything already received without blocking.
+
+        :return: Data, '' if there is none. Raises EOFError if the connection is closed.
+        '''
+        if self._rbuf:
+            data, self._rbuf = self._rbuf, ''
+            return data
+        return self._recv()
+
+    def expect(self, patterns, timeout=None):
+        '''
+            Read until one of the regular expressions in patterns matches, as telnetlib.Telnet.expect().
+
+        :return: (index of the matching pattern, match object, text read up to the match), (-1, None, text
+                 read) on timeout.
+        '''
+        patterns = [re.compile(pattern) if isinstance(pattern, basestring) else pattern for pattern in patterns]
+        deadline = None if timeout is None else time.time() + timeout
+
+        while True:
+            for index, pattern in enumerate(patterns):
+                match = pattern.search(self._rbuf)
+                if match:
+                    text, self._rbuf = self._rbuf[:match.end()], self._rbuf[match.end():]
+                    return index, match, text
+
+            wait = None if deadline is None else deadline - time.time()
+            if wait is not None and wait <= 0:
+                text, self._rbuf = self._rbuf, ''
+                return -1, None, text
+
+            if select.select([self._sock], [], [], wait)[0]:
+                self._rbuf += self._recv()
+
+    def write(self, data, urgent=False, block=True):
+        '''
+            Send data. If another thread is already sending, data is queued and goes out with its next batch,
+            at the front of it if urgent.
+
+        :param block: Wait, up to timeout, for the kernel to take everything. If False what it does not take
+                      right away is kept for flush() or the next write.
+        '''
+        with self._wlock:
+            if urgent:
+                self._wurgent.append(data)
+            elif data:
+                self._wbuf.append(data)
+            if self._writing:
+                return
+            self._writing = True
+
+        try:
+            while True:
+                with self._wlock:
+                    if not self._wleft and not self._wbuf and not self._wurgent:
+                        self._writing = False
+                        return
+                    # a partly sent batch goes first, urgent data can not cut into it
+                    left = self._wleft
+                    data = ''.join(self._wurgent + self._wbuf)
+                    self._wleft = ''
+                    del self._wurgent[:]
+                    del self._wbuf[:]
+                if data:
+                    self._account(data)
+                left = self._sendall(left + data, block)
+                if left:
+                    with self._wlock:
+                        self._wleft = left
+                        self._writing = False
+                    return
+        except:
+            with self._wlock:
+                self._writing = False
+            raise
+
+    def pending(self):
+        '''
+        :return: True if a non-blocking write left data to send.
+        '''
+        return bool(self._wleft)
+
+    def flush(self):
+        '''
+            Send what non-blocking writes left behind, without blocking.
+        '''
+        self.write('', block=False)
+
+    def _account(self, data):
+        if self.recorder is not None:
+            self.recorder.record(SENT, self.conn, data)
+        if self.stats is not None:
+            self.stats.bytes_out[self.conn] += len(data)
+
+    def _sendall(self, data, block=True):
+        '''
+        :return: What was not sent, '' unless block is False and the kernel buffer filled up.
+        '''
+        offset = 0
+        while offset < len(data):
+            try:
+                offset += self._sock.send(buffer(data, offset))
+            except socket.error, e:
+                if e.args[0] not in _WOULDBLOCK:
+                    raise
+                if not block:
+                    return data[offset:]
+                if not select.select([], [self._sock], [], self.timeout)[1]:
+                    raise socket.timeout('TPL write timed out')
+        return ''
@@ -0,0 +1,394 @@
+#! /usr/bin/env python
+# -*- coding: iso-8859-1 -*-
+
+# chimera - observatory automation system
+# Copyright (C) 2006-2007  P. Henrique Silva <henrique@astro.ufsc.br>
+
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA
+# 02110-1301, USA.
+
+'''
+Local stand-in for the TSI (AsTelOS) TPL2 server.
+
+Speaks the subset of TPL2 used by the TPL instrument: the connection banner, AUTH PLAIN, GET (including
+OBJ!TYPE), SET, SUB/UNSUB and ABORT, answered with COMMAND OK, DATA INLINE/DATA OK, EVENT ERROR and COMMAND COMPLETE.
+A SUB command stays open and gets a DATA INLINE line every time the object is SET or update()d. Objects
+live in a flat table of name -> [type, value], where type is the TPL2 type code (1 int, 2 float, 3 string).
+A value may be a callable, evaluated on every GET, to simulate moving axes.
+'''
+
+import time
+import random
+import socket
+import threading
+import SocketServer
+from Queue import Queue
+from collections import defaultdict
+
+__all__ = ["TPLServer", "default_objects"]
+
+INT = '1'
+FLOAT = '2'
+STRING = '3'
+
+_convert = {INT: int, FLOAT: float, STRING: lambda value: value.strip('"')}
+
+
+def default_objects(nsensors=7, naxes=6):
+    '''
+        Object tree of a typical Astelco mount, with everything the plugin instruments read or write.
+    '''
+
+    objects = {'SERVER.UPTIME': [INT, 0],
+               'SERVER.INFO.DEVICE': [STRING, 'TSI simulator'],
+
+               'POSITION.HORIZONTAL.AZ': [FLOAT, 180.],
+               'POSITION.HORIZONTAL.ALT': [FLOAT, 90.],
+               'POSITION.HORIZONTAL.DOME': [FLOAT, 180.],
+               'POSITION.EQUATORIAL.RA_J2000': [FLOAT, 0.],
+               'POSITION.EQUATORIAL.DEC_J2000': [FLOAT, -30.],
+               'POSITION.EQUATORIAL.PARALLACTIC_ANGLE': [FLOAT, 0.],
+               'POSITION.LOCAL.UTC': [FLOAT, time.time],
+               'POSITION.LOCAL.SIDEREAL_TIME': [FLOAT, 0.],
+               'POSITION.INSTRUMENTAL.HA.OFFSET': [FLOAT, 0.],
+               'POSITION.INSTRUMENTAL.DEC.OFFSET': [FLOAT, 0.],
+               'POSITION.INSTRUMENTAL.HA.MOTION_STATE': [INT, 0],
+               'POSITION.INSTRUMENTAL.DEC.MOTION_STATE': [INT, 0],
+               'POSITION.INSTRUMENTAL.DOME[0].CURRPOS': [FLOAT, 180.],
+               'POSITION.INSTRUMENTAL.DOME[0].TARGETPOS': [FLOAT, 180.],
+               'POSITION.INSTRUMENTAL.DOME[0].OFFSET': [FLOAT, 0.],
+               'POSITION.INSTRUMENTAL.FOCUS.REALPOS': [FLOAT, 0.],
+               'POSITION.INSTRUMENTAL.FOCUS.REALPOS!MIN': [FLOAT, -10.],
+               'POSITION.INSTRUMENTAL.FOCUS.REALPOS!MAX': [FLOAT, 10.],
+               'POSITION.INSTRUMENTAL.FOCUS.OFFSET': [FLOAT, 0.],
+
+               'TELESCOPE.READY': [INT, 1],
+               'TELESCOPE.READY_STATE': [FLOAT, 1.],
+               'TELESCOPE.MOTION_STATE': [INT, 0],
+               'TELESCOPE.STOP': [INT, 0],
+               'TELESCOPE.STATUS.GLOBAL': [INT, 0],
+               'TELESCOPE.STATUS.CLEAR': [INT, 0],
+               'TELESCOPE.STATUS.LIST': [STRING, ''],
+               'TELESCOPE.CONFIG.MOUNTOPTIONS': [STRING, 'AZ-ZD'],
+
+               'OBJECT.EQUATORIAL.RA': [FLOAT, 0.],
+               'OBJECT.EQUATORIAL.DEC': [FLOAT, 0.],
+               'OBJECT.EQUATORIAL.EPOCH': [FLOAT, 2000.],
+               'OBJECT.HORIZONTAL.ALT': [FLOAT, 90.],
+               'OBJECT.HORIZONTAL.AZ': [FLOAT, 180.],
+
+               'POINTING.TRACK': [INT, 0],
+               'POINTING.SLEWTIME': [FLOAT, 0.],
+               'POINTING.SETUP.ORIENTATION': [INT, 2],
+               'POINTING.SETUP.OPTIMIZATION': [INT, 2],
+               'POINTING.SETUP.LOCAL.LATITUDE': [FLOAT, -30.],
+               'POINTING.SETUP.LOCAL.LONGITUDE': [FLOAT, -70.],
+               'POINTING.SETUP.DOME.SYNCMODE': [INT, 0],
+               'POINTING.SETUP.DOME.MAX_DEVIATION': [FLOAT, 2.],
+               'POINTING.MODEL.FILE': [STRING, 'default.dat'],
+               'POINTING.MODEL.FILE_LIST': [STRING, 'default.dat'],
+               'POINTING.MODEL.TYPE': [INT, 0],
+               'POINTING.MODEL.CALCULATE': [FLOAT, 0.],
+               'POINTING.MODEL.LIST': [STRING, ''],
+               'POINTING.MODEL.LOAD': [INT, 0],
+               'POINTING.MODEL.CLEAR': [INT, 0],
+               'POINTING.MODEL.ADD': [STRING, ''],
+               'POINTING.MODEL.DATA[0].NAME': [STRING, 'CLASSIC'],
+               'POINTING.MODEL.DATA[1].NAME': [STRING, 'EXTENDED'],
+
+               'AUXILIARY.COVER.TARGETPOS': [FLOAT, 1.],
+               'AUXILIARY.COVER.REALPOS': [FLOAT, 1.],
+               'AUXILIARY.DOME.TARGETPOS': [INT, 0],
+               'AUXILIARY.DOME.REALPOS': [FLOAT, 0.],
+               'AUXILIARY.DOME.OPEN_MASK': [INT, 0],
+               'AUXILIARY.PADDLE.BRIGHTNESS': [FLOAT, 0.]}
+
+    for n in range(naxes):
+        focus = 'POSITION.INSTRUMENTAL.FOCUS[%i].' % n
+        objects[focus + 'REALPOS'] = [FLOAT, 0.]
+        objects[focus + 'REALPOS!MIN'] = [FLOAT, -10.]
+        objects[focus + 'REALPOS!MAX'] = [FLOAT, 10.]
+        objects[focus + 'OFFSET'] = [FLOAT, 0.]
+        objects[focus + 'MOTION_STATE'] = [INT, 0]
+        objects[focus + 'LIMIT_STATE'] = [INT, 0]
+
+    for n in range(1, nsensors + 1):
+        sensor = 'AUXILIARY.SENSOR[%i].' % n
+        objects[sensor + 'DESCRIPTION'] = [STRING, 'Sensor %i' % n]
+        objects[sensor + 'VALUE'] = [FLOAT, 10. + n]
+        objects[sensor + 'UNITY'] = [STRING, 'Celsius']
+
+    return objects
+
+
+class TPLHandler(SocketServer.BaseRequestHandler):
+    '''
+    One TPL2 client connection.
+    '''
+
+    def setup(self):
+        self.request.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self.queue = Queue()
+        self.writer = None
+        self.wlock = threading.Lock()
+        self.busy = 0.
+        self.server.register(self)
+
+    def finish(self):
+        self.server.unregister(self)
+        if self.writer is not None:
+            self.queue.put(None)
+
+    def handle(self):
+        try:
+            self._serve()
+        except socket.error:
+            # client went away (or disconnect() dropped it)
+            pass
+
+    def _serve(self):
+        sim = self.server
+
+        self.request.sendall('TPL2 2.0 CONN %i AUTH PLAIN ENC MESSAGE %s\n' % (sim.nextConnection(), sim.message))
+
+        if sim.latency > 0. or sim.jitter > 0. or sim.service_time > 0.:
+            self.writer = threading.Thread(target=self._write, name='TPL simulator writer')
+            self.writer.setDaemon(True)
+            self.writer.start()
+
+        authorized = False
+        rfile = self.request.makefile('rb', -1)
+        for line in iter(rfile.readline, ''):
+            line = line.strip()
+            if not line:
+                continue
+
+            if not authorized:
+                fields = line.split()
+                if len(fields) == 4 and fields[0] == 'AUTH' and fields[1] == 'PLAIN' and \
+                        fields[2].strip('"') == sim.user and fields[3].strip('"') == sim.password:
+                    authorized = True
+                    self.request.sendall('AUTH OK %i %i\n' % (sim.level, sim.level))
+                else:
+                    self.request.sendall('AUTH ERROR 0 0\n')
+                continue
+
+            if line == 'DISCONNECT':
+                break
+
+            reply = sim.execute(line, self)
+            if reply is not None:
+                self.send(reply, sim.service_time)
+
+    def send(self, reply, service_time=0.):
+        if self.writer is None:
+            with self.wlock:
+                self.request.sendall(reply)
+        else:
+            # commands on one connection are served one after the other
+            with self.wlock:
+                self.busy = max(time.time(), self.busy) + service_time
+                due = self.busy + self.server.delay()
+            self.queue.put((due, reply))
+
+    def _write(self):
+        last = 0.
+        while True:
+            item = self.queue.get()
+            if item is None:
+                return
+            due, reply = item
+            # replies keep their order even with jitter
+            last = max(due, last)
+            wait = last - time.time()
+            if wait > 0:
+                time.sleep(wait)
+            try:
+                self.request.sendall(reply)
+            except socket.error:
+                return
+
+
+class TPLServer(SocketServer.ThreadingTCPServer):
+    '''
+    TPL2 server simulator.
+
+    :param host, port: Address to listen on, port 0 picks a free one (see port attribute).
+    :param objects: Object table, defaults to default_objects(). Entries are [type code, value].
+    :param latency: Seconds between a command and its replies.
+    :param jitter: Extra random delay, uniform in [0, jitter], added to latency.
+    :param service_time: Seconds the server spends on each command. Commands on the same connection queue
+                         behind each other, as on a busy TSI.
+    :param subscriptions: Accept SUB commands, refuse them (as an unknown command) otherwise.
+    '''
+
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, host='127.0.0.1', port=0, objects=None, latency=0., jitter=0., user='admin',
+                 password='admin', level=3, message='TSI simulator', subscriptions=True, service_time=0.):
+        SocketServer.ThreadingTCPServer.__init__(self, (host, port), TPLHandler)
+
+        self.objects = default_objects() if objects is None else objects
+        self.latency = latency
+        self.jitter = jitter
+        self.service_time = service_time
+        self.user = user
+        self.password = password
+        self.level = level
+        self.message = message
+        self.subscriptions = subscriptions
+
+        self.host, self.port = self.server_address
+
+        self._lock = threading.Lock()
+        self._conn = 0
+        self._clients = []
+        self._subscribers = defaultdict(list)  # object -> [(client, SUB command id)]
+        self._thread = None
+
+    def start(self):
+        '''
+            Serve on a background thread.
+        '''
+        self._thread = threading.Thread(target=self.serve_forever, name='TPL simulator')
+        self._thread.setDaemon(True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.disconnect()
+        self.server_close()
+
+    def disconnect(self):
+        '''
+            Drop every client connection, as a TSI restart would.
+        '''
+        with self._lock:
+            clients = list(self._clients)
+        for client in clients:
+            try:
+                client.request.shutdown(socket.SHUT_RDWR)
+            except socket.error:
+                pass
+
+    def register(self, client):
+        with self._lock:
+            self._clients.append(client)
+
+    def unregister(self, client):
+        with self._lock:
+            if client in self._clients:
+                self._clients.remove(client)
+            for name, subscribers in self._subscribers.items():
+                subscribers[:] = [sub for sub in subscribers if sub[0] is not client]
+
+    def nextConnection(self):
+        with self._lock:
+            self._conn += 1
+            return self._conn
+
+    def delay(self):
+        return self.latency + (random.uniform(0., self.jitter) if self.jitter > 0. else 0.)
+
+    def getvalue(self, name):
+        dtype, value = self.objects[name]
+        if callable(value):
+            value = value()
+        return dtype, value
+
+    def setvalue(self, name, value):
+        with self._lock:
+            self.objects[name][1] = _convert[self.objects[name][0]](value)
+        self.publish(name)
+
+    def update(self, name, value):
+        '''
+            Change an object from the server side (e.g. a moving axis), notifying its subscribers.
+        '''
+        with self._lock:
+            self.objects[name][1] = value
+        self.publish(name)
+
+    def publish(self, name):
+        with self._lock:
+            subscribers = list(self._subscribers.get(name, ()))
+        for client, subid in subscribers:
+            try:
+                client.send(self._data(subid, name))
+            except socket.error:
+                pass
+
+    def _data(self, cmdid, name):
+        dtype, value = self.getvalue(name)
+        value = '"%s"' % value if dtype == STRING else value
+        return '%s DATA INLINE %s=%s\n' % (cmdid, name, value)
+
+    def execute(self, line, client=None):
+        '''
+            Run one client command.
+
+        :return: Reply lines.
+        '''
+        fields = line.split(' ', 2)
+        if len(fields) < 3 or not fields[0].isdigit():
+            return None
+
+        cmdid, cmd, args = fields
+        reply = ['%s COMMAND OK' % cmdid]
+
+        if cmd == 'GET':
+            for name in args.split(';'):
+                if name.endswith('!TYPE') and name[:-5] in self.objects:
+                    reply.append('%s DATA INLINE %s=%s' % (cmdid, name, self.objects[name[:-5]][0]))
+                elif name in self.objects:
+                    reply.append(self._data(cmdid, name)[:-1])
+                else:
+                    reply.append('%s EVENT ERROR %s:UNKNOWN OBJECT' % (cmdid, name))
+        elif cmd == 'SET':
+            name, sep, value = args.partition('=')
+            if name not in self.objects:
+                reply.append('%s EVENT ERROR %s:UNKNOWN OBJECT' % (cmdid, name))
+            else:
+                try:
+                    self.setvalue(name, value)
+                    reply.append('%s DATA OK %s' % (cmdid, name))
+                except ValueError:
+                    reply.append('%s EVENT ERROR %s:BAD VALUE' % (cmdid, name))
+        elif cmd == 'SUB' and self.subscriptions and client is not None:
+            if args not in self.objects:
+                reply.append('%s EVENT ERROR %s:UNKNOWN OBJECT' % (cmdid, args))
+            else:
+                reply.append(self._data(cmdid, args)[:-1])
+                with self._lock:
+                    self._subscribers[args].append((client, cmdid))
+                # open until UNSUB
+                return '\n'.join(reply) + '\n'
+        elif cmd == 'UNSUB' and self.subscriptions:
+            with self._lock:
+                subscribers = self._subscribers.get(args, [])
+                closed = [subid for sub, subid in subscribers if sub is client]
+                subscribers[:] = [sub for sub in subscribers if sub[0] is not client]
+            reply.extend(['%s COMMAND COMPLETE' % subid for subid in closed])
+        elif cmd == 'ABORT':
+            # every other command completes as soon as it is served, there is nothing left to abort
+            pass
+        else:
+            reply.append('%s EVENT ERROR %s:UNKNOWN COMMAND' % (cmdid, cmd))
+
+        reply.append('%s COMMAND COMPLETE' % cmdid)
+
+        return '\n'.join(reply) + '\n'
@@ -3,8 +3,8 @@ from distutils.core import setup
 setup(
     name='chimera_astelco',
     version='0.0.1',
-    packages=['chimera_astelco', 'chimera_astelco.instruments'],
-    scripts=['scripts/chimera-astelcopm'],
+    packages=['chimera_astelco', 'chimera_astelco.instruments', 'chimera_astelco.util'],
+    scripts=['scripts/chimera-astelcopm', 'scripts/chimera-tplsim', 'scripts/chimera-tplreplay'],
     url='https://github.com/astroufsc/chimera-astelco',
     license='GPL v2',
     author='Tiago Ribeiro',
@@ -0,0 +1,96 @@
+#! /usr/bin/env python
+# -*- coding: iso-8859-1 -*-
+
+# chimera - observatory automation system
+# Copyright (C) 2006-2007  P. Henrique Silva <henrique@astro.ufsc.br>
+
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA
+# 02110-1301, USA.
+
+'''
+TPL instances connected to the TPL2 simulator (chimera_astelco.util.tplsim), for the tests.
+'''
+
+import time
+import threading
+import unittest
+
+from chimera_astelco.instruments.tpl import TPL
+from chimera_astelco.util.tplsim import TPLServer
+
+
+def start(server, **config):
+    '''
+    :return: TPL connected to server with its control loop running. config overrides TPL options.
+    '''
+    tpl = TPL()
+    tpl['tpl_host'] = server.host
+    tpl['tpl_port'] = server.port
+    tpl['freq'] = 20.
+    tpl['timeout'] = 5
+    tpl['debug_log'] = ''
+    for key, value in config.items():
+        tpl[key] = value
+    tpl.__start__()
+
+    loop = threading.Thread(target=tpl.__main__, name='TPL control')
+    loop.setDaemon(True)
+    loop.start()
+    return tpl
+
+
+def stop(tpl):
+    tpl.__abort_loop__()
+    tpl.__stop__()
+
+
+def later(seconds, function, *args):
+    '''
+        Call function(*args) from another thread after seconds.
+    '''
+    timer = threading.Timer(seconds, function, args)
+    timer.setDaemon(True)
+    timer.start()
+    return timer
+
+
+def until(test, timeout=5.):
+    '''
+    :return: True once test() is, False if it is not after timeout seconds.
+    '''
+    deadline = time.time() + timeout
+    while not test():
+        if time.time() > deadline:
+            return False
+        time.sleep(0.01)
+    return True
+
+
+class SimulatorTestCase(unittest.TestCase):
+    '''
+    A simulator and a TPL connected to it for every test. server and config are the arguments of TPLServer and
+    the TPL options.
+    '''
+
+    server = {}
+    config = {}
+
+    def setUp(self):
+        self.sim = TPLServer(**self.server).start()
+        self.tpl = start(self.sim, **self.config)
+
+    def tearDown(self):
+        stop(self.tpl)
+        self.sim.stop()
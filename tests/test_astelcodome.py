@@ -0,0 +1,106 @@
+#! /usr/bin/env python
+# -*- coding: iso-8859-1 -*-
+
+# chimera - observatory automation system
+# Copyright (C) 2006-2007  P. Henrique Silva <henrique@astro.ufsc.br>
+
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA
+# 02110-1301, USA.
+
+'''
+AstelcoDome slews against the simulator. The dome is left unstarted, its TPL is the one of the test case.
+'''
+
+import threading
+import unittest
+
+from chimera.util.coord import Coord
+from chimera.interfaces.dome import DomeStatus, Mode
+
+from chimera_astelco.instruments.astelcodome import AstelcoDome
+
+from simtpl import SimulatorTestCase, until
+
+CURRPOS = 'POSITION.INSTRUMENTAL.DOME[0].CURRPOS'
+TARGETPOS = 'POSITION.INSTRUMENTAL.DOME[0].TARGETPOS'
+
+
+class TestDomeSlew(SimulatorTestCase):
+
+    config = {'cmd_timeout': 10}
+
+    def setUp(self):
+        SimulatorTestCase.setUp(self)
+
+        self.completed = []
+        dome = AstelcoDome()
+        dome._maxSlewTime = 10.
+        dome.getTPL = lambda: self.tpl
+        dome.getLocation = lambda: '/AstelcoDome/test'
+        dome.getMode = lambda: Mode.Stand
+        dome.getAz = lambda: Coord.fromD(self.sim.objects[CURRPOS][1])
+        dome.slewBegin = lambda az: None
+        dome.slewComplete = lambda az, status: self.completed.append(status)
+        self.dome = dome
+
+    def slew(self, az):
+        slew = threading.Thread(target=self.dome.slewToAz, args=(az,))
+        slew.setDaemon(True)
+        slew.start()
+        # the dome is on its way once the TPL follows its position
+        self.assertTrue(until(lambda: CURRPOS in self.tpl._pushed))
+        return slew
+
+    def test_arrives(self):
+        slew = self.slew(270.)
+        self.sim.update(CURRPOS, 269.)
+        slew.join(5.)
+
+        self.assertFalse(slew.isAlive())
+        self.assertEqual(self.completed, [DomeStatus.OK])
+
+    def test_abort_stops_where_the_dome_is(self):
+        slew = self.slew(270.)
+        self.assertTrue(until(lambda: self.sim.objects[TARGETPOS][1] == 270.))
+
+        # moved on since the slew started
+        self.sim.update(CURRPOS, 200.)
+        self.assertTrue(until(lambda: self.tpl.getstamped(CURRPOS)[0] == 200.))
+        self.dome.abortSlew()
+        slew.join(5.)
+
+        self.assertFalse(slew.isAlive())
+        self.assertEqual(self.completed, [DomeStatus.ABORTED])
+        self.assertTrue(until(lambda: self.sim.objects[TARGETPOS][1] == 200.))
+
+    def test_abort_leaves_other_waits(self):
+        status = []
+
+        def focus():
+            status.append(self.tpl.waitFor('POSITION.HORIZONTAL.AZ', ('>=', 1000.), timeout=1., tag='focus')[0])
+
+        waiter = threading.Thread(target=focus)
+        waiter.start()
+        slew = self.slew(270.)
+        self.dome.abortSlew()
+        slew.join(5.)
+        waiter.join(5.)
+
+        self.assertEqual(self.completed, [DomeStatus.ABORTED])
+        self.assertEqual(status, ['TIMEOUT'])
+
+
+if __name__ == '__main__':
+    unittest.main()
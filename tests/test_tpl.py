@@ -0,0 +1,179 @@
+#! /usr/bin/env python
+# -*- coding: iso-8859-1 -*-
+
+# chimera - observatory automation system
+# Copyright (C) 2006-2007  P. Henrique Silva <henrique@astro.ufsc.br>
+
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA
+# 02110-1301, USA.
+
+'''
+TPL against the simulator: waitFor() on pushed and polled objects, reconnects and the command history.
+'''
+
+import time
+import unittest
+
+from chimera_astelco.instruments.tpl import SEND
+
+from simtpl import SimulatorTestCase, later, until
+
+AZ = 'POSITION.HORIZONTAL.AZ'
+
+
+class TestWaitForPushed(SimulatorTestCase):
+
+    config = {'subscribe': True, 'cmd_timeout': 10}
+
+    def followed(self):
+        '''
+        :return: Objects followed the way this case expects.
+        '''
+        return self.tpl._pushed
+
+    def test_done_on_change(self):
+        seen = []
+
+        def move():
+            seen.append(AZ in self.followed())
+            self.sim.update(AZ, 210.)
+
+        later(0.3, move)
+        start = time.time()
+        status, values = self.tpl.waitFor(AZ, ('>=', 200.), timeout=5.)
+
+        self.assertEqual(status, 'DONE')
+        self.assertEqual(values[AZ], 210.)
+        self.assertEqual(seen, [True])
+        self.assertTrue(time.time() - start < 3.)
+
+    def test_met_already(self):
+        status, values = self.tpl.waitFor(AZ, ('near', 180., 1.), timeout=1.)
+        self.assertEqual(status, 'DONE')
+
+    def test_timeout(self):
+        start = time.time()
+        status, values = self.tpl.waitFor(AZ, ('>=', 1000.), timeout=0.3)
+
+        self.assertEqual(status, 'TIMEOUT')
+        self.assertEqual(values[AZ], 180.)
+        self.assertTrue(0.3 <= time.time() - start < 2.)
+
+    def test_abort_by_tag(self):
+        later(0.2, self.tpl.abortWait, 'mine')
+        status, values = self.tpl.waitFor(AZ, ('>=', 1000.), timeout=5., tag='mine')
+        self.assertEqual(status, 'ABORTED')
+
+        later(0.1, self.tpl.abortWait, 'other')
+        status, values = self.tpl.waitFor(AZ, ('>=', 1000.), timeout=0.5, tag='mine')
+        self.assertEqual(status, 'TIMEOUT')
+
+    def test_waits_for_command(self):
+        cmdid = self.tpl.set('POINTING.TRACK', 1)
+        status, values = self.tpl.waitFor('POINTING.TRACK', ('==', 1), timeout=5., cmdid=cmdid)
+
+        self.assertEqual(status, 'DONE')
+        self.assertTrue(self.tpl.getCmd(cmdid).complete)
+
+    def test_unsubscribes_after_wait(self):
+        self.tpl.waitFor(AZ, ('>=', 1000.), timeout=0.1)
+        self.assertFalse(AZ in self.tpl._live)
+        self.assertFalse(AZ in self.followed())
+
+
+class TestWaitForPolled(TestWaitForPushed):
+
+    config = {'subscribe': False, 'poll_period': 0.05, 'cmd_timeout': 10}
+
+    def followed(self):
+        return self.tpl._polled
+
+
+class TestWaitForRefused(TestWaitForPolled):
+    '''
+    The server refuses SUB, the TPL polls instead.
+    '''
+
+    server = {'subscriptions': False}
+    config = {'subscribe': True, 'poll_period': 0.05, 'cmd_timeout': 10}
+
+    def test_done_on_change(self):
+        # the refusal comes back with the first value, before the object is polled
+        self.tpl.getlive(AZ)
+        self.assertTrue(until(lambda: AZ in self.tpl._polled))
+        TestWaitForPolled.test_done_on_change(self)
+
+
+class TestReconnect(SimulatorTestCase):
+
+    server = {'latency': 0.3}
+    config = {'cmd_timeout': 10}
+
+    def test_resends_pending(self):
+        cmdid = self.tpl.get('TELESCOPE.READY')
+        time.sleep(0.1)
+        # the reply is still on its way when the connection drops
+        self.sim.disconnect()
+
+        self.assertEqual(self.tpl.waitCmd(cmdid), 'COMPLETE')
+        self.assertEqual(self.tpl.getCmd(cmdid).values['TELESCOPE.READY'], '1')
+        stats = self.tpl.getStats()
+        self.assertTrue(stats['reconnects'] >= 1)
+        self.assertTrue(stats['resent'] >= 1)
+
+    def test_subscription_back_after_reconnect(self):
+        self.tpl.getlive(AZ)
+        self.assertTrue(until(lambda: AZ in self.tpl._pushed))
+
+        self.sim.disconnect()
+        self.assertTrue(until(lambda: self.tpl.getStats()['reconnects'] >= 1 and AZ in self.tpl._pushed))
+
+        self.sim.update(AZ, 90.)
+        self.assertTrue(until(lambda: self.tpl.getstamped(AZ)[0] == 90.))
+
+    def test_failed_send_completes(self):
+        self.sim.stop()
+        # the write fails, and so does the reconnect
+        self.tpl.sock._sock.close()
+
+        start = time.time()
+        cmdid = self.tpl.sendcomm('GET', 'TELESCOPE.READY', background=True)
+
+        cmd = self.tpl.getCmd(cmdid)
+        self.assertTrue(cmd.complete)
+        self.assertEqual(cmd.status, SEND.ERROR)
+        self.assertEqual(self.tpl.waitCmd(cmdid), SEND.ERROR)
+        self.assertTrue(time.time() - start < 2.)
+        self.assertFalse(cmdid in self.tpl._pending)
+        self.assertFalse(cmdid in self.tpl._background)
+        self.assertTrue(self.tpl._reconnect.isSet())
+
+
+class TestHistory(SimulatorTestCase):
+
+    config = {'history': 5, 'cmd_timeout': 10}
+
+    def test_evicted_command(self):
+        first = self.tpl.get('TELESCOPE.READY', wait=True)
+        for i in range(10):
+            self.tpl.get('TELESCOPE.READY', wait=True)
+
+        self.assertEqual(self.tpl.getCmd(first), None)
+        self.assertEqual(len(self.tpl.commands_sent), 5)
+        self.assertEqual(self.tpl.getobject('TELESCOPE.READY'), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,78 @@
+#! /usr/bin/env python
+# -*- coding: iso-8859-1 -*-
+
+# chimera - observatory automation system
+# Copyright (C) 2006-2007  P. Henrique Silva <henrique@astro.ufsc.br>
+
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA
+# 02110-1301, USA.
+
+'''
+Bounded command history.
+'''
+
+import unittest
+
+from chimera_astelco.instruments.tplcommand import Command, CommandHistory
+
+
+def command(cmdid):
+    cmd = Command()
+    cmd.id = cmdid
+    return cmd
+
+
+class TestCommandHistory(unittest.TestCase):
+
+    def test_evicts_oldest(self):
+        history = CommandHistory(3)
+        for cmdid in range(1, 6):
+            history.add(command(cmdid))
+
+        self.assertEqual(sorted(history.keys()), [3, 4, 5])
+        self.assertEqual(history.get(1), None)
+        self.assertEqual(history[5].id, 5)
+
+    def test_sparse_ids(self):
+        history = CommandHistory(2)
+        for cmdid in (10, 3, 42):
+            history.add(command(cmdid))
+
+        self.assertEqual(sorted(history.keys()), [3, 42])
+
+    def test_removed_command_skipped(self):
+        history = CommandHistory(2)
+        history.add(command(1))
+        history.add(command(2))
+        del history[1]
+        history.add(command(3))
+
+        # 1 was already gone, 2 is the oldest left and goes once a third command is in
+        self.assertEqual(sorted(history.keys()), [2, 3])
+        history.add(command(4))
+        self.assertEqual(sorted(history.keys()), [3, 4])
+
+    def test_maxlen_change(self):
+        history = CommandHistory(10)
+        for cmdid in range(10):
+            history.add(command(cmdid))
+        history.maxlen = 4
+        history.add(command(10))
+
+        self.assertEqual(sorted(history.keys()), [7, 8, 9, 10])
+
+
+if __name__ == '__main__':
+    unittest.main()
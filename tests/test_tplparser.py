@@ -0,0 +1,90 @@
+#! /usr/bin/env python
+# -*- coding: iso-8859-1 -*-
+
+# chimera - observatory automation system
+# Copyright (C) 2006-2007  P. Henrique Silva <henrique@astro.ufsc.br>
+
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA
+# 02110-1301, USA.
+
+'''
+TPL2 reply parsing, in particular replies split across reads.
+'''
+
+import unittest
+
+from chimera_astelco.instruments.tplparser import TPLParser, DATA, COMMAND, EVENT
+
+STREAM = '12 COMMAND OK\n' \
+         '12 DATA INLINE POSITION.HORIZONTAL.AZ=181.25\n' \
+         '12 EVENT ERROR POSITION.HORIZONTAL.XX:UNKNOWN OBJECT\n' \
+         '12 DATA OK POINTING.TRACK\n' \
+         '12 COMMAND COMPLETE\n'
+
+
+def lines(replies):
+    return [reply.line for reply in replies]
+
+
+class TestTPLParser(unittest.TestCase):
+
+    def test_whole_stream(self):
+        replies = list(TPLParser().feed(STREAM))
+
+        self.assertEqual([(reply.cmdid, reply.kind, reply.status) for reply in replies],
+                         [(12, COMMAND, 'OK'), (12, DATA, 'INLINE'), (12, EVENT, 'ERROR'), (12, DATA, 'OK'),
+                          (12, COMMAND, 'COMPLETE')])
+        self.assertEqual((replies[1].object, replies[1].value), ('POSITION.HORIZONTAL.AZ', '181.25'))
+        self.assertEqual((replies[2].object, replies[2].value), ('POSITION.HORIZONTAL.XX', 'UNKNOWN OBJECT'))
+        self.assertEqual(replies[3].object, 'POINTING.TRACK')
+
+    def test_split_anywhere(self):
+        expected = lines(TPLParser().feed(STREAM))
+        for cut in range(1, len(STREAM)):
+            parser = TPLParser()
+            got = lines(parser.feed(STREAM[:cut])) + lines(parser.feed(STREAM[cut:]))
+            self.assertEqual(got, expected, 'split at %i' % cut)
+            self.assertEqual(parser.pending(), 0)
+
+    def test_byte_at_a_time(self):
+        parser = TPLParser()
+        got = []
+        for char in STREAM:
+            got.extend(lines(parser.feed(char)))
+        self.assertEqual(got, lines(TPLParser().feed(STREAM)))
+
+    def test_partial_line_waits(self):
+        parser = TPLParser()
+        self.assertEqual(list(parser.feed('7 COMMAND COMP')), [])
+        self.assertEqual(parser.pending(), len('7 COMMAND COMP'))
+
+        replies = list(parser.feed('LETE\n8 COMM'))
+        self.assertEqual(lines(replies), ['7 COMMAND COMPLETE'])
+        self.assertEqual(parser.pending(), len('8 COMM'))
+
+    def test_reset_drops_partial_line(self):
+        parser = TPLParser()
+        list(parser.feed('7 DATA INLINE TELESCOPE.READY='))
+        parser.reset()
+        self.assertEqual(parser.pending(), 0)
+        self.assertEqual(lines(parser.feed('8 COMMAND OK\n')), ['8 COMMAND OK'])
+
+    def test_unknown_lines_skipped(self):
+        replies = list(TPLParser().feed('garbage\n\n9 COMMAND OK\n'))
+        self.assertEqual(lines(replies), ['9 COMMAND OK'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,100 @@
+#! /usr/bin/env python
+# -*- coding: iso-8859-1 -*-
+
+# chimera - observatory automation system
+# Copyright (C) 2006-2007  P. Henrique Silva <henrique@astro.ufsc.br>
+
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA
+# 02110-1301, USA.
+
+'''
+Capture of a TPL session against the simulator, read back and replayed.
+'''
+
+import os
+import time
+import unittest
+
+from chimera.core.constants import SYSTEM_CONFIG_DIRECTORY
+
+from chimera_astelco.instruments.tpl import TPL
+from chimera_astelco.instruments import tplrecord
+
+from simtpl import SimulatorTestCase, until
+
+AZ = 'POSITION.HORIZONTAL.AZ'
+
+
+class TestRecord(SimulatorTestCase):
+
+    server = {'password': 's3cret'}
+    config = {'password': 's3cret', 'record': 'test_tplrecord_%d.bin' % os.getpid(), 'cmd_timeout': 10}
+
+    def setUp(self):
+        self.capture = os.path.join(SYSTEM_CONFIG_DIRECTORY, self.config['record'])
+        SimulatorTestCase.setUp(self)
+
+    def tearDown(self):
+        SimulatorTestCase.tearDown(self)
+        for name in (self.capture, self.capture + '.1'):
+            if os.path.exists(name):
+                os.remove(name)
+
+    def session(self):
+        '''
+            A GET, and a subscription that outlives cmd_timeout of the replay below.
+        '''
+        self.tpl.get('TELESCOPE.READY', wait=True)
+        self.tpl.getlive(AZ)
+        self.assertTrue(until(lambda: AZ in self.tpl._pushed))
+        time.sleep(1.)
+        self.tpl.get('TELESCOPE.READY', wait=True)
+        self.tpl._recorder.flush()
+
+    def test_round_trip(self):
+        self.session()
+
+        records = list(tplrecord.read(self.capture))
+        kinds = [kind for stamp, kind, conn, data in records]
+        sent = ''.join([data for stamp, kind, conn, data in records if kind == tplrecord.SENT])
+        received = ''.join([data for stamp, kind, conn, data in records if kind == tplrecord.RECEIVED])
+
+        self.assertEqual(kinds[0], tplrecord.OPEN)
+        self.assertTrue('AUTH PLAIN "" ""' in sent)
+        self.assertFalse('s3cret' in sent)
+        self.assertTrue('GET TELESCOPE.READY' in sent)
+        self.assertTrue('SUB ' + AZ in sent)
+        self.assertTrue('DATA INLINE TELESCOPE.READY=1' in received)
+        self.assertTrue('COMMAND COMPLETE' in received)
+        stamps = [stamp for stamp, kind, conn, data in records]
+        self.assertEqual(stamps, sorted(stamps))
+
+    def test_replay(self):
+        self.session()
+
+        tpl = TPL()
+        tpl['cmd_timeout'] = 0.3
+        tpl['debug_log'] = ''
+        stats = tplrecord.replay(self.capture, tpl, speed=1.)
+
+        self.assertTrue(stats['commands'] >= 3)
+        self.assertTrue(stats['lines'] > 0)
+        self.assertEqual(tpl.getStats()['timed_out'], 0)
+        self.assertEqual(len(stats['incomplete']), 1)
+        self.assertTrue('SUB ' + AZ in stats['incomplete'][0])
+
+
+if __name__ == '__main__':
+    unittest.main()